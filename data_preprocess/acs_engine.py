@@ -0,0 +1,585 @@
+import numpy as np
+import pandas as pd
+import csv
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from acs_loader import input_directory, iter_table_year_chunks, load_table_year, locate_table_file, rule_for_year
+from acs_sentinels import STATUS_MISSING, decode_estimates, imputed_column, moe_column, status_column
+from build_cache import load_partial, partial_key, store_partial
+from gap_fill import fill_table_gaps
+from run_report import stage
+from tract_changes import derived_current, record_changes
+from tract_crosswalk import crosswalk_table
+from tract_keys import county_fips, in_region, parse_geo_ids, tract_labels
+
+# Columns shared by every processed table, in output order around the value columns.
+# GEOID is the int64 tract key every groupby and merge runs on; Tract ID and County
+# are derived from it for display.
+KEY_COLUMNS = ['GEOID', 'Tract ID', 'County']
+# Rows parsed at a time in streaming mode
+CHUNK_SIZE = 50000
+# Yearly files (or zip archive members) read concurrently by process_table
+READ_WORKERS = 4
+
+
+def output_columns(spec):
+    """
+    Columns of a table's combined CSV, in order: the key columns, the values, Year, their
+    status codes and margins of error, and for tables that fill gaps which values were filled.
+    """
+    value_cols = list(spec["columns"])
+    columns = KEY_COLUMNS + value_cols + ['Year'] + [status_column(col) for col in value_cols]
+    columns += [moe_column(col) for col in value_cols]
+    if spec["gap_fill"]:
+        columns += [imputed_column(col) for col in value_cols]
+    return columns
+
+
+def split_geographic_names(names):
+    """
+    Turns "Census Tract 4001; Alameda County; California" into Tract ID "4001" and County "Alameda".
+    Handles both comma and semicolon delimiters.
+
+    Returns:
+        tuple: (Tract ID series, County series)
+    """
+    split_data = names.str.split(r'[,;]', n=2, expand=True, regex=True)
+    tract_id = split_data[0].str.strip().str.replace('Census Tract ', '', regex=False)
+    if 1 in split_data.columns:
+        county = split_data[1].str.strip().str.replace(' County', '', regex=False).fillna('')
+    else:
+        county = pd.Series('', index=names.index)
+    return tract_id, county
+
+
+def ratio_moe(numerator, numerator_moe, denominator, denominator_moe):
+    """
+    Margin of error of numerator / denominator by the Census Bureau's approximation for a
+    proportion, sqrt(MOE_num^2 - p^2 * MOE_den^2) / den, falling back to the ratio formula
+    (with + instead of -) where the term under the root is negative.
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = numerator / denominator
+        proportion = numerator_moe ** 2 - ratio ** 2 * denominator_moe ** 2
+        ratio_term = numerator_moe ** 2 + ratio ** 2 * denominator_moe ** 2
+        return np.sqrt(np.where(proportion < 0, ratio_term, proportion)) / denominator
+
+
+def extract_values(df, header_map, spec, year, file_name):
+    """
+    Builds the value columns for one year of a table from its resolved header map. Every
+    estimate goes through acs_sentinels.decode_estimates, so top-coded values ("2,000+")
+    keep their number and suppressed ones become the spec's fill value; the status codes
+    say which was which. Margins of error are decoded the same way and are NaN wherever
+    the estimate has none (including estimates replaced by the fill value).
+
+    Returns:
+        dict: output column name -> (numeric series, int8 status code array, float64 margin of error array)
+    """
+    values = {}
+    for output_col, sources in header_map["values"].items():
+        rule = rule_for_year(spec["columns"][output_col], year) or {}
+        if sources["source"] is None or ("denominator" in rule and sources["denominator"] is None):
+            print(f"  Warning: column for '{output_col}' not found in {file_name}. Using {spec['fill_value']}.")
+            values[output_col] = (pd.Series(spec["fill_value"], index=df.index, dtype=float),
+                                  np.full(len(df), STATUS_MISSING, dtype=np.int8),
+                                  np.full(len(df), np.nan))
+            continue
+
+        decoded, status = decode_estimates(df[sources["source"]])
+        moe = np.full(len(df), np.nan)
+        if sources.get("moe") is not None:
+            moe = decode_estimates(df[sources["moe"]])[0]
+        value = pd.Series(decoded, index=df.index)
+        if sources["denominator"] is not None:
+            decoded, denominator_status = decode_estimates(df[sources["denominator"]])
+            denominator = pd.Series(decoded, index=df.index)
+            denominator_moe = np.full(len(df), np.nan)
+            if sources.get("denominator_moe") is not None:
+                denominator_moe = decode_estimates(df[sources["denominator_moe"]])[0]
+            moe = ratio_moe(value.to_numpy(), moe, denominator.where(denominator != 0).to_numpy(),
+                            denominator_moe) * rule.get("scale", 1)
+            value = value.fillna(0) / denominator.where(denominator != 0) * rule.get("scale", 1)
+            status = np.maximum(status, denominator_status)
+        moe = np.where(value.isna().to_numpy(), np.nan, moe)
+
+        fill = rule.get("fill", spec["fill_value"])
+        if fill is not None:
+            value = value.fillna(fill)
+        values[output_col] = (value, status, moe)
+    return values
+
+
+def county_name_map(geoid, names):
+    """
+    Maps each county FIPS present in a file to its county name ("Alameda"), splitting only
+    one geographic area name per county instead of every row.
+
+    Returns:
+        dict: county FIPS (int) -> county name
+    """
+    if len(geoid) == 0:
+        return {}
+    unique_fips, first_row = np.unique(county_fips(geoid), return_index=True)
+    _, county = split_geographic_names(names.iloc[first_row].reset_index(drop=True))
+    return dict(zip(unique_fips.tolist(), county.tolist()))
+
+
+def clean_rows(df, header_map, spec, year, file_name, counties=None, states=None):
+    """
+    Turns raw rows of a yearly file (or one chunk of it) into GEOID and value columns,
+    dropping rows that aren't census tracts or fall outside the requested counties/states.
+
+    Returns:
+        tuple: (DataFrame of GEOID and value columns, county FIPS -> county name dict)
+    """
+    with stage("filter", spec, year) as timing:
+        timing.input(df)
+        geoid = parse_geo_ids(df[header_map["geo_id"]])
+        is_tract = (geoid >= 0) & df[header_map["name"]].notna().to_numpy()
+        if not is_tract.all():
+            print(f"  Dropping {(~is_tract).sum()} rows without a census tract GEO_ID in {file_name}.")
+        keep = is_tract & in_region(geoid, counties, states)
+        if not keep.all():
+            df, geoid = df[keep], geoid[keep]
+        timing.output(df)
+
+    with stage("coerce", spec, year) as timing:
+        rows = pd.DataFrame({'GEOID': geoid}, index=df.index)
+        for output_col, (value, status, moe) in extract_values(df, header_map, spec, year, file_name).items():
+            rows[output_col] = value.astype('float64')
+            rows[status_column(output_col)] = status
+            rows[moe_column(output_col)] = moe
+        timing.output(rows)
+    with stage("name_split", spec, year):
+        county_names = county_name_map(geoid, df[header_map["name"]])
+    return rows, county_names
+
+
+def combine_moes(moes, geoid, aggregate):
+    """
+    Margins of error of split tracts combined by the spec's aggregate: parts of a sum or mean
+    add in quadrature (sqrt(sum MOE^2), divided by the number of parts for a mean), any other
+    aggregate keeps the largest. A combined value with a part lacking a margin of error has none.
+    The parts are summed with one bincount per column rather than a pandas groupby, whose
+    overhead outweighed the values' own aggregation.
+
+    Args:
+        moes (pandas.DataFrame): Margin of error columns of the rows.
+        geoid (pandas.Series): GEOID of every row.
+        aggregate (str): The spec's aggregate.
+
+    Returns:
+        numpy.ndarray: One row per GEOID, sorted by GEOID.
+    """
+    keys, group = np.unique(geoid.to_numpy(), return_inverse=True)
+    values = moes.to_numpy(dtype=np.float64)
+    if aggregate not in ("sum", "mean"):
+        # NaN propagates through maximum, so a part without a margin of error leaves none
+        combined = np.full((len(keys), values.shape[1]), -np.inf)
+        np.maximum.at(combined, group, values)
+        return combined
+    combined = np.sqrt(np.column_stack([np.bincount(group, weights=values[:, i] ** 2, minlength=len(keys))
+                                        for i in range(values.shape[1])]))
+    if aggregate == "mean":
+        combined /= np.bincount(group, minlength=len(keys))[:, None]
+    return combined
+
+
+def finish_year(rows, county_names, spec, year):
+    """
+    Aggregates split tracts when the spec asks for it and adds the display columns
+    (Tract ID, County) and Year. The status columns follow Year, then the margins of error.
+    """
+    value_cols = list(spec["columns"])
+    status_cols = [status_column(col) for col in value_cols]
+    moe_cols = [moe_column(col) for col in value_cols]
+    if spec["aggregate"]:
+        # Split tracts share a GEOID, so combine them into one row per tract; a combined
+        # value takes the most severe status of its parts
+        with stage("groupby", spec, year) as timing:
+            timing.input(rows)
+            aggregations = {col: spec["aggregate"] for col in value_cols}
+            aggregations.update({col: "max" for col in status_cols})
+            moes = combine_moes(rows[moe_cols], rows['GEOID'], spec["aggregate"])
+            rows = rows.groupby('GEOID', sort=True)[value_cols + status_cols].agg(aggregations).reset_index()
+            rows[moe_cols] = moes
+            timing.output(rows)
+
+    fips = pd.Series(county_fips(rows['GEOID']), index=rows.index)
+    rows['Tract ID'] = tract_labels(rows['GEOID'])
+    rows['County'] = fips.map(county_names).astype('category')
+    rows['Year'] = year
+    return rows[KEY_COLUMNS + value_cols + ['Year'] + status_cols + moe_cols].reset_index(drop=True)
+
+
+def process_year(spec, file_name, year, counties=None, states=None):
+    """
+    Cleans one yearly file of a table into GEOID, Tract ID, County, value columns and Year,
+    aggregating split tracts when the spec asks for it.
+    """
+    df, header_map = load_table_year(spec, file_name, year)
+    if df is None:
+        print(f"Error: '{spec['name_column']}' or GEO_ID column not found in {file_name}. Skipping this file.")
+        return None
+
+    rows, county_names = clean_rows(df, header_map, spec, year, file_name, counties, states)
+    return finish_year(rows, county_names, spec, year)
+
+
+def stream_year(spec, file_name, year, counties=None, states=None, chunk_size=CHUNK_SIZE):
+    """
+    Streaming version of process_year. The file is parsed chunk_size rows at a time and
+    the county/state filter is applied to each chunk, so only the narrow GEOID and value
+    columns of the region's rows are kept until the year's split tracts are aggregated.
+    The result is identical to process_year's.
+    """
+    chunks, header_map = iter_table_year_chunks(spec, file_name, year, chunk_size)
+    if chunks is None:
+        print(f"Error: '{spec['name_column']}' or GEO_ID column not found in {file_name}. Skipping this file.")
+        return None
+
+    kept_rows, county_names = [], {}
+    for chunk in chunks:
+        rows, names = clean_rows(chunk, header_map, spec, year, file_name, counties, states)
+        kept_rows.append(rows)
+        for fips, name in names.items():
+            county_names.setdefault(fips, name)
+    if not kept_rows:
+        return None
+    with stage("concat", spec, year) as timing:
+        rows = pd.concat(kept_rows)
+        timing.output(rows)
+    return finish_year(rows, county_names, spec, year)
+
+
+def map_in_order(function, items, workers):
+    """
+    Applies function to every item on up to `workers` threads and yields the results in item
+    order. At most `workers` results are pending at a time, so streaming stays bounded.
+    """
+    if workers <= 1:
+        for item in items:
+            yield function(item)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(function, item))
+            if len(pending) >= workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def fill_gaps_by_tract(df, value_cols, gap_fill):
+    """
+    Fills the missing values of every tract's yearly series by the spec's gap_fill method
+    and limit (gap_fill.py), all tracts at once. The filled values are marked in
+    "<column> Imputed", so appending a year can fill them again.
+    """
+    df = df.sort_values(by=['GEOID', 'Year'])
+    columns = [df[col].to_numpy(dtype=np.float64) for col in value_cols]
+    filled = fill_table_gaps(df['GEOID'].to_numpy(np.int64), columns, gap_fill["method"], gap_fill.get("limit"))
+    for col, (values, imputed) in zip(value_cols, filled):
+        df[col] = values
+        df[imputed_column(col)] = imputed
+    return df
+
+
+def build_year(spec, file_name, year, cache_dir, region, use_cache=True, streaming=False,
+               chunk_size=CHUNK_SIZE, shard=None):
+    """
+    Cleans one yearly file of a table for a region, reusing and storing its cached partial.
+    Runs on process_table's worker threads and in build.py's worker processes.
+
+    Args:
+        region (dict): {"counties": [...] or None, "states": [...] or None}
+        shard (str, optional): Name of the region shard, when a region is built in several pieces.
+
+    Returns:
+        tuple: (cleaned year or None, whether it came from the cache)
+    """
+    if use_cache:
+        with stage("cache", spec, year) as timing:
+            key = partial_key(spec, file_name, year, region)
+            year_df = load_partial(spec, cache_dir, year, key, shard)
+            if year_df is not None:
+                timing.output(year_df)
+        if year_df is not None:
+            return year_df, True
+    if streaming:
+        year_df = stream_year(spec, file_name, year, region["counties"], region["states"], chunk_size)
+    else:
+        year_df = process_year(spec, file_name, year, region["counties"], region["states"])
+    if year_df is not None and use_cache:
+        store_partial(spec, cache_dir, year, key, year_df, shard)
+    return year_df, False
+
+
+def combine_years(spec, all_years_data, output_filename, crosswalk=None):
+    """
+    Concatenates a table's cleaned years in order, moves the years published on 2010 tracts
+    onto 2020 tracts when a crosswalk is given, fills gaps across years when the spec asks
+    for it and writes the combined CSV.
+
+    Returns:
+        pandas.DataFrame or None: The combined data, or None if there was nothing to combine.
+    """
+    if not all_years_data:
+        print("No data processed. Exiting.")
+        return None
+
+    # Concatenate all processed yearly data into a single DataFrame
+    with stage("concat", spec) as timing:
+        final_df = pd.concat(all_years_data, ignore_index=True)
+        final_df['County'] = final_df['County'].astype('category')
+        timing.output(final_df)
+
+    if crosswalk is not None:
+        with stage("crosswalk", spec) as timing:
+            timing.input(final_df)
+            final_df = crosswalk_table(final_df, spec, crosswalk)
+            timing.output(final_df)
+
+    if spec["gap_fill"]:
+        with stage("gap_fill", spec) as timing:
+            final_df = fill_gaps_by_tract(final_df, list(spec["columns"]), spec["gap_fill"])
+            timing.output(final_df)
+
+    with stage("write", spec) as timing:
+        final_df.to_csv(output_filename, index=False)
+        timing.add(rows_in=len(final_df), bytes_out=os.path.getsize(output_filename) if timing else 0)
+    print(f"\nSuccessfully processed and combined data into {output_filename}")
+    print(f"Final output shape: {final_df.shape}")
+    return final_df
+
+
+def read_output(output_filename, spec):
+    """
+    Reads a table's combined CSV back with the types it was written with. Floats are parsed
+    to exactly the values that were written, so rewriting the file leaves its rows as they were.
+    """
+    value_cols = list(spec["columns"])
+    dtypes = {'GEOID': 'int64', 'Tract ID': 'str', 'County': 'str', 'Year': 'int64'}
+    dtypes.update({col: 'float64' for col in value_cols + [moe_column(col) for col in value_cols]})
+    dtypes.update({status_column(col): 'int8' for col in value_cols})
+    if spec["gap_fill"]:
+        dtypes.update({imputed_column(col): 'bool' for col in value_cols})
+    return pd.read_csv(output_filename, dtype=dtypes, float_precision='round_trip')
+
+
+def _last_line(file_name, block_size=1 << 16):
+    # Last non-empty line of a text file, read backwards from its end
+    with open(file_name, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        data = b''
+        while end > 0 and b'\n' not in data.rstrip(b'\r\n'):
+            start = max(0, end - block_size)
+            f.seek(start)
+            data = f.read(end - start) + data
+            end = start
+    return data.rstrip(b'\r\n').rsplit(b'\n', 1)[-1].decode('utf-8')
+
+
+def check_append(spec, output_filename, years):
+    """
+    Checks that a table's existing combined CSV can take appended years: it must have the
+    columns this spec writes, and every appended year must come after its last year. Tables
+    that don't fill gaps are written in year order, so only their last line is read.
+
+    Raises:
+        ValueError: If the CSV has other columns or already has one of the years (or a later one).
+    """
+    with open(output_filename, newline='') as f:
+        header = next(csv.reader(f), [])
+    if header != output_columns(spec):
+        raise ValueError(f"{output_filename} doesn't have the columns {spec['output']} is written with; "
+                         f"rebuild it instead of appending")
+    if spec["gap_fill"]:
+        last_year = pd.read_csv(output_filename, usecols=['Year'], dtype={'Year': 'int64'})['Year'].max()
+    else:
+        last_row = next(csv.reader([_last_line(output_filename)]))
+        last_year = int(last_row[header.index('Year')]) if last_row != header else None
+    if last_year is not None and not pd.isna(last_year) and min(years) <= last_year:
+        raise ValueError(f"{output_filename} already has years up to {last_year}; "
+                         f"only later years can be appended, rebuild it to change earlier ones")
+
+
+def refill_gaps(existing, new_rows, value_cols, gap_fill):
+    """
+    Adds new years to a table that fills gaps. Only the series of tracts with a new row can
+    change: their imputed values are cleared and their gaps filled again with the new years
+    in place.
+
+    Returns:
+        tuple: (the whole table sorted by GEOID and Year, its new and changed rows)
+    """
+    imputed_cols = [imputed_column(col) for col in value_cols]
+    affected = np.isin(existing['GEOID'].to_numpy(), new_rows['GEOID'].unique())
+    before = existing[affected].reset_index(drop=True)
+    series = before.drop(columns=imputed_cols)
+    for col, imputed in zip(value_cols, imputed_cols):
+        series[col] = series[col].mask(before[imputed])
+    refilled = fill_gaps_by_tract(pd.concat([series, new_rows], ignore_index=True), value_cols, gap_fill)
+
+    # Rows of before keep their order through the stable sort, so they line up with it
+    is_old = refilled.index.to_numpy() < len(before)
+    old = refilled[is_old]
+    differs = np.zeros(len(old), dtype=bool)
+    for col, imputed in zip(value_cols, imputed_cols):
+        now, then = old[col].to_numpy(), before[col].to_numpy()
+        differs |= ~((now == then) | (np.isnan(now) & np.isnan(then)))
+        differs |= old[imputed].to_numpy() != before[imputed].to_numpy()
+    changed = ~is_old
+    changed[is_old] = differs
+
+    final_df = pd.concat([existing[~affected], refilled], ignore_index=True)
+    final_df = final_df.sort_values(by=['GEOID', 'Year'], kind='stable', ignore_index=True)
+    return final_df, refilled[changed].reset_index(drop=True)
+
+
+def append_table(spec, all_years_data, output_filename, crosswalk=None):
+    """
+    Appends newly cleaned years to a table's combined CSV, writing the same file a full build
+    would, and records the rows that changed (tract_changes.py) so build.update_derived can
+    bring the derived files up to date without rebuilding them. Tables written in year order
+    just get the new rows appended; tables that fill gaps are sorted by tract, so they are
+    rewritten, with the gaps of the tracts that have a new row filled again.
+
+    Returns:
+        pandas.DataFrame or None: The new and changed rows, or None if there was nothing to append.
+    """
+    if not all_years_data:
+        print("No data processed. Exiting.")
+        return None
+    data_dir = os.path.dirname(output_filename) or "."
+    if not os.path.exists(output_filename):
+        print(f"{output_filename} doesn't exist yet, so it is written in full.")
+        final_df = combine_years(spec, all_years_data, output_filename, crosswalk)
+        record_changes(spec, None, data_dir, rebuild=True)
+        return final_df
+    current = derived_current(data_dir, output_filename)
+
+    with stage("concat", spec) as timing:
+        new_df = pd.concat(all_years_data, ignore_index=True)
+        new_df['County'] = new_df['County'].astype('category')
+        timing.output(new_df)
+    if crosswalk is not None:
+        with stage("crosswalk", spec) as timing:
+            timing.input(new_df)
+            new_df = crosswalk_table(new_df, spec, crosswalk)
+            timing.output(new_df)
+
+    final_df, changed = None, new_df
+    if spec["gap_fill"]:
+        with stage("gap_fill", spec) as timing:
+            final_df, changed = refill_gaps(read_output(output_filename, spec), new_df, list(spec["columns"]),
+                                            spec["gap_fill"])
+            timing.output(changed)
+    with stage("write", spec) as timing:
+        size = os.path.getsize(output_filename) if final_df is None else 0
+        if final_df is None:
+            new_df.to_csv(output_filename, index=False, mode='a', header=False)
+        else:
+            final_df.to_csv(output_filename, index=False)
+        timing.add(rows_in=len(new_df), bytes_out=os.path.getsize(output_filename) - size if timing else 0)
+    record_changes(spec, changed, data_dir, rebuild=not current)
+    print(f"\nSuccessfully appended {len(new_df)} rows to {output_filename} ({len(changed)} rows new or changed)")
+    return changed
+
+
+def process_table(spec, start_year=2010, end_year=2023, output_filename=None, input_dir=".", use_cache=True,
+                  streaming=False, counties=None, states=None, chunk_size=CHUNK_SIZE, workers=READ_WORKERS,
+                  crosswalk=None, append=False):
+    """
+    Runs one ACS table through the shared cleaning path and writes the combined CSV.
+    Each cleaned year is cached as a partial keyed by the input file's content hash, the
+    spec and the engine code, so only new or changed yearly files are re-processed.
+    Yearly files are read straight out of the downloaded zip archives when they haven't been
+    extracted, and up to `workers` of them are parsed at the same time.
+
+    In streaming mode every yearly file is read in chunks and each finished year is appended
+    to the output CSV straight away, so peak memory depends on one year of the region's
+    tracts rather than on the size of the input files or the number of years. Tables that
+    fill gaps across years or are crosswalked still keep the (narrow) cleaned years until
+    the end. The output is byte-identical to the in-memory path.
+
+    In append mode only the given years are cleaned and added to the existing output (see
+    append_table), once check_append has confirmed that it has the same columns and ends
+    before them; the rows that changed are recorded for build.update_derived.
+
+    Args:
+        spec (dict): The table's spec from table_specs.TABLE_SPECS.
+        start_year (int): The starting year for the data files (e.g., 2010).
+        end_year (int): The ending year for the data files (e.g., 2023).
+        output_filename (str, optional): Name of the output CSV. Defaults to the spec's output.
+        input_dir (str, optional): Directory containing the yearly Data CSVs and/or the zip archives
+                                   downloaded from data.census.gov, or a single archive. Defaults to ".".
+        use_cache (bool, optional): Reuse and store cached per-year partials. Defaults to True.
+        streaming (bool, optional): Read files in chunks and append years to the output. Defaults to False.
+        counties (list, optional): County FIPS codes to keep (e.g. ["06001"]). Defaults to all.
+        states (list, optional): State FIPS codes to keep (e.g. ["06"]). Defaults to all.
+        chunk_size (int, optional): Rows per chunk in streaming mode.
+        workers (int, optional): Yearly files read concurrently. Defaults to READ_WORKERS.
+        crosswalk (tract_crosswalk.Crosswalk, optional): Relationship from 2010 to 2020 tracts
+                                                          to move the 2010-2019 years onto.
+        append (bool, optional): Add the years to the existing output instead of rewriting it.
+
+    Returns:
+        pandas.DataFrame or None: The combined data (the new and changed rows in append mode;
+                                  None in streaming mode, or if no files were processed).
+    """
+    output_filename = output_filename or spec["output"]
+    region = {"counties": counties, "states": states}
+    # A zip archive given as input_dir keeps its cache next to it
+    cache_dir = input_dir if os.path.isdir(input_dir) else input_directory(input_dir)
+    hold_years = append or not streaming or spec["gap_fill"] or crosswalk is not None
+    all_years_data = []
+    rows_written = 0
+
+    def run_year(year_file):
+        # Runs on a worker thread; returns (year, cleaned year or None, whether it came from the cache)
+        year, file_name = year_file
+        return (year,) + build_year(spec, file_name, year, cache_dir, region, use_cache, streaming, chunk_size)
+
+    year_files = []
+    for year in range(start_year, end_year + 1):
+        file_name = locate_table_file(spec, year, input_dir)
+        if file_name is None:
+            print(f"Warning: {spec['file_pattern'].format(year=year)} not found in {input_dir}. Skipping this year.")
+            continue
+        print(f"Processing {file_name} for year {year}...")
+        year_files.append((year, file_name))
+    if append and year_files and os.path.exists(output_filename):
+        check_append(spec, output_filename, [year for year, _ in year_files])
+
+    for year, year_df, cached in map_in_order(run_year, year_files, workers):
+        if cached:
+            print(f"  Using cached partial for {year}.")
+        if year_df is None:
+            continue
+        if hold_years:
+            all_years_data.append(year_df)
+        else:
+            with stage("write", spec, year) as timing:
+                size = os.path.getsize(output_filename) if timing and rows_written else 0
+                year_df.to_csv(output_filename, index=False, mode='w' if rows_written == 0 else 'a',
+                               header=rows_written == 0)
+                timing.add(rows_in=len(year_df), bytes_out=os.path.getsize(output_filename) - size if timing else 0)
+            rows_written += len(year_df)
+
+    if not hold_years:
+        if rows_written == 0:
+            print("No data processed. Exiting.")
+        else:
+            print(f"\nSuccessfully streamed data into {output_filename}")
+            print(f"Final output shape: ({rows_written}, {len(KEY_COLUMNS) + 3 * len(spec['columns']) + 1})")
+        return None
+
+    if append:
+        return append_table(spec, all_years_data, output_filename, crosswalk)
+    final_df = combine_years(spec, all_years_data, output_filename, crosswalk)
+    return None if streaming else final_df
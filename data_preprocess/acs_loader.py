@@ -0,0 +1,366 @@
+import pandas as pd
+import csv
+import glob
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import zipfile
+
+from run_report import is_enabled as stage_enabled, stage
+
+# Use the multithreaded pyarrow CSV parser when it is installed, otherwise pandas' C parser
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = "pyarrow"
+except ImportError:
+    CSV_ENGINE = "c"
+
+# Directory (inside the input directory) holding cached build artifacts
+CACHE_DIR = ".acs_cache"
+HEADER_MAP_FILE = "header_maps.json"
+# Bump when the layout of resolved header maps changes, so cached maps are re-resolved
+HEADER_MAP_VERSION = 3
+
+# Inputs inside a zip archive are addressed as "<archive>.zip!<member>"
+ARCHIVE_SEPARATOR = "!"
+
+# Resolved header maps loaded by this process, per cache file
+_header_maps = {}
+# Yearly files may be read from several threads at once; cache files are updated under this lock
+# (and replaced atomically, since build.py also reads them from several processes)
+_cache_lock = threading.Lock()
+# Data CSV members of the zip archives in each input location, by member base name
+_archive_indexes = {}
+
+
+def rule_for_year(rules, year):
+    """
+    Returns the first column rule whose "years" range contains the given year.
+    Rules without a "years" range apply to every year.
+    """
+    for rule in rules:
+        first, last = rule.get("years", (year, year))
+        if first <= year <= last:
+            return rule
+    return None
+
+
+def resolve_column(columns, rule):
+    """
+    Finds the physical column a rule refers to, by position, exact name(s) or regex pattern.
+
+    Args:
+        columns (list): Column headers of the file being processed.
+        rule (dict): A column rule from a table spec.
+
+    Returns:
+        str or None: The matching column header, or None if the file doesn't have it.
+    """
+    if "position" in rule:
+        position = rule["position"]
+        return columns[position] if position < len(columns) else None
+
+    if "column" in rule:
+        candidates = rule["column"] if isinstance(rule["column"], list) else [rule["column"]]
+        for candidate in candidates:
+            if candidate in columns:
+                return candidate
+        return None
+
+    pattern = re.compile(rule["pattern"])
+    for col_header in columns:
+        if pattern.search(col_header):
+            return col_header
+    return None
+
+
+def split_archive_path(file_name):
+    """
+    Splits "<archive>.zip!<member>" into (archive, member). Plain paths give (None, file_name).
+    """
+    archive, separator, member = file_name.partition(".zip" + ARCHIVE_SEPARATOR)
+    if not separator:
+        return None, file_name
+    return archive + ".zip", member
+
+
+def input_directory(file_name):
+    """
+    Directory holding an input file, or the archive it is read from; its .acs_cache/ lives there.
+    """
+    archive, _ = split_archive_path(file_name)
+    return os.path.dirname(os.path.abspath(archive or file_name))
+
+
+def archive_index(input_location):
+    """
+    Lists the Data CSV members of the zip archives downloaded from data.census.gov.
+    input_location may be a single archive or a directory of them. Only the archives'
+    central directories are read; nothing is extracted.
+
+    Returns:
+        dict: member base name (e.g. "ACSDT5Y2010.B01003-Data.csv") -> "<archive>.zip!<member>"
+    """
+    if os.path.isdir(input_location):
+        archives = sorted(glob.glob(os.path.join(input_location, "*.zip")))
+    else:
+        archives = [input_location] if zipfile.is_zipfile(input_location) else []
+
+    signature = [file_fingerprint(archive) for archive in archives]
+    cached = _archive_indexes.get(input_location)
+    if cached is None or cached[0] != signature:
+        index = {}
+        for archive in archives:
+            with zipfile.ZipFile(archive) as zf:
+                for member in zf.namelist():
+                    if member.endswith("-Data.csv"):
+                        index.setdefault(os.path.basename(member), f"{archive}{ARCHIVE_SEPARATOR}{member}")
+        cached = _archive_indexes[input_location] = (signature, index)
+    return cached[1]
+
+
+def locate_table_file(spec, year, input_location="."):
+    """
+    Finds a table's Data CSV for one year: an extracted file in the input directory if there
+    is one, otherwise the matching member of a downloaded zip archive.
+
+    Args:
+        spec (dict): The table's spec from table_specs.TABLE_SPECS.
+        year (int): The ACS year.
+        input_location (str): Directory of Data CSVs and/or zip archives, or a single zip archive.
+
+    Returns:
+        str or None: A file path, "<archive>.zip!<member>", or None if the year isn't available.
+    """
+    base_name = spec["file_pattern"].format(year=year)
+    if os.path.isdir(input_location):
+        file_name = os.path.join(input_location, base_name)
+        if os.path.exists(file_name):
+            return file_name
+    return archive_index(input_location).get(base_name)
+
+
+def open_input(file_name):
+    """
+    Opens an input file, or a member of a zip archive, as a binary stream. Archive members
+    are decompressed as they are read, never written to disk.
+    """
+    archive, member = split_archive_path(file_name)
+    if archive is None:
+        return open(file_name, "rb")
+    # The member stream keeps the archive's file handle open until it is closed itself
+    with zipfile.ZipFile(archive) as zf:
+        return zf.open(member)
+
+
+def input_size(file_name):
+    """
+    Uncompressed size in bytes of an input file or zip archive member.
+    """
+    archive, member = split_archive_path(file_name)
+    if archive is None:
+        return os.path.getsize(file_name)
+    with zipfile.ZipFile(archive) as zf:
+        return zf.getinfo(member).file_size
+
+
+def read_header_rows(file_name):
+    """
+    Reads only the two header rows of an ACS Data CSV: S-codes (GEO_ID, NAME, ...) and
+    labels (Geography, Geographic Area Name, ...).
+
+    Returns:
+        tuple: (list of S-codes, list of labels)
+    """
+    with io.TextIOWrapper(open_input(file_name), newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        codes = next(reader, [])
+        labels = next(reader, [])
+    return codes, labels
+
+
+def file_fingerprint(file_name):
+    """
+    Cheap identity for an input: its absolute path, size and modification time. A member of
+    a zip archive is identified by the archive's fingerprint plus the member's size and CRC.
+    """
+    archive, member = split_archive_path(file_name)
+    if archive is not None:
+        with zipfile.ZipFile(archive) as zf:
+            info = zf.getinfo(member)
+        return f"{file_fingerprint(archive)}{ARCHIVE_SEPARATOR}{member}:{info.file_size}:{info.CRC}"
+    stat = os.stat(file_name)
+    return f"{os.path.abspath(file_name)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def resolve_header_map(spec, year, codes, labels):
+    """
+    Resolves which physical columns a spec needs for one year.
+
+    A value's margin of error is the column a rule names under "moe", or else the column
+    whose S-code is the estimate's with the trailing "E" replaced by "M" (B25064_001E ->
+    B25064_001M), whichever header row names the values.
+
+    Returns:
+        dict: "name" and "geo_id" -> column indices of the geographic area name and GEO_ID, and "values" ->
+              output column -> {"source", "denominator", "moe", "denominator_moe": index or None}
+    """
+    header = codes if spec["header_row"] == 0 else labels
+    # First occurrence wins if a header repeats
+    index_of = {col_header: i for i, col_header in reversed(list(enumerate(header)))}
+    code_index = {code: i for i, code in reversed(list(enumerate(codes)))}
+
+    def index(col_header):
+        return index_of.get(col_header) if col_header is not None else None
+
+    def moe_index(estimate, moe_rule=None):
+        if moe_rule is not None:
+            return index(resolve_column(header, moe_rule))
+        if estimate is None or estimate >= len(codes) or not codes[estimate].endswith("E"):
+            return None
+        return code_index.get(codes[estimate][:-1] + "M")
+
+    # GEO_ID is always read from the S-code row, whichever header row names the values
+    geo_id = codes.index("GEO_ID") if "GEO_ID" in codes else None
+    header_map = {"name": index(spec["name_column"]), "geo_id": geo_id, "values": {}}
+    for output_col, rules in spec["columns"].items():
+        rule = rule_for_year(rules, year) or {}
+        source = resolve_column(header, rule) if rule else None
+        denominator = None
+        if "denominator" in rule:
+            denominator = resolve_column(header, {"column": rule["denominator"]})
+        header_map["values"][output_col] = {
+            "source": index(source),
+            "denominator": index(denominator),
+            "moe": moe_index(index(source), rule.get("moe")) if rule else None,
+            "denominator_moe": moe_index(index(denominator)),
+        }
+    return header_map
+
+
+def write_json_atomic(path, data):
+    """
+    Writes JSON to a temporary file and renames it over path, so other processes reading the
+    cache never see a half-written file.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+
+def _header_map_key(spec, year, file_name):
+    spec_json = json.dumps([HEADER_MAP_VERSION, spec["header_row"], spec["name_column"], spec["columns"], year],
+                           sort_keys=True)
+    return hashlib.sha1(f"{file_fingerprint(file_name)}|{spec_json}".encode()).hexdigest()
+
+
+def _header_map_path(file_name):
+    return os.path.join(input_directory(file_name), CACHE_DIR, HEADER_MAP_FILE)
+
+
+def cached_header_map(spec, year, file_name):
+    """
+    Returns the resolved header map for a file, sniffing its header rows only when the
+    file's fingerprint hasn't been seen before. Resolved maps persist in .acs_cache/.
+    """
+    cache_path = _header_map_path(file_name)
+    key = _header_map_key(spec, year, file_name)
+    with _cache_lock:
+        if cache_path not in _header_maps:
+            _header_maps[cache_path] = {}
+            if os.path.exists(cache_path):
+                with open(cache_path) as f:
+                    _header_maps[cache_path] = json.load(f)
+        header_maps = _header_maps[cache_path]
+        if key in header_maps:
+            return header_maps[key]
+
+    codes, labels = read_header_rows(file_name)
+    header_map = resolve_header_map(spec, year, codes, labels)
+    with _cache_lock:
+        header_maps[key] = header_map
+        write_json_atomic(cache_path, header_maps)
+    return header_map
+
+
+def _needed_columns(header_map):
+    needed = {header_map["name"], header_map["geo_id"]}
+    for sources in header_map["values"].values():
+        needed.update(i for i in sources.values() if i is not None)
+    return sorted(needed)
+
+
+def load_table_year(spec, file_name, year):
+    """
+    Parses only the columns a spec needs from one yearly ACS Data CSV (a file on disk or
+    a zip archive member, see locate_table_file).
+    Subject tables have hundreds of S-code columns, but only the name column and one to
+    three estimate columns are ever used, so everything else is skipped by the parser.
+
+    Returns:
+        tuple: (DataFrame of the needed columns as strings, labeled by column index,
+                header map from resolve_header_map)
+    """
+    with stage("header", spec, year):
+        header_map = cached_header_map(spec, year, file_name)
+    if header_map["name"] is None or header_map["geo_id"] is None:
+        return None, header_map
+
+    usecols = _needed_columns(header_map)
+    with stage("read", spec, year) as timing, open_input(file_name) as f:
+        df = pd.read_csv(f, header=None, skiprows=2, usecols=usecols,
+                         dtype={i: str for i in usecols}, engine=CSV_ENGINE)
+        if timing:
+            timing.add(bytes_in=input_size(file_name))
+        timing.output(df)
+    df.columns = usecols
+    return df, header_map
+
+
+def _timed_chunks(reader, spec, year, file_name):
+    bytes_in = input_size(file_name)
+    while True:
+        with stage("read", spec, year) as timing:
+            chunk = next(reader, None)
+            if chunk is not None:
+                timing.add(bytes_in=bytes_in)
+                timing.output(chunk)
+                bytes_in = 0
+        if chunk is None:
+            return
+        yield chunk
+
+
+def iter_table_year_chunks(spec, file_name, year, chunk_size):
+    """
+    Like load_table_year, but yields the needed columns chunk_size rows at a time so a file
+    of any size can be processed in bounded memory. Uses pandas' C parser, which (unlike
+    pyarrow) supports chunked reads.
+
+    Returns:
+        tuple: (iterator of DataFrames labeled by column index, or None, header map)
+    """
+    with stage("header", spec, year):
+        header_map = cached_header_map(spec, year, file_name)
+    if header_map["name"] is None or header_map["geo_id"] is None:
+        return None, header_map
+
+    usecols = _needed_columns(header_map)
+
+    def chunks():
+        with open_input(file_name) as f, pd.read_csv(f, header=None, skiprows=2, usecols=usecols,
+                                                     dtype={i: str for i in usecols},
+                                                     chunksize=chunk_size) as reader:
+            if stage_enabled():
+                # Times each chunk's parse on its own, not the consumer's work between chunks
+                reader = _timed_chunks(reader, spec, year, file_name)
+            for chunk in reader:
+                chunk.columns = usecols
+                yield chunk
+
+    return chunks(), header_map
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+# Plain numbers are parsed with pyarrow compute kernels when pyarrow is installed (the
+# strings read by its CSV parser are already Arrow arrays), otherwise with pd.to_numeric
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+
+# Status of every decoded estimate, stored next to each value column as "<column> Status".
+# Codes are ordered by severity, so combining cells (split tracts, a value and its
+# denominator) keeps the largest one.
+STATUS_OK = 0               # a plain number
+STATUS_BOTTOM_CODED = 1     # "250-": the estimate is at or below the value
+STATUS_TOP_CODED = 2        # "2,000+", "250,000+", "1,000,000+": the estimate is at or above the value
+STATUS_CONTROLLED = 3       # "**", "***", "*****": no sampling error computed (margins of error)
+STATUS_NOT_APPLICABLE = 4   # "(X)"
+STATUS_SUPPRESSED = 5       # "-", "N": too few sample cases, or not available for the geography
+STATUS_MISSING = 6          # empty cell, or the column doesn't exist in the year's file
+STATUS_INVALID = 7          # anything else that isn't a number
+
+STATUS_LABELS = {
+    STATUS_OK: "ok",
+    STATUS_BOTTOM_CODED: "bottom-coded",
+    STATUS_TOP_CODED: "top-coded",
+    STATUS_CONTROLLED: "controlled",
+    STATUS_NOT_APPLICABLE: "not applicable",
+    STATUS_SUPPRESSED: "suppressed",
+    STATUS_MISSING: "missing",
+    STATUS_INVALID: "invalid",
+}
+
+# ACS annotation values that carry no number
+SENTINEL_STATUS = {
+    "-": STATUS_SUPPRESSED,
+    "N": STATUS_SUPPRESSED,
+    "(X)": STATUS_NOT_APPLICABLE,
+    "**": STATUS_CONTROLLED,
+    "***": STATUS_CONTROLLED,
+    "*****": STATUS_CONTROLLED,
+    "": STATUS_MISSING,
+}
+# Plain numbers, the only thing the fast pass parses
+NUMBER_PATTERN = r"^-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?$"
+# Everything else that is a number: thousands separators, surrounding spaces, and estimates
+# top- or bottom-coded by a trailing "+" or "-"
+CODED_PATTERN = r"^(-?\d[\d,]*(?:\.\d+)?(?:[eE][+-]?\d+)?)\s*([+-]?)$"
+STATUS_SUFFIX = " Status"
+# Margins of error are kept next to each value column as "<column> MoE"
+MOE_SUFFIX = " MoE"
+# Tables that fill gaps across years mark the filled values in "<column> Imputed"
+IMPUTED_SUFFIX = " Imputed"
+
+
+def status_column(column):
+    """
+    Name of the status column stored next to a value column ("Median_Gross_Rent Status").
+    """
+    return f"{column}{STATUS_SUFFIX}"
+
+
+def moe_column(column):
+    """
+    Name of the margin of error column stored next to a value column ("Median_Gross_Rent MoE").
+    """
+    return f"{column}{MOE_SUFFIX}"
+
+
+def imputed_column(column):
+    """
+    Name of the column marking the filled gaps of a value column ("25_Plus_... Imputed").
+    """
+    return f"{column}{IMPUTED_SUFFIX}"
+
+
+def _parse_numbers(raw):
+    # float64 values of the cells that are plain numbers, NaN elsewhere (writable)
+    if pa is not None:
+        strings = pa.array(raw, from_pandas=True, type=pa.large_string())
+        numbers = pc.if_else(pc.match_substring_regex(strings, NUMBER_PATTERN), strings, None)
+        return pc.cast(numbers, pa.float64()).to_numpy(zero_copy_only=False).copy()
+    # pd.to_numeric also takes "inf", "+5" or "1.", which the pattern leaves to the slow path
+    numbers = raw.where(raw.astype("string").str.fullmatch(NUMBER_PATTERN).fillna(False).astype(bool))
+    return pd.to_numeric(numbers, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+
+
+def decode_estimates(raw):
+    """
+    Decodes one column of raw ACS estimate strings into numbers and per-cell status codes.
+    Plain numbers are parsed in one vectorized pass first; only the cells that fail (a few
+    percent at most) are matched against the annotation values, so no full string copy of
+    the column is ever made.
+
+    Args:
+        raw (pandas.Series): Estimate strings as read from a Data CSV (NaN for empty cells).
+
+    Returns:
+        tuple: (float64 numpy array of values, NaN where there is no number;
+                int8 numpy array of STATUS_* codes)
+    """
+    if pd.api.types.is_numeric_dtype(raw):
+        # A column the CSV parser already read as numbers has nothing to decode
+        values = raw.to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+        return values, np.where(np.isnan(values), STATUS_MISSING, STATUS_OK).astype(np.int8)
+
+    values = _parse_numbers(raw)
+    status = np.zeros(len(values), dtype=np.int8)
+    failed = np.flatnonzero(np.isnan(values))
+    if len(failed) == 0:
+        return values, status
+
+    strings = raw.iloc[failed]
+    empty = strings.isna().to_numpy()
+    status[failed[empty]] = STATUS_MISSING
+    failed, strings = failed[~empty], strings[~empty].astype(str).str.strip()
+    if len(failed) == 0:
+        return values, status
+
+    sentinel = strings.map(SENTINEL_STATUS).to_numpy(dtype=np.float64, na_value=np.nan)
+    known = ~np.isnan(sentinel)
+    status[failed[known]] = sentinel[known]
+    failed, strings = failed[~known], strings[~known]
+    if len(failed) == 0:
+        return values, status
+
+    coded = strings.str.extract(CODED_PATTERN)
+    is_coded = coded[0].notna().to_numpy()
+    status[failed] = STATUS_INVALID
+    if is_coded.any():
+        numbers = coded[0][is_coded].str.replace(",", "", regex=False).astype(np.float64).to_numpy()
+        values[failed[is_coded]] = numbers
+        suffix = coded[1][is_coded].to_numpy()
+        status[failed[is_coded]] = np.select([suffix == "+", suffix == "-"], [STATUS_TOP_CODED, STATUS_BOTTOM_CODED],
+                                             STATUS_OK)
+    return values, status
@@ -0,0 +1,354 @@
+import numpy as np
+import pandas as pd
+import argparse
+import csv
+import io
+import os
+import zipfile
+
+# Writes realistic fake ACS Data CSVs for the six tables, so the filter scripts can be run and
+# benchmarked without downloading anything. The files reproduce the quirks the cleaning code
+# handles: two header rows, B01003's swapped 2010 columns, S1501's 2018 change from a percentage
+# to a count, top-coded ("2,000+") and suppressed ("-", "***", "N") estimates, relabeled headers,
+# comma vs semicolon name delimiters, split tracts listed twice and tracts split in 2020.
+
+# Bay Area counties with their (approximate) number of census tracts
+BAY_AREA_COUNTIES = [
+    ("001", "Alameda", 361),
+    ("013", "Contra Costa", 208),
+    ("041", "Marin", 56),
+    ("055", "Napa", 40),
+    ("075", "San Francisco", 197),
+    ("081", "San Mateo", 158),
+    ("085", "Santa Clara", 372),
+    ("095", "Solano", 96),
+    ("097", "Sonoma", 99),
+]
+CALIFORNIA = 6
+
+# Share of tracts that are split in 2020 into .01 and .02, and of rows listed twice
+SPLIT_2020_RATE = 0.04
+DUPLICATE_ROW_RATE = 0.003
+# Share of estimates suppressed ("-") and of margins of error replaced by "***"
+SUPPRESSED_RATE = 0.02
+MOE_SENTINEL_RATE = 0.05
+
+# Relationship file written next to the Data CSVs, in the Census Bureau's 2020-to-2010 tract format
+RELATIONSHIP_FILE = "tab20_tract20_tract10_synthetic.txt"
+
+# Filler estimate/MoE columns around the used ones, so subject tables are as wide as the real downloads
+FILLER_COLUMNS = {"S1901": 60, "S2506": 80, "S1501": 120}
+
+
+def synthetic_tracts(scale=1, seed=0):
+    """
+    Builds the synthetic tract list: the nine Bay Area counties, repeated into additional
+    made-up counties and states when scale > 1, with per-tract base levels and growth rates.
+
+    Args:
+        scale (float): 1 for Bay Area size, 10 or 100 for larger extracts, below 1 for a sample.
+        seed (int): Random seed.
+
+    Returns:
+        pandas.DataFrame: One row per tract (with its 2010 boundaries).
+    """
+    rng = np.random.default_rng(seed)
+    copies = max(1, int(scale))
+    per_county = scale / copies
+    other_states = [s for s in range(1, 57) if s != CALIFORNIA]
+
+    parts = []
+    for copy in range(copies):
+        # The first copy is the real Bay Area; the others get made-up states and county codes
+        state = CALIFORNIA if copy == 0 else other_states[(copy - 1) % len(other_states)]
+        county_offset = 0 if copy == 0 else 100 * ((copy - 1) // len(other_states))
+        state_name = "California" if copy == 0 else f"State {state:02d}"
+        for county_code, county_name, n_tracts in BAY_AREA_COUNTIES:
+            n = max(1, int(round(n_tracts * per_county)))
+            suffix = rng.choice([0, 0, 0, 0, 0, 0, 1, 2], size=n)
+            parts.append(pd.DataFrame({
+                "state": state,
+                "county": int(county_code) + county_offset,
+                "county_name": county_name if copy == 0 else f"{county_name} {copy}",
+                "state_name": state_name,
+                "tract": (1000 + 2 * np.arange(n)) * 100 + suffix,
+            }))
+    tracts = pd.concat(parts, ignore_index=True)
+
+    n = len(tracts)
+    gentrifying = rng.random(n) < 0.1
+    tracts["split_2020"] = (tracts["tract"] % 100 == 0) & (rng.random(n) < SPLIT_2020_RATE)
+    tracts["population"] = np.clip(rng.normal(4200, 1200, n), 500, None)
+    tracts["population_growth"] = rng.normal(0.005, 0.01, n)
+    tracts["vacancy_rate"] = rng.beta(2, 30, n)
+    tracts["rent"] = rng.lognormal(np.log(1400), 0.3, n)
+    tracts["rent_growth"] = rng.normal(0.04, 0.01, n) + 0.04 * gentrifying
+    tracts["income"] = rng.lognormal(np.log(80000), 0.45, n)
+    tracts["income_growth"] = rng.normal(0.035, 0.015, n) + 0.03 * gentrifying
+    tracts["home_value"] = rng.lognormal(np.log(550000), 0.45, n)
+    tracts["home_value_growth"] = rng.normal(0.05, 0.02, n) + 0.04 * gentrifying
+    tracts["bachelors_share"] = rng.beta(3, 4, n)
+    tracts["bachelors_growth"] = rng.normal(0.005, 0.003, n) + 0.01 * gentrifying
+    return tracts
+
+
+def tracts_for_year(tracts, year, rng):
+    """
+    Rows listed in one year's files: tracts split in 2020 appear as two halves from 2020 on,
+    and a few rows are listed twice (split tracts sharing a GEO_ID).
+    """
+    if year >= 2020:
+        split = tracts[tracts["split_2020"]]
+        halves = []
+        for suffix in (1, 2):
+            half = split.copy()
+            half["tract"] = half["tract"] + suffix
+            half["population"] = half["population"] / 2
+            halves.append(half)
+        rows = pd.concat([tracts[~tracts["split_2020"]]] + halves, ignore_index=True)
+    else:
+        rows = tracts
+    duplicates = rows[rng.random(len(rows)) < DUPLICATE_ROW_RATE]
+    return pd.concat([rows, duplicates], ignore_index=True)
+
+
+def geo_ids(rows):
+    return ("1400000US" + rows["state"].map("{:02d}".format) + rows["county"].map("{:03d}".format)
+            + rows["tract"].map("{:06d}".format)).to_numpy()
+
+
+def tract_names(rows, year):
+    """
+    "Census Tract 4001.02, Alameda County, California", with semicolons from 2020 on.
+    """
+    delimiter = ";" if year >= 2020 else ","
+    number = rows["tract"] // 100
+    suffix = rows["tract"] % 100
+    label = number.astype(str).where(suffix == 0, number.astype(str) + "." + suffix.map("{:02d}".format))
+    return ("Census Tract " + label + delimiter + " " + rows["county_name"] + " County" + delimiter + " "
+            + rows["state_name"]).to_numpy()
+
+
+def _grown(rows, level, growth, year, rng, noise=0.03):
+    return rows[level].to_numpy() * (1 + rows[growth].to_numpy()) ** (year - 2010) * rng.lognormal(0, noise, len(rows))
+
+
+def _counts(values):
+    return np.array(list(map(str, np.round(values).astype(np.int64).tolist())), dtype=object)
+
+
+def _suppress(values, rng, rate=SUPPRESSED_RATE, sentinels=("-",)):
+    values = values.copy()
+    hit = rng.random(len(values)) < rate
+    values[hit] = rng.choice(sentinels, size=hit.sum())
+    return values
+
+
+def _top_code(values, top, sentinel):
+    # Estimates at or above the top code are published as e.g. "2,000+"
+    strings = _counts(values)
+    strings[values >= top] = sentinel
+    return strings
+
+
+def _moe(estimates, rng):
+    strings = _counts(np.abs(rng.normal(0.1, 0.04, len(estimates))) * np.nan_to_num(estimates) + 5)
+    return _suppress(strings, rng, MOE_SENTINEL_RATE, ("***", "**", "*****"))
+
+
+def _filler(code, n_columns, rows, rng):
+    # Unused estimate/MoE columns of a subject table: S-code, label and values
+    columns = []
+    for i in range(1, n_columns // 2 + 1):
+        for kind, label in (("E", "Estimate"), ("M", "Margin of Error")):
+            columns.append((f"{code}_C02_{i:03d}{kind}", f"{label}!!Other!!Line {i}",
+                            _counts(rng.integers(0, 5000, len(rows)))))
+    return columns
+
+
+def b01003_columns(rows, year, rng):
+    estimate = _grown(rows, "population", "population_growth", year, rng)
+    columns = [("B01003_001E", "Estimate!!Total", _counts(estimate)),
+               ("B01003_001M", "Margin of Error!!Total", _moe(estimate, rng))]
+    # The 2010 download lists the margin of error before the estimate
+    return columns[::-1] if year == 2010 else columns
+
+
+def b25002_columns(rows, year, rng):
+    units = _grown(rows, "population", "population_growth", year, rng) / 2.6
+    vacant = units * np.clip(rows["vacancy_rate"].to_numpy() * rng.lognormal(0, 0.2, len(rows)), 0, 1)
+    total = "Total:" if year >= 2019 else "Total"
+    columns = []
+    for line, label, values in [("001", total, units), ("002", f"{total}!!Occupied", units - vacant),
+                                ("003", f"{total}!!Vacant", vacant)]:
+        columns.append((f"B25002_{line}E", f"Estimate!!{label}", _counts(values)))
+        columns.append((f"B25002_{line}M", f"Margin of Error!!{label}", _moe(values, rng)))
+    return columns
+
+
+def b25064_columns(rows, year, rng):
+    rent = _grown(rows, "rent", "rent_growth", year, rng)
+    top, sentinel = (2000, "2,000+") if year <= 2014 else (3500, "3,500+")
+    return [("B25064_001E", "Estimate!!Median gross rent", _suppress(_top_code(rent, top, sentinel), rng)),
+            ("B25064_001M", "Margin of Error!!Median gross rent", _moe(rent, rng))]
+
+
+def s1901_columns(rows, year, rng):
+    income = _grown(rows, "income", "income_growth", year, rng)
+    estimate = _top_code(income, 250000, "250,000+")
+    estimate[income < 2500] = "2,500-"
+    prefix = "Estimate!!Households!!" if year >= 2017 else "Households!!Estimate!!"
+    moe_prefix = prefix.replace("Estimate", "Margin of Error")
+    columns = []
+    for line in range(1, 12):
+        share = rng.integers(0, 30, len(rows))
+        columns.append((f"S1901_C01_{line:03d}E", f"{prefix}Income bracket {line}", _counts(share)))
+        columns.append((f"S1901_C01_{line:03d}M", f"{moe_prefix}Income bracket {line}", _counts(share / 5 + 1)))
+    columns.append(("S1901_C01_012E", f"{prefix}Median income (dollars)", _suppress(estimate, rng)))
+    columns.append(("S1901_C01_012M", f"{moe_prefix}Median income (dollars)", _moe(income, rng)))
+    return columns + _filler("S1901", FILLER_COLUMNS["S1901"], rows, rng)
+
+
+def s2506_columns(rows, year, rng):
+    value = _grown(rows, "home_value", "home_value_growth", year, rng)
+    top, sentinel = (1000000, "1,000,000+") if year <= 2014 else (2000000, "2,000,000+")
+    columns = []
+    for line in range(1, 40):
+        if line == 9:
+            estimate = _suppress(_top_code(value, top, sentinel), rng, sentinels=("-", "-", "N"))
+            columns.append(("S2506_C01_009E", "Estimate!!Owner-occupied housing units with a mortgage!!VALUE!!Median (dollars)", estimate))
+            columns.append(("S2506_C01_009M", "Margin of Error!!Owner-occupied housing units with a mortgage!!VALUE!!Median (dollars)", _moe(value, rng)))
+        else:
+            count = rng.integers(0, 900, len(rows))
+            columns.append((f"S2506_C01_{line:03d}E", f"Estimate!!Owner-occupied!!Line {line}", _counts(count)))
+            columns.append((f"S2506_C01_{line:03d}M", f"Margin of Error!!Owner-occupied!!Line {line}", _counts(count / 5 + 1)))
+    return columns + _filler("S2506", FILLER_COLUMNS["S2506"], rows, rng)
+
+
+def s1501_columns(rows, year, rng):
+    population = _grown(rows, "population", "population_growth", year, rng)
+    over_25 = population * 0.7
+    share = np.clip(rows["bachelors_share"].to_numpy() + rows["bachelors_growth"].to_numpy() * (year - 2010), 0.01, 0.95)
+    share = np.clip(share * rng.lognormal(0, 0.05, len(rows)), 0.01, 1)
+    if year <= 2017:
+        # Before 2018 line 15 is the percentage with a bachelor's degree or higher
+        bachelors = np.char.mod("%.1f", share * 100).astype(object)
+    else:
+        bachelors = _counts(over_25 * share)
+    over_25_strings = _counts(over_25)
+    # A few tracts have no population 25 and over
+    over_25_strings[rng.random(len(rows)) < 0.01] = "0"
+
+    columns = []
+    for line in range(1, 28):
+        if line == 6:
+            estimate = over_25_strings
+        elif line == 15:
+            estimate = _suppress(bachelors, rng)
+        else:
+            estimate = _counts(rng.integers(0, 900, len(rows)))
+        columns.append((f"S1501_C01_{line:03d}E", f"Estimate!!Total!!Line {line}", estimate))
+        columns.append((f"S1501_C01_{line:03d}M", f"Margin of Error!!Total!!Line {line}", _counts(rng.integers(5, 200, len(rows)))))
+    return columns + _filler("S1501", FILLER_COLUMNS["S1501"], rows, rng)
+
+
+# Column builders and file name patterns per table, matching TABLE_SPECS' file_pattern
+TABLE_WRITERS = {
+    "B01003": ("ACSDT5Y{year}.B01003", b01003_columns),
+    "B25002": ("ACSDT5Y{year}.B25002", b25002_columns),
+    "B25064": ("ACSDT5Y{year}.B25064", b25064_columns),
+    "S1901": ("ACSST5Y{year}.S1901", s1901_columns),
+    "S2506": ("ACSST5Y{year}.S2506", s2506_columns),
+    "S1501": ("ACSST5Y{year}.S1501", s1501_columns),
+}
+
+
+def table_year_csv(table, rows, year, rng):
+    """
+    Renders one yearly Data CSV of a table as text: the S-code row, the label row and the data,
+    quoted like the data.census.gov downloads (including their trailing empty column).
+    """
+    columns = TABLE_WRITERS[table][1](rows, year, rng)
+    codes = ["GEO_ID", "NAME"] + [code for code, _, _ in columns] + [""]
+    labels = ["Geography", "Geographic Area Name"] + [label for _, label, _ in columns] + [""]
+    values = [geo_ids(rows), tract_names(rows, year)] + [values for _, _, values in columns]
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_ALL, lineterminator="\n")
+    writer.writerow(codes)
+    writer.writerow(labels)
+    # No generated value contains a quote, so rows can be joined directly (much faster than csv/to_csv)
+    buffer.writelines('"' + '","'.join(row) + '",""\n' for row in zip(*values))
+    return buffer.getvalue()
+
+
+def write_relationship(tracts, file_name, seed=0):
+    """
+    Writes the 2010 -> 2020 tract relationship of the synthetic tracts, pipe-delimited like
+    the Census Bureau's tab20_tract20_tract10_natl.txt: every tract maps onto itself, except
+    the ones split in 2020, whose land area is divided unevenly between the two halves.
+    """
+    rng = np.random.default_rng([seed, 2020])
+    geoid = pd.Series(geo_ids(tracts)).str[-11:].to_numpy()
+    area = np.round(rng.lognormal(np.log(2e6), 0.8, len(tracts)))
+    split = tracts["split_2020"].to_numpy()
+    first = np.round(area * rng.uniform(0.3, 0.7, len(tracts)))
+
+    def half(suffix):
+        return pd.Series(geo_ids(tracts.assign(tract=tracts["tract"] + suffix))).str[-11:].to_numpy()
+
+    parts = pd.DataFrame({
+        "GEOID_TRACT_20": np.concatenate([geoid[~split], half(1)[split], half(2)[split]]),
+        "GEOID_TRACT_10": np.concatenate([geoid[~split], geoid[split], geoid[split]]),
+        "AREALAND_PART": np.concatenate([area[~split], first[split], area[split] - first[split]]).astype(np.int64),
+    })
+    parts.sort_values(["GEOID_TRACT_20", "GEOID_TRACT_10"]).to_csv(file_name, sep="|", index=False)
+
+
+def generate(output_dir, scale=1, start_year=2010, end_year=2023, seed=0, tables=None, as_zip=False):
+    """
+    Writes synthetic Data CSVs for every table and year into output_dir, plus the tract
+    relationship file (RELATIONSHIP_FILE) for crosswalking the 2010-2019 years.
+
+    Args:
+        output_dir (str): Directory to write into (created if needed).
+        scale (float, optional): Size relative to the Bay Area (about 1,600 tracts). Defaults to 1.
+        start_year (int, optional): First ACS year. Defaults to 2010.
+        end_year (int, optional): Last ACS year. Defaults to 2023.
+        seed (int, optional): Random seed; the same seed always produces the same files. Defaults to 0.
+        tables (list, optional): Table codes to write. Defaults to all six.
+        as_zip (bool, optional): Write each table and year as a zip archive like the
+                                 data.census.gov downloads instead of a bare CSV. Defaults to False.
+
+    Returns:
+        int: Number of tracts (2010 boundaries) in the generated files.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    tracts = synthetic_tracts(scale, seed)
+    for year in range(start_year, end_year + 1):
+        rows = tracts_for_year(tracts, year, np.random.default_rng([seed, year]))
+        for table_index, table in enumerate(tables or TABLE_WRITERS):
+            stem = TABLE_WRITERS[table][0].format(year=year)
+            text = table_year_csv(table, rows, year, np.random.default_rng([seed, year, table_index]))
+            if as_zip:
+                with zipfile.ZipFile(os.path.join(output_dir, f"{stem}.zip"), "w", zipfile.ZIP_DEFLATED) as zf:
+                    zf.writestr(f"{stem}-Data.csv", text)
+                    zf.writestr(f"{stem}-Column-Metadata.csv", '"Column Name","Label"\n')
+            else:
+                with open(os.path.join(output_dir, f"{stem}-Data.csv"), "w", newline="") as f:
+                    f.write(text)
+        print(f"Wrote {len(rows)} rows per table for {year}")
+    write_relationship(tracts, os.path.join(output_dir, RELATIONSHIP_FILE), seed)
+    return len(tracts)
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic ACS Data CSVs for the six tables.")
+    parser.add_argument("output_dir", help="directory to write the files into")
+    parser.add_argument("--scale", type=float, default=1, help="size relative to the Bay Area (1, 10, 100, ...)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--zip", action="store_true", help="write zip archives like the data.census.gov downloads")
+    args = parser.parse_args()
+    n_tracts = generate(args.output_dir, args.scale, seed=args.seed, as_zip=args.zip)
+    print(f"Generated {n_tracts} tracts into {args.output_dir}")
@@ -1,54 +1,27 @@
-import pandas as pd
-import glob
-import os
+from acs_engine import process_table
+from table_specs import TABLE_SPECS
 
-def process_census_data(input_dir=".", output_file="total_pop.csv"):
+def process_census_data(input_dir=".", output_file="total_pop.csv", streaming=False, append=False,
+                        start_year=2010, end_year=2023):
     """
-    Processes ACS data files for Bay Area counties, performs data cleaning and aggregation,
-    handling a column swap in the 2010 file.
+    Processes ACS total population data files for Bay Area counties through the shared engine,
+    handling the column swap in the 2010 file.
 
     Args:
         input_dir (str, optional): Directory containing the input CSV files. Defaults to ".".
-        output_file (str, optional): Name of the output CSV file. Defaults to "bay_area_population.csv".
+        output_file (str, optional): Name of the output CSV file. Defaults to "total_pop.csv".
+        streaming (bool, optional): Read the yearly files in chunks and append each year to the
+                                    output, keeping memory bounded. Defaults to False.
+        append (bool, optional): Only add the years from start_year to end_year to the existing
+                                 output, after checking its columns and that it ends before them.
+                                 Defaults to False.
+        start_year (int, optional): The first year to process. Defaults to 2010.
+        end_year (int, optional): The last year to process. Defaults to 2023.
     """
-    all_data = []
-    file_pattern = os.path.join(input_dir, "ACSDT5Y*.B01003-Data.csv")
-    all_files = glob.glob(file_pattern)
-
-    for file in all_files:
-        year = file.split("Y")[1][:4]
-        df = pd.read_csv(file, skiprows=[0])
-
-        if year == '2010':
-            # Handle the swapped columns for 2010
-            df = df.iloc[:, [1, 3, 2]]
-            df.columns = ["Geographic Area Name", "Estimate!!Total", "Margin of Error!!Total"]
-        else:
-            # Standard column order for other years
-            df = df.iloc[:, [1, 2, 3]]
-            df.columns = ["Geographic Area Name", "Estimate!!Total", "Margin of Error!!Total"]
-
-        # Split "Geographic Area Name"
-        df[['Tract Info', 'County', 'State']] = df['Geographic Area Name'].str.split(r',|;', expand=True)
-
-        # Extract Tract ID and clean County name
-        df['Tract ID'] = df['Tract Info'].str.replace("Census Tract ", "").str.strip()
-        df['County'] = df['County'].str.replace(" County", "").str.strip()
-
-        # Add Year column
-        df['Year'] = year
-
-        # Select and reorder columns
-        df_processed = df[['Tract ID', 'County', 'Estimate!!Total', 'Year']]
-
-        all_data.append(df_processed)
-
-    # Concatenate all yearly data
-    combined_df = pd.concat(all_data, ignore_index=True)
-
-    # Save to a single CSV file
-    combined_df.to_csv(output_file, index=False)
+    return process_table(TABLE_SPECS["B01003"], start_year, end_year, output_file, input_dir=input_dir,
+                         streaming=streaming, append=append)
 
+# --- Main execution block ---
 if __name__ == "__main__":
     process_census_data()
     print(f"Processed data saved to total_pop.csv, handling 2010 column swap.")
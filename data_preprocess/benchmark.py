@@ -0,0 +1,260 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+# Peak memory is read from /proc on Linux and from resource elsewhere on Unix; on Windows it isn't measured
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from acs_loader import CACHE_DIR
+from acs_synth import generate
+
+BASELINES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baselines.json")
+DEFAULT_WORK_DIR = os.path.join(tempfile.gettempdir(), "acs_bench")
+# A case regresses when it is this much slower or larger than its baseline,
+# ignoring differences below the noise floors
+TIME_TOLERANCE = 0.5
+MEMORY_TOLERANCE = 0.25
+TIME_NOISE_FLOOR = 0.1
+MEMORY_NOISE_FLOOR = 10
+# Worker processes of the parallel stages, fixed so time and peak memory don't depend on the machine's CPUs
+BENCH_WORKERS = 1
+
+# Benchmark cases: name -> (module, function). Every filter script's entry point runs on
+# a cold cache; the end-to-end builds run all six, then the panel, county shards and scores
+# (without intervals), and score_intervals times the Monte Carlo intervals of those scores.
+FILTER_CASES = {
+    "b01003": ("b01003_data_filter", "process_census_data"),
+    "b25002": ("b25002_data_filter", "clean_and_process_occupancy_status_data"),
+    "b25064": ("b25064_data_filter", "clean_and_process_gross_rent_data"),
+    "s1901": ("s1901_data_filter", "clean_and_process_household_income_data"),
+    "s2506": ("s2506_data_filter", "clean_and_process_median_income_data"),
+    "s1501": ("s1501_data_filter", "clean_and_process_educational_attainment_data"),
+}
+CASES = list(FILTER_CASES) + ["end_to_end", "end_to_end_cached", "score_intervals"]
+
+
+def end_to_end_build():
+    """
+    Runs the whole preprocessing build in the current directory: the six filter scripts,
+    the tract x year panel, the county shards, the gentrification scores and the aggregate cubes.
+    The score intervals are left out; they are their own case.
+    """
+    from importlib import import_module
+    from county_cube import write_county_cubes
+    from county_shards import write_county_shards
+    from gentrification_score import write_scores
+    from panel import build_panel, write_panel
+
+    for module, function in FILTER_CASES.values():
+        getattr(import_module(module), function)()
+    write_panel(build_panel())
+    write_county_shards()
+    write_scores(replicates=0, workers=BENCH_WORKERS)
+    write_county_cubes()
+
+
+def score_interval_inputs():
+    """
+    The tract array and scores the intervals are drawn for, running the end-to-end build
+    first if the data directory hasn't been built yet.
+    """
+    from gentrification_score import SCORE_ATTRS, compute_scores
+    from tract_store import load_tract_array
+
+    array = load_tract_array(".", SCORE_ATTRS)
+    if array is None:
+        end_to_end_build()
+        array = load_tract_array(".", SCORE_ATTRS)
+    return array, compute_scores(array)
+
+
+def _proc_status_mb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def _start_memory_mb():
+    """
+    Resident memory before a case runs. On Linux the peak-RSS counter is reset as well, since
+    ru_maxrss is inherited from the parent process and would hide the case's own peak.
+    """
+    if os.path.exists("/proc/self/clear_refs"):
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return _proc_status_mb("VmRSS")
+    if resource is None:
+        return None
+    return _max_rss_mb()
+
+
+def _max_rss_mb():
+    if os.path.exists("/proc/self/status"):
+        return _proc_status_mb("VmHWM")
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if platform.system() == "Darwin" else peak / 1024
+
+
+def _run_case(case, data_dir):
+    # Runs in a fresh process, so the peak memory increase covers only this case
+    from importlib import import_module
+
+    os.chdir(data_dir)
+    if case != "end_to_end_cached":
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    if case in FILTER_CASES:
+        module, function = FILTER_CASES[case]
+        run = getattr(import_module(module), function)
+    elif case == "score_intervals":
+        from score_uncertainty import score_intervals
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            array, scores = score_interval_inputs()
+        def run():
+            score_intervals(array, scores, workers=BENCH_WORKERS)
+    else:
+        import_module("gentrification_score")
+        run = end_to_end_build
+
+    memory_before = _start_memory_mb()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        run()
+    seconds = time.perf_counter() - start
+    peak = _max_rss_mb()
+    return {"seconds": seconds, "peak_mb": None if memory_before is None else peak - memory_before}
+
+
+def prepare_data(scale, work_dir=DEFAULT_WORK_DIR, seed=0):
+    """
+    Returns a directory of synthetic ACS files at the given scale, generating it only if an
+    earlier run hasn't already done so with the same scale and seed.
+    """
+    data_dir = os.path.join(work_dir, f"scale-{scale:g}")
+    marker = os.path.join(data_dir, "synth.json")
+    settings = {"scale": scale, "seed": seed}
+    if os.path.exists(marker):
+        with open(marker) as f:
+            if json.load(f) == settings:
+                return data_dir
+    shutil.rmtree(data_dir, ignore_errors=True)
+    print(f"Generating synthetic ACS data at scale {scale:g} into {data_dir}...")
+    with contextlib.redirect_stdout(io.StringIO()):
+        generate(data_dir, scale, seed=seed)
+    with open(marker, "w") as f:
+        json.dump(settings, f)
+    return data_dir
+
+
+def run_benchmarks(scales, cases=CASES, repeat=3, work_dir=DEFAULT_WORK_DIR):
+    """
+    Times and memory-profiles every case at every scale. Each run happens in a fresh process;
+    the fastest time and the largest peak RSS increase over `repeat` runs are kept.
+
+    Returns:
+        dict: scale (as a string) -> case -> {"seconds", "peak_mb"}
+    """
+    results = {}
+    context = get_context("spawn")
+    for scale in scales:
+        data_dir = prepare_data(scale, work_dir)
+        results[f"{scale:g}"] = {}
+        for case in cases:
+            runs = []
+            for _ in range(repeat):
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    runs.append(pool.submit(_run_case, case, data_dir).result())
+            peaks = [run["peak_mb"] for run in runs if run["peak_mb"] is not None]
+            result = {"seconds": round(min(run["seconds"] for run in runs), 4),
+                      "peak_mb": round(max(peaks), 1) if peaks else None}
+            results[f"{scale:g}"][case] = result
+            memory = "n/a" if result["peak_mb"] is None else f"{result['peak_mb']:.1f} MB"
+            print(f"scale {scale:g}  {case:<18} {result['seconds']:8.3f}s  {memory}")
+    return results
+
+
+def find_regressions(results, baselines):
+    """
+    Compares results with stored baselines.
+
+    Returns:
+        list: One message per case that got slower or bigger than the tolerances allow.
+    """
+    regressions = []
+    for scale, cases in results.items():
+        for case, result in cases.items():
+            baseline = baselines.get(scale, {}).get(case)
+            if baseline is None:
+                continue
+            slower = result["seconds"] - baseline["seconds"]
+            if slower > TIME_NOISE_FLOOR and result["seconds"] > baseline["seconds"] * (1 + TIME_TOLERANCE):
+                regressions.append(f"scale {scale} {case}: {result['seconds']:.3f}s vs baseline {baseline['seconds']:.3f}s")
+            if result["peak_mb"] is not None and baseline.get("peak_mb") is not None:
+                bigger = result["peak_mb"] - baseline["peak_mb"]
+                if bigger > MEMORY_NOISE_FLOOR and result["peak_mb"] > baseline["peak_mb"] * (1 + MEMORY_TOLERANCE):
+                    regressions.append(f"scale {scale} {case}: {result['peak_mb']:.1f} MB vs baseline {baseline['peak_mb']:.1f} MB")
+    return regressions
+
+
+def load_baselines(baselines_file=BASELINES_FILE):
+    if not os.path.exists(baselines_file):
+        return {"machine": None, "results": {}}
+    with open(baselines_file) as f:
+        return json.load(f)
+
+
+def save_baselines(results, baselines_file=BASELINES_FILE):
+    """
+    Stores results as the new baselines, merged into any existing ones for other scales.
+    """
+    baselines = load_baselines(baselines_file)
+    baselines["machine"] = {"platform": platform.platform(), "python": platform.python_version(),
+                            "cpus": os.cpu_count()}
+    for scale, cases in results.items():
+        baselines["results"].setdefault(scale, {}).update(cases)
+    with open(baselines_file, "w") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the ACS filter scripts and the end-to-end build on synthetic data.")
+    parser.add_argument("--scale", type=float, action="append",
+                        help="data size relative to the Bay Area; repeat for several (default: 1)")
+    parser.add_argument("--case", action="append", choices=CASES, help="case to run; repeat for several (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case (default: 3)")
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR, help="where synthetic data is generated and kept")
+    parser.add_argument("--update-baselines", action="store_true", help=f"store the results in {os.path.basename(BASELINES_FILE)}")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.scale or [1], args.case or CASES, args.repeat, args.work_dir)
+    if args.update_baselines:
+        save_baselines(results)
+        print(f"Baselines written to {BASELINES_FILE}")
+    else:
+        baselines = load_baselines()
+        regressions = find_regressions(results, baselines["results"])
+        if baselines["machine"] and baselines["machine"]["platform"] != platform.platform():
+            print(f"Note: baselines were recorded on {baselines['machine']['platform']}.")
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if not regressions:
+            print("No regressions against the stored baselines.")
+        raise SystemExit(1 if regressions else 0)
@@ -0,0 +1,336 @@
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from acs_engine import CHUNK_SIZE, append_table, build_year, check_append, combine_years
+import run_report
+from acs_loader import input_directory, locate_table_file
+from run_report import stage
+from table_specs import TABLE_SPECS
+from tract_crosswalk import load_relationship
+
+# Named regions for --region; anything else given to --region is read as a JSON region file
+# holding {"counties": [...], "states": [...]} (the same file map_preprocess/filter.js takes)
+REGIONS = {
+    "bay_area": {"counties": ["06001", "06013", "06041", "06055", "06075", "06081", "06085", "06095", "06097"]},
+    "california": {"states": ["06"]},
+}
+
+
+def load_region(region=None, counties=None, states=None):
+    """
+    Resolves a region definition: a named region or region file, plus any extra county and
+    state FIPS codes. Returns {"counties": [...] or None, "states": [...] or None}, where
+    None for both means every tract in the input files.
+    """
+    definition = {}
+    if region in REGIONS:
+        definition = REGIONS[region]
+    elif region is not None:
+        with open(region) as f:
+            definition = json.load(f)
+    counties = list(definition.get("counties") or []) + list(counties or [])
+    states = list(definition.get("states") or []) + list(states or [])
+    return {"counties": sorted({f"{int(c):05d}" for c in counties}) or None,
+            "states": sorted({f"{int(s):02d}" for s in states}) or None}
+
+
+def region_shards(region, max_shards=1):
+    """
+    Splits a region into up to max_shards shards of whole states, in state FIPS order (the
+    order their rows are merged in). Every shard re-reads the whole yearly file, so a region
+    is only split when there are fewer (table, year) files than worker processes. Counties
+    inside a state that is built whole are dropped.
+
+    Returns:
+        list: (shard name or None, {"counties", "states"}) pairs, in merge order.
+    """
+    if region["counties"] is None and region["states"] is None:
+        return [(None, region)]
+    whole_states = set(region["states"] or [])
+    pieces = {state: [] for state in whole_states}
+    for county in region["counties"] or []:
+        if county[:2] not in whole_states:
+            pieces.setdefault(county[:2], []).append(county)
+    states = sorted(pieces)
+    n_shards = max(1, min(max_shards, len(states)))
+    if n_shards == 1:
+        # The same region as process_table would get, so the two share cached partials
+        return [(None, region)]
+
+    shards = []
+    for i in range(n_shards):
+        group = states[i * len(states) // n_shards:(i + 1) * len(states) // n_shards]
+        counties = [county for state in group for county in pieces[state]]
+        shard_states = [state for state in group if not pieces[state]]
+        shards.append((f"{group[0]}-{group[-1]}" if len(group) > 1 else group[0],
+                       {"counties": counties or None, "states": shard_states or None}))
+    return shards
+
+
+def plan_tasks(region, tables=None, start_year=2010, end_year=2023, input_dir=".", workers=1):
+    """
+    Expands a build into (table, year, shard) tasks, skipping yearly files that aren't there.
+    Regions are sharded only as far as needed to give every worker process a task.
+
+    Returns:
+        list: (table, year, file name, shard name, shard region) tuples in merge order.
+    """
+    year_files = []
+    for table in tables or TABLE_SPECS:
+        spec = TABLE_SPECS[table]
+        for year in range(start_year, end_year + 1):
+            file_name = locate_table_file(spec, year, input_dir)
+            if file_name is None:
+                print(f"Warning: {spec['file_pattern'].format(year=year)} not found in {input_dir}. Skipping this year.")
+                continue
+            year_files.append((table, year, file_name))
+
+    shards = region_shards(region, -(-workers // max(1, len(year_files))))
+    return [(table, year, file_name, shard, shard_region)
+            for table, year, file_name in year_files for shard, shard_region in shards]
+
+
+def _run_task(task, cache_dir, use_cache, streaming, chunk_size, report):
+    # Runs in a worker process; hands its run report records back with the result
+    table, year, file_name, shard, shard_region = task
+    if report is not None:
+        run_report.enable(**report)
+    year_df, cached = build_year(TABLE_SPECS[table], file_name, year, cache_dir, shard_region, use_cache,
+                                 streaming, chunk_size, shard)
+    return year_df, cached, run_report.take_records() if report is not None else []
+
+
+def run_build(region, tables=None, start_year=2010, end_year=2023, input_dir=".", output_dir=".",
+              workers=None, use_cache=True, streaming=False, chunk_size=CHUNK_SIZE, crosswalk=None,
+              append=False):
+    """
+    Builds the processed table CSVs for a region on a process pool. Every (table, year, shard)
+    task cleans one yearly file for one region shard; a table is combined and written as
+    soon as all of its tasks are done, always in year and then shard order, so the output
+    doesn't depend on which task finished first. Unsharded builds write the same files as
+    the *_data_filter.py scripts given the same region. In append mode the years are added
+    to the existing CSVs (acs_engine.append_table), which are all checked before any task runs.
+
+    Args:
+        region (dict): Output of load_region.
+        tables (list, optional): TABLE_SPECS keys to build. Defaults to all.
+        input_dir (str, optional): Directory (or zip archive) holding the ACS downloads. Defaults to ".".
+        output_dir (str, optional): Directory the combined CSVs are written to. Defaults to ".".
+        workers (int, optional): Worker processes. Defaults to the number of CPUs.
+        use_cache (bool, optional): Reuse and store cached partials. Defaults to True.
+        streaming (bool, optional): Read each yearly file in chunks. Defaults to False.
+        chunk_size (int, optional): Rows per chunk in streaming mode.
+        crosswalk (tract_crosswalk.Crosswalk, optional): Moves the 2010-2019 years onto 2020 tracts.
+        append (bool, optional): Add the years to the existing CSVs instead of rewriting them.
+
+    Returns:
+        dict: table -> number of rows written (new or changed rows in append mode)
+    """
+    tables = list(tables or TABLE_SPECS)
+    cache_dir = input_dir if os.path.isdir(input_dir) else input_directory(input_dir)
+    workers = workers or os.cpu_count() or 1
+    tasks = plan_tasks(region, tables, start_year, end_year, input_dir, workers)
+    remaining = defaultdict(int)
+    for task in tasks:
+        remaining[task[0]] += 1
+    if append:
+        for table in remaining:
+            output_filename = os.path.join(output_dir, TABLE_SPECS[table]["output"])
+            if os.path.exists(output_filename):
+                check_append(TABLE_SPECS[table], output_filename, [task[1] for task in tasks if task[0] == table])
+    print(f"Building {len(tables)} tables ({len(tasks)} table x year x shard tasks) on {workers} processes...")
+
+    os.makedirs(output_dir, exist_ok=True)
+    report = run_report.settings()
+    results = defaultdict(dict)
+    written = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_run_task, task, cache_dir, use_cache, streaming, chunk_size, report): (order, task)
+                   for order, task in enumerate(tasks)}
+        for future in as_completed(futures):
+            order, (table, year, file_name, shard, _) = futures[future]
+            year_df, cached, records = future.result()
+            run_report.add_records(records)
+            print(f"  {table} {year}{'' if shard is None else ' ' + shard}: "
+                  f"{'cached partial' if cached else file_name}")
+            results[table][order] = year_df
+            remaining[table] -= 1
+            if remaining[table] == 0:
+                spec = TABLE_SPECS[table]
+                years = [results[table][i] for i in sorted(results[table]) if results[table][i] is not None]
+                if append:
+                    final_df = append_table(spec, years, os.path.join(output_dir, spec["output"]), crosswalk)
+                else:
+                    final_df = combine_years(spec, years, os.path.join(output_dir, spec["output"]), crosswalk)
+                written[table] = 0 if final_df is None else len(final_df)
+                del results[table]
+    return written
+
+
+def build_derived(output_dir=".", region=None, county_topology=None, tract_topologies=None):
+    """
+    Builds everything the site reads from the processed CSVs: the panel, the tract store,
+    the county shards, the gentrification scores, the aggregate cubes and the tract trends, and, given a
+    county topology, the region's map files with the scores embedded in the tracts. With
+    tract topologies as well, it also builds the tract adjacency and the hotspot layers.
+    """
+    from county_cube import write_county_cubes
+    from county_shards import write_county_shards
+    from gentrification_score import write_scores
+    from panel import build_panel, write_panel
+    from tract_changes import clear_changes
+    from tract_store import write_store
+    from tract_trends import write_trends
+
+    with stage("panel"):
+        panel = build_panel(output_dir)
+        if panel is None:
+            print("No processed attribute files found. Exiting.")
+            return
+        write_panel(panel, output_dir)
+    counties_dir = os.path.join(output_dir, "counties")
+    with stage("tract_store"):
+        write_store(output_dir)
+    with stage("county_shards"):
+        write_county_shards(output_dir, counties_dir)
+    with stage("scores"):
+        write_scores(output_dir, counties_dir)
+    with stage("county_cubes"):
+        write_county_cubes(output_dir, counties_dir)
+    with stage("trends"):
+        write_trends(output_dir, counties_dir)
+    build_map_layers(output_dir, region, county_topology, tract_topologies)
+    # Rows appended before this build are in it now
+    clear_changes(output_dir)
+
+
+def build_map_layers(output_dir=".", region=None, county_topology=None, tract_topologies=None):
+    """
+    Builds the region's map files from a county topology, with the scores embedded in the
+    tracts, and given tract topologies as well, the tract adjacency and the hotspot layers.
+    """
+    counties_dir = os.path.join(output_dir, "counties")
+    if county_topology is not None:
+        from topology import write_map_files
+
+        with stage("topology"):
+            counties = write_map_files(region or {}, county_topology, tract_topologies, output_dir, counties_dir)
+        if counties:
+            from hotspots import write_hotspots
+            import tract_adjacency
+
+            with stage("adjacency"):
+                topologies = tract_adjacency.tract_topologies(tract_topologies, counties)
+                geoids, adjacency = tract_adjacency.build_adjacency(topologies)
+                tract_adjacency.write_adjacency(geoids, adjacency, os.path.join(output_dir, tract_adjacency.ADJACENCY_FILE))
+            with stage("hotspots"):
+                write_hotspots(output_dir, counties_dir)
+
+
+def update_derived(output_dir=".", region=None, county_topology=None, tract_topologies=None):
+    """
+    Brings the derived files up to date with the rows appended to the processed CSVs since
+    they were built (the pending changes of tract_changes.py), recomputing only what depends
+    on the changed tract-years: the panel and tract store take the changed rows, the scores
+    and county medians of the years they affect are computed again, and only the counties
+    they belong to get new shards, score files, cubes and trends. The map files and hotspot layers
+    span the whole region, so they are built again. Falls back to build_derived when the
+    derived files weren't current before the appends or are missing.
+    """
+    from county_cube import write_county_cubes
+    from county_shards import write_county_shards
+    from gentrification_score import write_scores
+    from panel import update_panel
+    from tract_changes import changed_keys, clear_changes, load_changes
+    from tract_store import update_store, write_store
+    from tract_trends import write_trends
+
+    pending = load_changes(output_dir)
+    if pending is None:
+        print("No appended rows to bring the derived files up to date with.")
+        return
+    changes, rebuild = pending
+    if rebuild:
+        print("The derived files weren't current before the rows were appended; building them again.")
+        build_derived(output_dir, region, county_topology, tract_topologies)
+        return
+
+    keys = changed_keys(changes)
+    counties_dir = os.path.join(output_dir, "counties")
+    with stage("panel"):
+        panel = update_panel(output_dir, changes)
+    if panel is None:
+        print("There is no panel to update; building the derived files again.")
+        build_derived(output_dir, region, county_topology, tract_topologies)
+        return
+    print(f"Updating the derived files for {len(keys)} changed tract-years...")
+    with stage("tract_store"):
+        if update_store(output_dir, panel, keys) is None:
+            write_store(output_dir)
+    with stage("county_shards"):
+        write_county_shards(output_dir, counties_dir, keys)
+    with stage("scores"):
+        write_scores(output_dir, counties_dir, changed_keys=keys)
+    with stage("county_cubes"):
+        write_county_cubes(output_dir, counties_dir, keys)
+    with stage("trends"):
+        write_trends(output_dir, counties_dir, changed_keys=keys)
+    build_map_layers(output_dir, region, county_topology, tract_topologies)
+    clear_changes(output_dir)
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the processed ACS tables for a region on a process pool.")
+    parser.add_argument("--region", help=f"named region ({', '.join(REGIONS)}) or a JSON region file")
+    parser.add_argument("--county", action="append", help="county FIPS code to include (e.g. 06001); repeatable")
+    parser.add_argument("--state", action="append", help="state FIPS code to include (e.g. 06); repeatable")
+    parser.add_argument("--table", action="append", choices=list(TABLE_SPECS), help="table to build (default: all)")
+    parser.add_argument("--start-year", type=int, default=2010)
+    parser.add_argument("--end-year", type=int, default=2023)
+    parser.add_argument("--input-dir", default=".", help="directory or zip archive holding the ACS downloads")
+    parser.add_argument("--output-dir", default=".", help="where the processed CSVs (and counties/) are written")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--streaming", action="store_true", help="read each yearly file in chunks")
+    parser.add_argument("--no-cache", action="store_true", help="ignore and don't store cached partials")
+    parser.add_argument("--tables-only", action="store_true",
+                        help="stop after the processed CSVs (skip the panel, tract_store, county_shards, scores, "
+                             "county_cubes, trends, topology, adjacency and hotspots stages)")
+    parser.add_argument("--append", action="store_true",
+                        help="add the years (e.g. --start-year 2024 --end-year 2024) to the existing CSVs and "
+                             "update only the derived files that depend on them")
+    parser.add_argument("--update-derived", action="store_true",
+                        help="skip the tables and bring the derived files up to date with rows appended "
+                             "by the *_data_filter.py scripts")
+    parser.add_argument("--crosswalk", help="tract relationship file to move the 2010-2019 years onto 2020 tracts")
+    parser.add_argument("--crosswalk-weight", help="weight column of the relationship file (default: land area "
+                                                   "for the Census file, population for NHGIS)")
+    parser.add_argument("--county-topology", help="county TopoJSON (e.g. 06.topo.json) to build the region's map files from")
+    parser.add_argument("--tract-topologies", help="directory or zip archive (tracts.zip) of <fips>.topo.json tract files")
+    parser.add_argument("--report", help="write a per-stage run report to this .json or .csv file")
+    parser.add_argument("--profile-dir", help="also dump a cProfile file per stage, table and year here")
+    args = parser.parse_args()
+
+    if args.report or args.profile_dir:
+        run_report.enable(args.profile_dir)
+    start = time.perf_counter()
+    region = load_region(args.region, args.county, args.state)
+    crosswalk = None
+    if args.crosswalk:
+        with stage("crosswalk_load"):
+            crosswalk = load_relationship(args.crosswalk, weight_col=args.crosswalk_weight)
+    if not args.update_derived:
+        run_build(region, args.table, args.start_year, args.end_year, args.input_dir, args.output_dir,
+                  args.workers, not args.no_cache, args.streaming, crosswalk=crosswalk, append=args.append)
+    if args.append or args.update_derived:
+        if not args.tables_only:
+            update_derived(args.output_dir, region, args.county_topology, args.tract_topologies)
+    elif not args.tables_only:
+        build_derived(args.output_dir, region, args.county_topology, args.tract_topologies)
+    print(f"\nBuild finished in {time.perf_counter() - start:.1f}s")
+    if args.report:
+        print(f"Run report written to {run_report.write_report(args.report)}")
@@ -0,0 +1,110 @@
+import pandas as pd
+import glob
+import hashlib
+import json
+import os
+import threading
+from functools import lru_cache
+
+from acs_loader import CACHE_DIR, file_fingerprint, input_directory, open_input, write_json_atomic
+
+# Modules whose source is part of every cache key, so editing the cleaning code
+# invalidates partials built by the old code
+ENGINE_MODULES = ["acs_engine.py", "acs_loader.py", "acs_sentinels.py", "build_cache.py", "tract_keys.py"]
+PARTIALS_DIR = "partials"
+DIGEST_FILE = "file_digests.json"
+
+# sha256 digests of input files, per cache directory, keyed by file fingerprint
+_file_digests = {}
+# Guards _file_digests and the digest files when yearly files are processed in threads
+_digest_lock = threading.Lock()
+
+
+def _cache_root(input_dir):
+    return os.path.join(input_dir, CACHE_DIR)
+
+
+def file_digest(file_name):
+    """
+    sha256 of a file's (or zip archive member's) contents. Digests are remembered per file
+    fingerprint (path, size, mtime), so unchanged inputs aren't re-hashed on every run.
+    """
+    digest_path = os.path.join(_cache_root(input_directory(file_name)), DIGEST_FILE)
+    fingerprint = file_fingerprint(file_name)
+    with _digest_lock:
+        if digest_path not in _file_digests:
+            _file_digests[digest_path] = {}
+            if os.path.exists(digest_path):
+                with open(digest_path) as f:
+                    _file_digests[digest_path] = json.load(f)
+        digests = _file_digests[digest_path]
+        if fingerprint in digests:
+            return digests[fingerprint]
+
+    sha = hashlib.sha256()
+    with open_input(file_name) as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    with _digest_lock:
+        digests[fingerprint] = sha.hexdigest()
+        write_json_atomic(digest_path, digests)
+    return digests[fingerprint]
+
+
+@lru_cache(maxsize=None)
+def code_version():
+    """
+    Hash of the engine's own source, used to invalidate partials when the cleaning code changes.
+    """
+    sha = hashlib.sha256()
+    here = os.path.dirname(os.path.abspath(__file__))
+    for module in ENGINE_MODULES:
+        with open(os.path.join(here, module), "rb") as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+
+def partial_key(spec, file_name, year, options=None):
+    """
+    Cache key of one (table, year) partial: the input file's content hash, the table's
+    spec, any options that change the result (such as a region filter) and the engine
+    code version.
+    """
+    spec_json = json.dumps(spec, sort_keys=True)
+    options_json = json.dumps(options, sort_keys=True, default=str)
+    key = f"{file_digest(file_name)}|{spec_json}|{options_json}|{year}|{code_version()}"
+    return hashlib.sha256(key.encode()).hexdigest()[:20]
+
+
+def _partial_dir(spec, input_dir):
+    table_name = os.path.splitext(spec["output"])[0]
+    return os.path.join(_cache_root(input_dir), PARTIALS_DIR, table_name)
+
+
+def _partial_prefix(year, shard):
+    # Region shards built by build.py keep one partial each per year: "2015.06-<key>.pkl"
+    return f"{year}-" if shard is None else f"{year}.{shard}-"
+
+
+def load_partial(spec, input_dir, year, key, shard=None):
+    """
+    Returns the cached partial for a (table, year[, region shard]) if one exists for this key,
+    otherwise None.
+    """
+    path = os.path.join(_partial_dir(spec, input_dir), f"{_partial_prefix(year, shard)}{key}.pkl")
+    if os.path.exists(path):
+        return pd.read_pickle(path)
+    return None
+
+
+def store_partial(spec, input_dir, year, key, year_df, shard=None):
+    """
+    Saves a (table, year[, region shard]) partial, replacing any stale partials for the same
+    year and shard.
+    """
+    partial_dir = _partial_dir(spec, input_dir)
+    os.makedirs(partial_dir, exist_ok=True)
+    prefix = _partial_prefix(year, shard)
+    for stale in glob.glob(os.path.join(partial_dir, f"{prefix}*.pkl")):
+        os.remove(stale)
+    year_df.to_pickle(os.path.join(partial_dir, f"{prefix}{key}.pkl"))
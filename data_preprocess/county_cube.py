@@ -0,0 +1,217 @@
+import numpy as np
+import json
+import os
+import warnings
+
+from panel import PANEL_ATTRS, YEAR_SCALE
+from tract_keys import fips_string, tract_codes
+from tract_store import load_tract_array
+
+# Quantiles stored per county, year and attribute (the median is the 0.5 entry)
+CUBE_QUANTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+
+
+def _rounded(values, decimals):
+    # Nested lists of rounded values for JSON, with NaN as null
+    rounded = np.round(values, decimals)
+    missing = np.isnan(rounded)
+    return np.where(missing, None, rounded).tolist() if missing.any() else rounded.tolist()
+
+
+def aggregate_cube(array, columns=None):
+    """
+    County x year x attribute statistics over the tracts that have a value, computed the way
+    d3 does for the median table (missing values skipped, zeros kept, linear interpolation).
+
+    Args:
+        array (dict): Output of gentrification_score.build_tract_array.
+        columns (array-like, optional): Year columns to compute (all by default).
+
+    Returns:
+        dict: "count" (counties x years x attrs), "quantiles" (counties x quantiles x years x attrs,
+              NaN where a county has no value) and "median", over the given year columns.
+    """
+    values, county = array["values"], array["county"]
+    if columns is not None:
+        values = values[:, columns]
+    n_counties = len(array["counties"])
+    counts = np.zeros((n_counties,) + values.shape[1:], dtype=np.int64)
+    quantiles = np.full((n_counties, len(CUBE_QUANTILES)) + values.shape[1:], np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        for c in range(n_counties):
+            county_values = values[county == c]
+            counts[c] = (~np.isnan(county_values)).sum(axis=0)
+            quantiles[c] = np.nanquantile(county_values, CUBE_QUANTILES, axis=0)
+    return {"count": counts, "quantiles": quantiles, "median": quantiles[:, CUBE_QUANTILES.index(0.5)]}
+
+
+def stream_series(array):
+    """
+    Per-tract stream graph series: every attribute divided by the tract's own maximum over
+    its years, with missing values counted as 0, as updateStreamGraph in streamGraph.js did.
+    An attribute that is 0 in every year has no defined share and becomes NaN.
+
+    Returns:
+        numpy.ndarray: tracts x years x attrs (only years where the tract has a row are meaningful)
+    """
+    values, present = array["values"], array["present"]
+    filled = np.nan_to_num(values)
+    maxima = np.where(present[:, :, None], filled, -np.inf).max(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return filled / maxima[:, None, :]
+
+
+def county_cubes(array, attrs=PANEL_ATTRS, decimals=6):
+    """
+    Builds the aggregate cube of every county from the tract x year array.
+
+    Args:
+        array (dict): Output of gentrification_score.build_tract_array (or TractStore.tract_array) for attrs.
+
+    Returns:
+        dict: county FIPS -> {"fips", "years", "attributes", "quantiles", "count", "median",
+              "quantile", "stream"}. "median", "count" and "quantile" are indexed
+              [attribute][year] (and [attribute][quantile][year]); "stream" maps each six digit
+              Tract ID to its {"Year": [...], attribute: [...]} series.
+    """
+    stats = aggregate_cube(array)
+    series = stream_series(array)
+    tract_ids = tract_codes(array["geoids"])
+    years = [int(y) for y in array["years"]]
+
+    cubes = {}
+    for c, fips in enumerate(array["counties"].tolist()):
+        stream = {}
+        for t in np.flatnonzero(array["county"] == c):
+            rows = np.flatnonzero(array["present"][t])
+            tract_series = {"Year": [years[y] for y in rows]}
+            tract_series.update(zip(attrs, _rounded(series[t, rows].T, decimals)))
+            stream[tract_ids[t]] = tract_series
+
+        cubes[fips] = {
+            "fips": fips_string(fips),
+            "years": years,
+            "attributes": list(attrs),
+            "quantiles": CUBE_QUANTILES,
+            "median": _rounded(stats["median"][c].T, decimals),
+            "count": stats["count"][c].T.tolist(),
+            "quantile": _rounded(stats["quantiles"][c].transpose(2, 0, 1), decimals),
+            "stream": stream,
+        }
+    return cubes
+
+
+def _county_array(array, c):
+    # The part of a tract x year array belonging to one county
+    tracts = array["county"] == c
+    return dict(array, values=array["values"][tracts], present=array["present"][tracts],
+                geoids=array["geoids"][tracts], county=np.zeros(tracts.sum(), dtype=np.int64),
+                counties=array["counties"][[c]])
+
+
+def updated_county_cubes(array, keys, output_dir="counties", attrs=PANEL_ATTRS, decimals=6):
+    """
+    Updates the cubes of the counties some changed tract-years belong to instead of building
+    every cube again. The statistics of the changed years are computed again, the stream series
+    of the changed tracts rebuilt, and everything else is kept from the existing cube files
+    as written. When the changes add a year, every county's cube gets it. Counties without a
+    cube file are built in full.
+
+    Args:
+        array (dict): Output of TractStore.tract_array for attrs, including the changes.
+        keys (numpy.ndarray): Panel keys (GEOID * 10000 + Year) of the changed tract-years.
+
+    Returns:
+        dict: county FIPS -> cube, for the cubes that changed.
+    """
+    years = [int(y) for y in array["years"]]
+    tract = np.searchsorted(array["geoids"], keys // YEAR_SCALE)
+    changed_tracts = np.unique(tract)
+    changed_counties = np.unique(array["county"][tract])
+    cube_files = {c: os.path.join(output_dir, f"{fips_string(fips)}.cube.json")
+                  for c, fips in enumerate(array["counties"].tolist())}
+    old_cubes = {}
+    for c in changed_counties.tolist():
+        if os.path.exists(cube_files[c]):
+            with open(cube_files[c]) as f:
+                old_cubes[c] = json.load(f)
+    # Every cube covers the same years, so one of them tells whether a year was added
+    known_years = next((cube["years"] for cube in old_cubes.values()), years)
+    columns = np.union1d(np.searchsorted(array["years"], keys % YEAR_SCALE),
+                         np.flatnonzero(~np.isin(array["years"], known_years)))
+    counties = changed_counties if known_years == years else np.arange(len(array["counties"]))
+    stats = aggregate_cube(array, columns)
+    tract_ids = tract_codes(array["geoids"])
+
+    cubes = {}
+    for c in counties.tolist():
+        fips = int(array["counties"][c])
+        if c not in old_cubes and os.path.exists(cube_files[c]):
+            with open(cube_files[c]) as f:
+                old_cubes[c] = json.load(f)
+        if c not in old_cubes:
+            cubes.update(county_cubes(_county_array(array, c), attrs, decimals))
+            continue
+        cube = old_cubes[c]
+        kept = np.searchsorted(years, cube["years"])
+        # Object arrays keep the stored numbers exactly as they were written
+        median = np.empty((len(attrs), len(years)), dtype=object)
+        count = np.zeros((len(attrs), len(years)), dtype=np.int64)
+        quantile = np.empty((len(attrs), len(CUBE_QUANTILES), len(years)), dtype=object)
+        median[:, kept] = np.array(cube["median"], dtype=object).reshape(len(attrs), len(kept))
+        count[:, kept] = np.array(cube["count"], dtype=np.int64).reshape(len(attrs), len(kept))
+        quantile[:, :, kept] = np.array(cube["quantile"], dtype=object).reshape(len(attrs), len(CUBE_QUANTILES), len(kept))
+        median[:, columns] = np.array(_rounded(stats["median"][c].T, decimals), dtype=object)
+        count[:, columns] = stats["count"][c].T
+        quantile[:, :, columns] = np.array(_rounded(stats["quantiles"][c].transpose(2, 0, 1), decimals), dtype=object)
+
+        stream = cube["stream"]
+        county_tracts = changed_tracts[array["county"][changed_tracts] == c]
+        if len(county_tracts):
+            series = stream_series({"values": array["values"][county_tracts], "present": array["present"][county_tracts]})
+            for t, tract_series in zip(county_tracts, series):
+                rows = np.flatnonzero(array["present"][t])
+                stream[tract_ids[t]] = {"Year": [years[y] for y in rows]}
+                stream[tract_ids[t]].update(zip(attrs, _rounded(tract_series[rows].T, decimals)))
+            stream = dict(sorted(stream.items()))
+
+        cubes[fips] = dict(cube, years=years, median=median.tolist(), count=count.tolist(),
+                           quantile=quantile.tolist(), stream=stream)
+    return cubes
+
+
+def write_county_cubes(data_dir=".", output_dir="counties", changed_keys=None):
+    """
+    Writes each county's aggregate cube to <fips>.cube.json next to its shard, so the median
+    table and stream graph index into precomputed values instead of recomputing them from
+    tract rows on every slider change or click.
+
+    Args:
+        data_dir (str, optional): Directory containing the processed attribute CSVs. Defaults to ".".
+        output_dir (str, optional): Directory to write the cube files into. Defaults to "counties".
+        changed_keys (numpy.ndarray, optional): Panel keys of the tract-years changed since the
+                                                cubes were written; only the cubes they affect
+                                                are updated (updated_county_cubes).
+    """
+    array = load_tract_array(data_dir, PANEL_ATTRS)
+    if array is None:
+        print("No processed attribute files found. Exiting.")
+        return
+
+    os.makedirs(output_dir, exist_ok=True)
+    if changed_keys is None:
+        cubes = county_cubes(array)
+    else:
+        cubes = updated_county_cubes(array, changed_keys, output_dir)
+    for fips, cube in cubes.items():
+        cube_file = os.path.join(output_dir, f"{fips_string(fips)}.cube.json")
+        # json.dumps runs in the C encoder; json.dump streams through the much slower pure-Python one
+        with open(cube_file, "w") as f:
+            f.write(json.dumps(cube, separators=(",", ":")))
+        print(f"Wrote the aggregate cube for county {fips_string(fips)} ({len(cube['stream'])} tracts) to {cube_file}")
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    write_county_cubes()
@@ -0,0 +1,67 @@
+import numpy as np
+import json
+import math
+import os
+
+from panel import PANEL_ATTRS, YEAR_SCALE, load_panel
+from tract_keys import county_fips, fips_string, tract_codes
+
+
+def _json_value(value):
+    # Missing values become null; whole numbers are written without a trailing ".0"
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def county_shard(county_df, value_cols=PANEL_ATTRS):
+    """
+    The shard of one county: {"county", "fips", "columns": {name: [values]}} with GEOID, the six
+    digit Tract ID and Year followed by the attribute columns, rows in the order given.
+    """
+    fips = county_fips(county_df['GEOID'].iloc[0])
+    columns = {col: [_json_value(v) for v in county_df[col].tolist()]
+               for col in ['GEOID', 'Tract ID', 'Year'] + value_cols}
+    return {"county": county_df['County'].iloc[0], "fips": fips_string(fips), "columns": columns}
+
+
+def write_county_shards(data_dir=".", output_dir="counties", changed_keys=None):
+    """
+    Writes one pre-merged JSON shard per county covering all six attributes from the
+    tract x year panel (panel.py), so the
+    county page downloads only its own county instead of every CSV.
+    Each shard stores its rows column by column: {"county", "fips", "columns": {name: [values]}},
+    with GEOID and the six digit Tract ID used by the tract topo.json ids.
+
+    Args:
+        data_dir (str, optional): Directory containing the processed attribute CSVs. Defaults to ".".
+        output_dir (str, optional): Directory to write <fips>.json shards into. Defaults to "counties".
+        changed_keys (numpy.ndarray, optional): Panel keys of the tract-years changed since the
+                                                shards were written; only their counties' shards
+                                                are rewritten.
+    """
+    merged = load_panel(data_dir)
+    if merged is None:
+        print("No processed attribute files found. Exiting.")
+        return
+
+    merged['County FIPS'] = county_fips(merged['GEOID'].to_numpy())
+    if changed_keys is not None:
+        merged = merged[merged['County FIPS'].isin(np.unique(county_fips(changed_keys // YEAR_SCALE)))].copy()
+    merged['Tract ID'] = tract_codes(merged['GEOID'])
+    merged = merged.sort_values(by=['County FIPS', 'Year', 'GEOID'])
+
+    os.makedirs(output_dir, exist_ok=True)
+    for fips, county_df in merged.groupby('County FIPS', sort=True):
+        shard = county_shard(county_df)
+        shard_file = os.path.join(output_dir, f"{fips_string(fips)}.json")
+        with open(shard_file, "w") as f:
+            json.dump(shard, f, separators=(",", ":"))
+        print(f"Wrote {len(county_df)} rows for {shard['county']} to {shard_file}")
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    write_county_shards()
@@ -0,0 +1,337 @@
+import numpy as np
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import warnings
+
+from panel import YEAR_SCALE, load_panel
+from tract_keys import county_fips, fips_string, tract_codes
+
+# Attributes used for scoring, in the same order as ATTRS in src/county/dashboards/heatmap.js.
+# The last one (educational attainment) enters the score with its sign reversed.
+SCORE_ATTRS = [
+    "Median_Household_Income",
+    "Median_Home_Value",
+    "Median_Gross_Rent",
+    "Vacant Units",
+    "25_Plus_Bachelors_Degree_Or_Higher_Count",
+]
+REVERSED_ATTRS = ["25_Plus_Bachelors_Degree_Or_Higher_Count"]
+
+HEATMAP_JS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "county", "dashboards", "heatmap.js")
+
+
+def build_tract_array(merged, attrs=SCORE_ATTRS):
+    """
+    Lays the merged attribute table out as a dense tract x year x attribute array.
+
+    Args:
+        merged (pandas.DataFrame): The tract x year panel, or any rows with GEOID, Year and attribute columns.
+        attrs (list): Attribute columns to place on the last axis.
+
+    Returns:
+        dict: "values" (tracts x years x attrs, NaN where missing), "present" (tracts x years,
+              whether the tract has a row that year), "geoids" (GEOID per array row),
+              "county" (county index per tract), "counties" (county FIPS codes) and "years".
+    """
+    years = np.sort(merged['Year'].unique())
+    geoids, tract_index = np.unique(merged['GEOID'].to_numpy(), return_inverse=True)
+    year_index = np.searchsorted(years, merged['Year'].to_numpy())
+
+    values = np.full((len(geoids), len(years), len(attrs)), np.nan)
+    present = np.zeros((len(geoids), len(years)), dtype=bool)
+    columns = [merged[attr].to_numpy(dtype=float) if attr in merged.columns else np.full(len(merged), np.nan)
+               for attr in attrs]
+    values[tract_index, year_index] = np.column_stack(columns)
+    present[tract_index, year_index] = True
+
+    counties, county = np.unique(county_fips(geoids), return_inverse=True)
+    return {"values": values, "present": present, "geoids": geoids, "county": county,
+            "counties": counties, "years": years}
+
+
+def county_medians(values, county, n_counties):
+    """
+    Median of every attribute per county and year over positive, valid tract values,
+    like getMedians in heatmap.js. NaN where a county has no valid value.
+
+    Returns:
+        numpy.ndarray: counties x years x attrs
+    """
+    positive = np.where(values > 0, values, np.nan)
+    medians = np.full((n_counties,) + values.shape[1:], np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        for c in range(n_counties):
+            medians[c] = np.nanmedian(positive[county == c], axis=0)
+    return medians
+
+
+def previous_present_year(present, county, n_counties):
+    """
+    For each county and year, the index of the county's previous year with data (-1 if none).
+    Scores compare each year with the previous year present in the county's data.
+    """
+    county_present = np.zeros((n_counties, present.shape[1]), dtype=bool)
+    np.logical_or.at(county_present, county, present)
+    previous = np.full(county_present.shape, -1)
+    last = np.full(n_counties, -1)
+    for y in range(present.shape[1]):
+        previous[:, y] = last
+        last = np.where(county_present[:, y], y, last)
+    return previous
+
+
+def compute_scores(array, attrs=SCORE_ATTRS, columns=None):
+    """
+    Computes the gentrification score of every tract for every pair of consecutive years
+    at once. For each attribute the term is log(tract growth) - log(county median growth),
+    reversed for educational attainment, and the score is the mean of the terms. A tract-year
+    with any non-positive or missing value (or median) gets no score and lists those attributes.
+
+    Args:
+        array (dict): Output of build_tract_array.
+        attrs (list): Attribute names on the array's last axis.
+        columns (array-like, optional): Sorted year columns to score; the other years get no
+                                        entries, and only the medians these need are computed.
+
+    Returns:
+        dict: "pair" (tracts x years, whether a score entry exists), "score" (tracts x years,
+              NaN if undefined) and "invalid" (tracts x years x attrs, attributes that were undefined).
+    """
+    values, present, county = array["values"], array["present"], array["county"]
+    n_counties = len(array["counties"])
+    every_year = columns is None
+    columns = np.arange(values.shape[1]) if every_year else np.asarray(columns, dtype=np.int64)
+
+    previous = previous_present_year(present, county, n_counties)[county][:, columns]
+    rows = np.arange(values.shape[0])[:, None]
+    prev_index = np.maximum(previous, 0)
+    pair = present[:, columns] & (previous >= 0) & present[rows, prev_index]
+
+    # Medians of the scored years and of the years they are compared with
+    needed = columns if every_year else np.union1d(columns, prev_index)
+    medians = county_medians(values if every_year else values[:, needed], county, n_counties)[county]
+    curr, prev = values if every_year else values[:, columns], values[rows, prev_index]
+    curr_med = medians if every_year else medians[:, np.searchsorted(needed, columns)]
+    prev_med = medians[rows, np.searchsorted(needed, prev_index)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        invalid = ~((curr > 0) & (prev > 0) & (curr_med > 0) & (prev_med > 0))
+        terms = np.log(curr / prev) - np.log(curr_med / prev_med)
+        sign = np.array([-1.0 if attr in REVERSED_ATTRS else 1.0 for attr in attrs])
+        score = np.where(invalid.any(axis=2), np.nan, (terms * sign).sum(axis=2) / len(attrs))
+    if every_year:
+        return {"pair": pair, "score": np.where(pair, score, np.nan), "invalid": invalid & pair[:, :, None]}
+
+    result = {"pair": np.zeros(present.shape, dtype=bool), "score": np.full(present.shape, np.nan),
+              "invalid": np.zeros(present.shape + (len(attrs),), dtype=bool)}
+    result["pair"][:, columns] = pair
+    result["score"][:, columns] = np.where(pair, score, np.nan)
+    result["invalid"][:, columns] = invalid & pair[:, :, None]
+    return result
+
+
+def changed_score_columns(array, keys):
+    """
+    Which scores depend on some changed tract-years. A changed value moves its county's medians
+    in that year, and every score of the county in that year and in the county's next year
+    with data is computed from them (a tract-year new to the county also becomes the next
+    year's previous year).
+
+    Args:
+        array (dict): Output of build_tract_array or TractStore.tract_array, including the changes.
+        keys (numpy.ndarray): Panel keys (GEOID * 10000 + Year) of the changed tract-years.
+
+    Returns:
+        tuple: (sorted year columns to score again, county FIPS codes whose scores change)
+    """
+    tract = np.searchsorted(array["geoids"], keys // YEAR_SCALE)
+    year = np.searchsorted(array["years"], keys % YEAR_SCALE)
+    county = array["county"][tract]
+    n_counties = len(array["counties"])
+    county_present = np.zeros((n_counties, len(array["years"])), dtype=bool)
+    np.logical_or.at(county_present, array["county"], array["present"])
+    following = np.full(county_present.shape, -1)
+    upcoming = np.full(n_counties, -1)
+    for y in range(county_present.shape[1] - 1, -1, -1):
+        following[:, y] = upcoming
+        upcoming = np.where(county_present[:, y], y, upcoming)
+    after = following[county, year]
+    return np.union1d(year, after[after >= 0]), array["counties"][np.unique(county)]
+
+
+def score_records(array, scores, attrs=SCORE_ATTRS, decimals=6, intervals=None):
+    """
+    Turns computed scores into {tractId, year, score, undefinedAttrs} records per county,
+    the shape county.js keeps in its Scores array. Scores are rounded to `decimals` places
+    (None keeps full precision). Given score_uncertainty.score_intervals' output, every
+    record also has its interval ("lower", "upper", null without one) and "reliable".
+
+    Returns:
+        dict: county FIPS -> list of records
+    """
+    def rounded(value):
+        return None if np.isnan(value) else (float(value) if decimals is None else round(float(value), decimals))
+
+    records = {fips: [] for fips in array["counties"].tolist()}
+    tract_ids = tract_codes(array["geoids"])
+    for t, y in np.argwhere(scores["pair"]):
+        record = {
+            "tractId": tract_ids[t],
+            "year": int(array["years"][y]),
+            "score": rounded(scores["score"][t, y]),
+            "undefinedAttrs": [attrs[a] for a in np.flatnonzero(scores["invalid"][t, y])],
+        }
+        if intervals is not None:
+            record["lower"] = rounded(intervals["lower"][t, y])
+            record["upper"] = rounded(intervals["upper"][t, y])
+            record["reliable"] = bool(intervals["reliable"][t, y])
+        records[int(array["counties"][array["county"][t]])].append(record)
+    return records
+
+
+def write_scores(data_dir=".", output_dir="counties", replicates=None, workers=None, changed_keys=None):
+    """
+    Computes gentrification scores for every county and writes them to <fips>.scores.json
+    next to the county shards, so the heatmap doesn't have to run genScore in the browser.
+    Each score goes out with its Monte Carlo confidence interval and reliability flag
+    (score_uncertainty.py). Given the tract-years changed since the files were written, only
+    the years whose scores depend on them are scored again, and only the files of counties
+    with a changed tract-year are rewritten.
+
+    Args:
+        data_dir (str, optional): Directory containing the processed attribute CSVs. Defaults to ".".
+        output_dir (str, optional): Directory to write the score files into. Defaults to "counties".
+        replicates (int, optional): Replicates per score interval (0 leaves the intervals out).
+                                    Defaults to score_uncertainty.REPLICATES.
+        workers (int, optional): Worker processes drawing the replicates. Defaults to the number of CPUs.
+        changed_keys (numpy.ndarray, optional): Panel keys of the changed tract-years
+                                                (tract_changes.changed_keys).
+    """
+    # Imported here because tract_store builds its array with build_tract_array, and
+    # score_uncertainty reuses the scoring helpers
+    from score_uncertainty import REPLICATES, score_intervals
+    from tract_store import load_tract_array
+
+    array = load_tract_array(data_dir, SCORE_ATTRS)
+    if array is None:
+        print("No processed attribute files found. Exiting.")
+        return
+
+    columns, counties = None, None
+    if changed_keys is not None:
+        columns, counties = changed_score_columns(array, changed_keys)
+        counties = set(counties.tolist())
+    start = time.perf_counter()
+    scores = compute_scores(array, columns=columns)
+    print(f"Scored {array['values'].shape[0]} tracts x {len(array['years']) if columns is None else len(columns)} "
+          f"years in {time.perf_counter() - start:.3f}s")
+    replicates = REPLICATES if replicates is None else replicates
+    intervals = None
+    if replicates > 0:
+        start = time.perf_counter()
+        intervals = score_intervals(array, scores, replicates=replicates, workers=workers or os.cpu_count() or 1)
+        print(f"Drew {replicates} replicates per score for {(~np.isnan(intervals['lower'])).sum()} intervals "
+              f"in {time.perf_counter() - start:.2f}s ({intervals['reliable'].sum()} reliable scores)")
+
+    os.makedirs(output_dir, exist_ok=True)
+    for fips, records in score_records(array, scores, intervals=intervals).items():
+        score_file = os.path.join(output_dir, f"{fips_string(fips)}.scores.json")
+        if counties is not None:
+            if fips not in counties:
+                continue
+            if os.path.exists(score_file):
+                # Keep the county's records of the years that weren't scored again, in tract then year order
+                scored_years = set(array["years"][columns].tolist())
+                with open(score_file) as f:
+                    kept = [record for record in json.load(f) if record["year"] not in scored_years]
+                records = sorted(kept + records, key=lambda record: (record["tractId"], record["year"]))
+        with open(score_file, "w") as f:
+            json.dump(records, f, separators=(",", ":"))
+        print(f"Wrote {len(records)} scores for county {fips_string(fips)} to {score_file}")
+
+
+def js_gen_scores(cases):
+    """
+    Runs genScore from heatmap.js under node for a list of {"prev": rows, "curr": rows} cases.
+    """
+    runner = """
+const fs = require("fs");
+const [heatmapFile, inputFile, outputFile] = process.argv.slice(1);
+console.log = () => {};  // genScore logs every undefined attribute
+const source = fs.readFileSync(heatmapFile, "utf8");
+import("data:text/javascript," + encodeURIComponent(source)).then(({ genScore }) => {
+  const cases = JSON.parse(fs.readFileSync(inputFile, "utf8"));
+  const results = cases.map((c) => genScore(c.prev, c.curr).map((s) => ({ ...s, score: s.score === undefined ? null : s.score })));
+  fs.writeFileSync(outputFile, JSON.stringify(results));
+});
+"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_file, output_file = os.path.join(tmp, "cases.json"), os.path.join(tmp, "results.json")
+        with open(input_file, "w") as f:
+            json.dump(cases, f)
+        subprocess.run(["node", "-e", runner, HEATMAP_JS, input_file, output_file], check=True)
+        with open(output_file) as f:
+            return json.load(f)
+
+
+def check_parity(data_dir=".", tolerance=1e-9):
+    """
+    Checks compute_scores against genScore in heatmap.js on the processed data: every
+    county and year pair must produce the same tracts, scores and undefined attributes.
+
+    Returns:
+        bool: True if both implementations agree.
+    """
+    if shutil.which("node") is None:
+        print("node is not installed; cannot run heatmap.js for the parity check.")
+        return False
+
+    merged = load_panel(data_dir)
+    array = build_tract_array(merged)
+    records = score_records(array, compute_scores(array), decimals=None)
+
+    # genScore matches tracts by the six digit Tract ID, within one county at a time
+    merged = merged.drop(columns=['County', 'Coverage'])
+    merged['Tract ID'] = tract_codes(merged['GEOID'])
+    merged['County FIPS'] = county_fips(merged['GEOID'].to_numpy())
+    cases, expected = [], []
+    for fips, county_df in merged.groupby('County FIPS', sort=True):
+        rows = county_df.astype(object).where(county_df.notna(), None).to_dict('records')
+        years = sorted(county_df['Year'].unique())
+        for prev_year, curr_year in zip(years, years[1:]):
+            cases.append({"prev": [r for r in rows if r['Year'] == prev_year],
+                          "curr": [r for r in rows if r['Year'] == curr_year]})
+            expected.append({r["tractId"]: r for r in records[fips] if r["year"] == curr_year})
+
+    mismatches = 0
+    for js_results, python_results in zip(js_gen_scores(cases), expected):
+        js_by_tract = {r["tractId"]: r for r in js_results}
+        if js_by_tract.keys() != python_results.keys():
+            mismatches += 1
+            continue
+        for tract_id, js in js_by_tract.items():
+            py = python_results[tract_id]
+            same_score = (js["score"] is None and py["score"] is None) or (
+                js["score"] is not None and py["score"] is not None and abs(js["score"] - py["score"]) <= tolerance)
+            if not same_score or js["undefinedAttrs"] != py["undefinedAttrs"]:
+                mismatches += 1
+
+    print(f"Parity check: {len(cases)} county/year pairs, {mismatches} mismatches")
+    return mismatches == 0
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute gentrification scores for the county heatmap.")
+    parser.add_argument("--check", action="store_true", help="compare against genScore in heatmap.js instead of writing scores")
+    parser.add_argument("--replicates", type=int, help="Monte Carlo replicates per score interval (0 leaves them out)")
+    parser.add_argument("--workers", type=int, help="worker processes drawing the replicates (default: one per CPU)")
+    args = parser.parse_args()
+    if args.check:
+        raise SystemExit(0 if check_parity() else 1)
+    write_scores(replicates=args.replicates, workers=args.workers)
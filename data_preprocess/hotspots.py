@@ -0,0 +1,342 @@
+import numpy as np
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from scipy import sparse
+
+from county_shards import _json_value
+from gentrification_score import SCORE_ATTRS, compute_scores
+from panel import PANEL_ATTRS
+from tract_adjacency import ADJACENCY_FILE, load_adjacency
+from tract_keys import fips_string
+
+# Spatial statistics of the gentrification score and every attribute over the tract adjacency
+# (tract_adjacency.py), for every year at once: the spatial lag (mean of the neighbours),
+# global Moran's I and local Getis-Ord Gi*, with pseudo p-values from permutation tests.
+# Missing values are left out: a tract without a value that year has no statistics and
+# doesn't count as anyone's neighbour.
+HOTSPOTS_FILE = "hotspots.json"
+SCORE_VARIABLE = "Gentrification_Score"
+# Random permutations per test, and how many make up one parallel task
+PERMUTATIONS = 999
+PERMUTATION_BATCH = 100
+SEED = 0
+
+
+def spatial_lag(adjacency, values, valid):
+    """
+    Mean of each tract's valid neighbours, for every column of values (tracts x years).
+
+    Returns:
+        tuple: (lag, NaN where the tract or all of its neighbours lack a value;
+                number of valid neighbours)
+    """
+    valid = valid.astype(np.float64)
+    neighbours = adjacency @ valid
+    total = adjacency @ np.where(valid > 0, values, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        lag = total / neighbours
+    return np.where((valid > 0) & (neighbours > 0), lag, np.nan), neighbours
+
+
+def _deviations(values, valid):
+    # Deviations from the column mean over valid tracts, 0 elsewhere, and the number of valid tracts
+    n = valid.sum(axis=0)
+    mean = np.where(valid, values, 0.0).sum(axis=0) / np.maximum(n, 1)
+    return np.where(valid, values - mean, 0.0), n
+
+
+def morans_i(adjacency, values, valid):
+    """
+    Global Moran's I of every column of values with row-standardized weights over the valid
+    neighbours: I = n / S0 * sum_i z_i * lag(z)_i / sum_i z_i^2, where S0 counts the valid
+    tracts that have a valid neighbour.
+
+    Returns:
+        numpy.ndarray: One I per column (NaN with fewer than three valid tracts).
+    """
+    z, n = _deviations(values, valid)
+    lag, neighbours = spatial_lag(adjacency, z, valid)
+    linked = valid & (neighbours > 0)
+    s0 = linked.sum(axis=0)
+    cross = np.where(linked, z * np.nan_to_num(lag), 0.0).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        moran = n / s0 * cross / (z ** 2).sum(axis=0)
+    return np.where((n >= 3) & (s0 > 0), moran, np.nan)
+
+
+def getis_ord(adjacency, values, valid):
+    """
+    Local Getis-Ord Gi* of every tract for every column of values, with binary weights over
+    the tract itself and its valid neighbours:
+    Gi* = (sum_j w_ij x_j - mean * W_i) / (S * sqrt((n * W_i - W_i^2) / (n - 1))).
+
+    Returns:
+        numpy.ndarray: Gi* z-scores (tracts x columns), NaN where the tract has no value.
+    """
+    z, n = _deviations(values, valid)
+    weight = adjacency @ valid.astype(np.float64) + 1
+    local = adjacency @ z + z
+    spread = np.sqrt((z ** 2).sum(axis=0) / np.maximum(n, 1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        gi = local / (spread * np.sqrt((n * weight - weight ** 2) / (n - 1)))
+    return np.where(valid & (n >= 3), gi, np.nan)
+
+
+def _fold(larger, permutations):
+    # One-sided pseudo p-value in the direction of the observed statistic
+    return (np.minimum(larger, permutations - larger) + 1) / (permutations + 1)
+
+
+def _draws(rng, population, size, count):
+    # count rows of size distinct indices below population; rows with a repeat are drawn again
+    if size * size > population:
+        return rng.permuted(np.broadcast_to(np.arange(population), (count, population)), axis=1)[:, :size]
+    draws = rng.integers(population, size=(count, size))
+    while True:
+        ordered = np.sort(draws, axis=1)
+        repeated = (ordered[:, 1:] == ordered[:, :-1]).any(axis=1)
+        if not repeated.any():
+            return draws
+        draws[repeated] = rng.integers(population, size=(repeated.sum(), size))
+
+
+def local_permutation_counts(adjacency, z, draws):
+    """
+    Gi* permutation counts of every tract by conditional randomization: the tract keeps its
+    value and its k neighbours' values are replaced by k drawn from the other tracts. As in
+    PySAL, the draws (permutations x max k indices into the n - 1 other tracts) are shared by
+    all tracts, so the permuted neighbour sums of all tracts with k neighbours are the prefix
+    sums of one small array, plus a correction where a tract drew its own index.
+
+    Args:
+        adjacency (scipy.sparse.csr_matrix): Adjacency of the tracts, all valid.
+        z (numpy.ndarray): Their values (deviations from the mean).
+        draws (numpy.ndarray): Distinct indices below n - 1 for each permutation.
+
+    Returns:
+        numpy.ndarray: Number of permutations whose neighbour sum is at least the tract's own.
+    """
+    permutations, n = len(draws), len(z)
+    neighbours = np.diff(adjacency.indptr)
+    observed = adjacency @ z
+    # For tract i the other tracts are z with z[i] replaced by z[n - 1], indexed below n - 1
+    sums = np.cumsum(z[draws], axis=1)
+    ordered = np.sort(sums, axis=0)
+    larger = np.zeros(n, dtype=np.int64)
+    for k in np.unique(neighbours[neighbours > 0]):
+        tracts = np.flatnonzero(neighbours == k)
+        larger[tracts] = permutations - np.searchsorted(ordered[:, k - 1], observed[tracts], side="left")
+    perm, slot = np.nonzero(np.arange(draws.shape[1]) < neighbours[draws])
+    tract = draws[perm, slot]
+    base = sums[perm, neighbours[tract] - 1]
+    corrected = base + z[n - 1] - z[tract]
+    np.add.at(larger, tract, (corrected >= observed[tract]).astype(np.int64) - (base >= observed[tract]))
+    return larger
+
+
+def moran_permutation_counts(adjacency, z, orders, block=1 << 20):
+    """
+    Moran's I permutation counts of several columns over the same valid tracts. n, S0 and the
+    sum of squares don't change under a permutation, so the permuted statistics are compared
+    through sum_i z_i * lag(z)_i. Each permutation is shared by the columns, and as many as fit
+    in `block` values are evaluated as one sparse x dense product.
+
+    Args:
+        adjacency (scipy.sparse.csr_matrix): Adjacency of the tracts, all valid.
+        z (numpy.ndarray): Their values (deviations from the column means), tracts x columns.
+        orders (numpy.ndarray): Permutations of the tracts, one per row.
+
+    Returns:
+        numpy.ndarray: Number of permutations whose statistic is at least the observed one, per column.
+    """
+    n, n_cols = z.shape
+    neighbours = np.diff(adjacency.indptr)
+    weights = sparse.diags(np.where(neighbours > 0, 1 / np.maximum(neighbours, 1), 0.0)) @ adjacency
+    observed = np.einsum("ij,ij->j", z, weights @ z)
+    larger = np.zeros(n_cols, dtype=np.int64)
+    batch = max(1, block // (n * n_cols))
+    for start in range(0, len(orders), batch):
+        order = orders[start:start + batch]
+        shuffled = z[order.T].reshape(n, len(order) * n_cols)
+        statistic = np.einsum("ij,ij->j", shuffled, weights @ shuffled).reshape(len(order), n_cols)
+        larger += (statistic >= observed).sum(axis=0)
+    return larger
+
+
+def _count_batch(task):
+    # Runs in a worker process: one batch of permutations for every group of columns valid on
+    # the same tracts. A permutation of all tracts restricted to a group's tracts is a uniform
+    # permutation of them, so the permutations are drawn once and shared by the groups
+    adjacency, groups, permutations, seed = task
+    rng = np.random.default_rng(seed)
+    n = adjacency.shape[0]
+    orders = rng.permuted(np.broadcast_to(np.arange(n), (permutations, n)), axis=1)
+    local_index = np.full(n, -1)
+    counts = []
+    for rows, values in groups:
+        local_index[:] = -1
+        local_index[rows] = np.arange(len(rows))
+        group_orders = local_index[orders]
+        group_orders = group_orders[group_orders >= 0].reshape(permutations, len(rows))
+        group_adjacency = adjacency[rows][:, rows]
+        z = values - values.mean(axis=0)
+        draws = _draws(rng, len(rows) - 1, max(int(np.diff(group_adjacency.indptr).max()), 1), permutations)
+        local = np.column_stack([local_permutation_counts(group_adjacency, z[:, c], draws)
+                                 for c in range(z.shape[1])])
+        counts.append((moran_permutation_counts(group_adjacency, z, group_orders), local))
+    return counts
+
+
+def tract_variables(data_dir="."):
+    """
+    The gentrification score and every panel attribute as tracts x years arrays.
+
+    Returns:
+        tuple: (build_tract_array dict of the attributes, {variable name: tracts x years array})
+    """
+    from tract_store import load_tract_array
+
+    array = load_tract_array(data_dir, PANEL_ATTRS)
+    if array is None:
+        return None, {}
+    planes = [PANEL_ATTRS.index(attr) for attr in SCORE_ATTRS]
+    scores = compute_scores(dict(array, values=array["values"][:, :, planes]), SCORE_ATTRS)
+    variables = {SCORE_VARIABLE: scores["score"]}
+    for i, attr in enumerate(PANEL_ATTRS):
+        variables[attr] = np.where(array["present"], array["values"][:, :, i], np.nan)
+    return array, variables
+
+
+def compute_hotspots(adjacency, variables, permutations=PERMUTATIONS, workers=1, seed=SEED):
+    """
+    Spatial lag, Moran's I and Gi* (with permutation p-values) of every variable for every year.
+    The observed statistics are computed for all tracts and years at once; the permutation
+    tests run in parallel batches, sharing the permutations between the variables and years
+    with the same valid tracts.
+
+    Args:
+        adjacency (scipy.sparse.csr_matrix): Tract adjacency, rows in the order of the variables.
+        variables (dict): Variable name -> tracts x years array (NaN where missing).
+        permutations (int, optional): Permutations per test (0 skips the tests).
+        workers (int, optional): Worker processes running the permutation tests.
+
+    Returns:
+        dict: variable -> {"lag", "gi", "p" (tracts x years), "moran", "moran_p" (per year)}
+    """
+    adjacency = adjacency.astype(np.float64).tocsr()
+    names = list(variables)
+    valid = {name: ~np.isnan(values) for name, values in variables.items()}
+    results = {}
+    for name, values in variables.items():
+        results[name] = {
+            "lag": spatial_lag(adjacency, values, valid[name])[0],
+            "moran": morans_i(adjacency, values, valid[name]),
+            "gi": getis_ord(adjacency, values, valid[name]),
+            "moran_p": np.full(values.shape[1], np.nan),
+            "p": np.full(values.shape, np.nan),
+        }
+
+    # Columns (variable, year) valid on the same tracts are tested together. The permutations
+    # are split into batches of PERMUTATION_BATCH, one task each with its own seed, so the
+    # results don't depend on the number of workers
+    groups = {}
+    for name in names:
+        for y in range(variables[name].shape[1]):
+            if valid[name][:, y].sum() >= 3:
+                groups.setdefault(valid[name][:, y].tobytes(), []).append((name, y))
+    groups = [(np.flatnonzero(valid[columns[0][0]][:, columns[0][1]]), columns) for columns in groups.values()]
+    group_values = [(rows, np.column_stack([variables[name][rows, y] for name, y in columns]))
+                    for rows, columns in groups]
+    tasks = [(adjacency, group_values, min(PERMUTATION_BATCH, permutations - start), [seed, b])
+             for b, start in enumerate(range(0, permutations if groups else 0, PERMUTATION_BATCH))]
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(_count_batch, tasks))
+    else:
+        outcomes = [_count_batch(task) for task in tasks]
+    for g, (rows, columns) in enumerate(groups if outcomes else []):
+        moran_larger = sum(counts[g][0] for counts in outcomes)
+        local_larger = sum(counts[g][1] for counts in outcomes)
+        linked = np.diff(adjacency[rows][:, rows].indptr) > 0
+        for c, (name, y) in enumerate(columns):
+            results[name]["moran_p"][y] = _fold(moran_larger[c], permutations)
+            results[name]["p"][rows, y] = np.where(linked, _fold(local_larger[:, c], permutations), np.nan)
+    return results
+
+
+def write_hotspots(data_dir=".", output_dir="counties", adjacency_file=None, permutations=PERMUTATIONS,
+                   workers=None, decimals=6):
+    """
+    Computes the hotspot statistics of every tract in the adjacency and writes them as layers
+    the site can ship: hotspots.json in data_dir with Moran's I per variable and year, and
+    <fips>.hotspots.json per county in output_dir, stored column by column like the county
+    shards ({"fips", "columns": {"GEOID", "Year", "<variable> lag", "<variable> Gi*", "<variable> p"}}).
+
+    Args:
+        data_dir (str, optional): Directory with the processed CSVs (and tract_adjacency.npz).
+        output_dir (str, optional): Directory to write the county files into. Defaults to "counties".
+        adjacency_file (str, optional): Adjacency written by tract_adjacency.py.
+        permutations (int, optional): Permutations per test.
+        workers (int, optional): Worker processes for the permutation tests. Defaults to the number of CPUs.
+    """
+    adjacency_file = adjacency_file or os.path.join(data_dir, ADJACENCY_FILE)
+    if not os.path.exists(adjacency_file):
+        print(f"Warning: {adjacency_file} not found. Skipping the hotspot statistics.")
+        return None
+    array, variables = tract_variables(data_dir)
+    if array is None:
+        print("No processed attribute files found. Exiting.")
+        return None
+
+    # Tracts that are both on the map and in the data
+    geoids, adjacency = load_adjacency(adjacency_file)
+    common, map_rows, data_rows = np.intersect1d(geoids, array["geoids"], return_indices=True)
+    adjacency = adjacency[map_rows][:, map_rows]
+    variables = {name: values[data_rows] for name, values in variables.items()}
+    print(f"{len(common)} of {len(array['geoids'])} tracts are on the map ({adjacency.nnz // 2} neighbour pairs)")
+
+    start = time.perf_counter()
+    results = compute_hotspots(adjacency, variables, permutations, workers or os.cpu_count() or 1)
+    print(f"Computed hotspots of {len(variables)} variables x {len(array['years'])} years "
+          f"with {permutations} permutations in {time.perf_counter() - start:.2f}s")
+
+    def rounded(values):
+        return [_json_value(None if np.isnan(v) else round(float(v), decimals)) for v in values]
+
+    years = array["years"].tolist()
+    summary = {"permutations": permutations, "tracts": len(common), "years": years,
+               "moran": {name: {"I": rounded(r["moran"]), "p": rounded(r["moran_p"])} for name, r in results.items()}}
+    with open(os.path.join(data_dir, HOTSPOTS_FILE), "w") as f:
+        json.dump(summary, f, separators=(",", ":"))
+
+    os.makedirs(output_dir, exist_ok=True)
+    present = array["present"][data_rows]
+    county = common // 10 ** 6
+    for fips in np.unique(county):
+        tract, year = np.nonzero(present & (county == fips)[:, None])
+        columns = {"GEOID": common[tract].tolist(), "Year": [years[y] for y in year]}
+        for name, r in results.items():
+            columns[f"{name} lag"] = rounded(r["lag"][tract, year])
+            columns[f"{name} Gi*"] = rounded(r["gi"][tract, year])
+            columns[f"{name} p"] = rounded(r["p"][tract, year])
+        hotspot_file = os.path.join(output_dir, f"{fips_string(fips)}.hotspots.json")
+        with open(hotspot_file, "w") as f:
+            json.dump({"fips": fips_string(fips), "columns": columns}, f, separators=(",", ":"))
+        print(f"Wrote {len(tract)} tract-year hotspot rows for county {fips_string(fips)} to {hotspot_file}")
+    return summary
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute spatial lag, Moran's I and Gi* hotspots per tract and year.")
+    parser.add_argument("--data-dir", default=".", help="directory with the processed CSVs")
+    parser.add_argument("--output-dir", default="counties", help="where the <fips>.hotspots.json files are written")
+    parser.add_argument("--adjacency", help=f"adjacency file from tract_adjacency.py (default: <data-dir>/{ADJACENCY_FILE})")
+    parser.add_argument("--permutations", type=int, default=PERMUTATIONS)
+    parser.add_argument("--workers", type=int, help="worker processes for the permutation tests (default: one per CPU)")
+    args = parser.parse_args()
+    write_hotspots(args.data_dir, args.output_dir, args.adjacency, args.permutations, args.workers)
@@ -0,0 +1,215 @@
+import numpy as np
+import pandas as pd
+import os
+
+from acs_sentinels import moe_column
+from table_specs import TABLE_SPECS
+from tract_keys import county_fips
+
+# Parquet needs pyarrow; without it the panel is stored as a pickle
+try:
+    import pyarrow  # noqa: F401
+    PANEL_FILE = "panel.parquet"
+except ImportError:
+    PANEL_FILE = "panel.pkl"
+
+# Attribute columns of the panel, in TABLE_SPECS order. Bit i of the Coverage column is set
+# when the i-th table has a row for that tract and year.
+PANEL_TABLES = list(TABLE_SPECS)
+PANEL_ATTRS = [col for spec in TABLE_SPECS.values() for col in spec["columns"]]
+# Margin of error of every attribute, in the same order
+PANEL_MOES = [moe_column(col) for col in PANEL_ATTRS]
+YEAR_SCALE = 10000
+
+
+def panel_keys(geoid, year):
+    """
+    Single sortable int64 key per tract and year: GEOID * 10000 + Year.
+    """
+    return np.asarray(geoid, dtype=np.int64) * YEAR_SCALE + np.asarray(year, dtype=np.int64)
+
+
+def read_attribute_table(file_name, value_cols):
+    """
+    Reads one processed attribute CSV with explicit dtypes and the exact values written,
+    keeping the last row for each tract and year (as county.js did when merging in the
+    browser), sorted by key. Value columns the file doesn't have (such as the margins of
+    error of CSVs written before they were kept) are NaN.
+
+    Returns:
+        tuple: (sorted int64 keys, values array rows x value columns, county FIPS -> name dict)
+    """
+    dtypes = {'GEOID': 'int64', 'Year': 'int64', 'County': 'category'}
+    dtypes.update({col: 'float64' for col in value_cols})
+    wanted = {'GEOID', 'County', 'Year'}.union(value_cols)
+    df = pd.read_csv(file_name, usecols=lambda col: col in wanted, dtype=dtypes, float_precision='round_trip')
+
+    keys = panel_keys(df['GEOID'], df['Year'])
+    # Stable sort, then keep the last row of every run of equal keys
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    last = np.append(keys[1:] != keys[:-1], True)
+
+    names = pd.DataFrame({'fips': county_fips(df['GEOID'].to_numpy()), 'County': df['County'].astype(str)})
+    names = names.drop_duplicates(subset='fips')
+    county_names = dict(zip(names['fips'].tolist(), names['County'].tolist()))
+    return keys[last], df.reindex(columns=value_cols).to_numpy(dtype=np.float64)[order][last], county_names
+
+
+def build_panel(data_dir="."):
+    """
+    Outer-joins the six processed attribute CSVs into one tract x year panel.
+    Every table is sorted by its GEOID/Year key once; the union of keys is a stable (timsort)
+    merge of those sorted runs, and each table's values are placed with a binary search, so
+    there is no per-row hash join.
+
+    Args:
+        data_dir (str, optional): Directory containing the processed attribute CSVs. Defaults to ".".
+
+    Returns:
+        pandas.DataFrame or None: One row per tract and year, sorted by GEOID and Year, with
+                                  GEOID, Year, County (categorical), every attribute, its
+                                  margin of error and a Coverage bitmask.
+    """
+    tables = []
+    county_names = {}
+    for code, spec in TABLE_SPECS.items():
+        file_name = os.path.join(data_dir, spec["output"])
+        if not os.path.exists(file_name):
+            print(f"Warning: {file_name} not found. Skipping this attribute.")
+            continue
+        value_cols = list(spec["columns"])
+        value_cols += [moe_column(col) for col in value_cols]
+        keys, values, names = read_attribute_table(file_name, value_cols)
+        county_names.update(names)
+        tables.append((PANEL_TABLES.index(code), value_cols, keys, values))
+
+    if not tables:
+        return None
+
+    all_keys = np.sort(np.concatenate([keys for _, _, keys, _ in tables]), kind='stable')
+    all_keys = all_keys[np.append(True, all_keys[1:] != all_keys[:-1])]
+    panel = pd.DataFrame({'GEOID': all_keys // YEAR_SCALE, 'Year': (all_keys % YEAR_SCALE).astype(np.int16)})
+    coverage = np.zeros(len(all_keys), dtype=np.uint8)
+    for bit, value_cols, keys, values in tables:
+        rows = np.searchsorted(all_keys, keys)
+        for i, col in enumerate(value_cols):
+            column = np.full(len(all_keys), np.nan)
+            column[rows] = values[:, i]
+            panel[col] = column
+        coverage[rows] |= np.uint8(1 << bit)
+
+    for col in PANEL_ATTRS + PANEL_MOES:
+        if col not in panel.columns:
+            panel[col] = np.nan
+    fips = pd.Series(county_fips(panel['GEOID'].to_numpy()))
+    panel.insert(1, 'County', fips.map(county_names).astype('category'))
+    panel['Coverage'] = coverage
+    return panel[['GEOID', 'County', 'Year'] + PANEL_ATTRS + PANEL_MOES + ['Coverage']]
+
+
+def write_panel(panel, data_dir="."):
+    """
+    Writes the panel in a compact binary format (Parquet, or a pickle without pyarrow).
+    """
+    panel_file = os.path.join(data_dir, PANEL_FILE)
+    if panel_file.endswith(".parquet"):
+        panel.to_parquet(panel_file, index=False)
+    else:
+        panel.to_pickle(panel_file)
+    return panel_file
+
+
+def _read_panel_file(panel_file):
+    if panel_file.endswith(".parquet"):
+        return pd.read_parquet(panel_file)
+    return pd.read_pickle(panel_file)
+
+
+def update_panel(data_dir, changes):
+    """
+    Applies the pending changes of some tables (tract_changes.load_changes) to the panel file
+    instead of re-reading every CSV. A changed tract-year takes the table's new values and its
+    coverage bit; tract-years the panel didn't have are inserted in key order.
+
+    Args:
+        data_dir (str): Directory containing the panel file.
+        changes (dict): Table code -> the table's new and changed rows.
+
+    Returns:
+        pandas.DataFrame or None: The updated panel, also written to the panel file, or None if
+                                  there is no panel file to update.
+    """
+    panel_file = os.path.join(data_dir, PANEL_FILE)
+    if not os.path.exists(panel_file):
+        return None
+    panel = _read_panel_file(panel_file)
+    old_keys = panel_keys(panel['GEOID'], panel['Year'])
+    names = pd.DataFrame({'fips': county_fips(panel['GEOID'].to_numpy()), 'County': panel['County'].astype(str)})
+    names = names.drop_duplicates(subset='fips')
+    county_names = dict(zip(names['fips'].tolist(), names['County'].tolist()))
+
+    tables = []
+    for code, rows in changes.items():
+        spec = TABLE_SPECS[code]
+        value_cols = list(spec["columns"])
+        value_cols += [moe_column(col) for col in value_cols]
+        keys = panel_keys(rows['GEOID'], rows['Year'])
+        order = np.argsort(keys, kind='stable')
+        tables.append((PANEL_TABLES.index(code), value_cols, keys[order],
+                       rows.reindex(columns=value_cols).to_numpy(dtype=np.float64)[order]))
+        fips, first_row = np.unique(county_fips(rows['GEOID'].to_numpy()), return_index=True)
+        county_names.update(zip(fips.tolist(), rows['County'].astype(str).iloc[first_row].tolist()))
+
+    all_keys = np.unique(np.concatenate([old_keys] + [keys for _, _, keys, _ in tables]))
+    position = np.searchsorted(all_keys, old_keys)
+    updated = pd.DataFrame({'GEOID': all_keys // YEAR_SCALE, 'Year': (all_keys % YEAR_SCALE).astype(np.int16)})
+    columns = {}
+    for col in PANEL_ATTRS + PANEL_MOES:
+        columns[col] = np.full(len(all_keys), np.nan)
+        columns[col][position] = panel[col].to_numpy(dtype=np.float64)
+    coverage = np.zeros(len(all_keys), dtype=np.uint8)
+    coverage[position] = panel['Coverage'].to_numpy()
+    for bit, value_cols, keys, values in tables:
+        rows = np.searchsorted(all_keys, keys)
+        for i, col in enumerate(value_cols):
+            columns[col][rows] = values[:, i]
+        coverage[rows] |= np.uint8(1 << bit)
+
+    for col in PANEL_ATTRS + PANEL_MOES:
+        updated[col] = columns[col]
+    fips = pd.Series(county_fips(updated['GEOID'].to_numpy()))
+    updated.insert(1, 'County', fips.map(county_names).astype('category'))
+    updated['Coverage'] = coverage
+    updated = updated[['GEOID', 'County', 'Year'] + PANEL_ATTRS + PANEL_MOES + ['Coverage']]
+    write_panel(updated, data_dir)
+    return updated
+
+
+def load_panel(data_dir="."):
+    """
+    Returns the tract x year panel, reading the panel file when it is newer than every
+    attribute CSV and rebuilding (and rewriting) it otherwise.
+    """
+    panel_file = os.path.join(data_dir, PANEL_FILE)
+    sources = [os.path.join(data_dir, spec["output"]) for spec in TABLE_SPECS.values()]
+    newest_source = max((os.path.getmtime(f) for f in sources if os.path.exists(f)), default=0)
+
+    if os.path.exists(panel_file) and os.path.getmtime(panel_file) >= newest_source:
+        return _read_panel_file(panel_file)
+
+    panel = build_panel(data_dir)
+    if panel is not None:
+        write_panel(panel, data_dir)
+    return panel
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    panel = build_panel()
+    if panel is None:
+        print("No processed attribute files found. Exiting.")
+    else:
+        panel_file = write_panel(panel)
+        print(f"Wrote {len(panel)} tract-year rows to {panel_file}")
+        print(f"Final output shape: {panel.shape}")
@@ -0,0 +1,367 @@
+import numpy as np
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from collections import OrderedDict
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from county_shards import _json_value, county_shard
+from panel import PANEL_ATTRS, load_panel
+from tract_keys import county_fips, fips_string, tract_codes
+from tract_store import open_store
+
+# Local HTTP service over the pipeline's output, usable as a drop-in for src/data/: it serves the
+# site (src/) and the data directory like a static server, builds county shards from the in-memory
+# panel when counties/<fips>.json isn't on disk, and answers slice queries under /api/.
+#
+#   GET  /api/counties                              county list with tract counts and years
+#   GET  /api/county/<fips>?years=2015,2016&attrs=A,B  one county's rows, in the shard layout
+#   GET  /api/tract/<geoid>?attrs=A,B               one tract, all years
+#   POST /api/bulk  {"queries": [{"county": "06001", "years": [...], "attrs": [...]}, {"tract": "..."}]}
+
+SITE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+DATA_PREFIX = "/data/"
+# Responses kept in the LRU cache, and the smallest body worth compressing
+CACHE_SIZE = 512
+GZIP_MIN_BYTES = 1024
+MAX_BODY_BYTES = 1 << 20
+
+STATUS_TEXT = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+SHARD_PATH = re.compile(r"^counties/(\d{5})\.json$")
+
+
+class QueryError(Exception):
+    """
+    A request the service can't answer; carries the HTTP status to reply with.
+    """
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _ints(values, name):
+    try:
+        return [int(v) for v in values]
+    except (TypeError, ValueError):
+        raise QueryError(400, f"'{name}' must be integers")
+
+
+def _list_param(query, name):
+    # ?years=2015,2016 and ?years=2015&years=2016 are the same
+    values = [v for item in query.get(name, []) for v in item.split(",") if v]
+    return values or None
+
+
+class PanelStore:
+    """
+    The tract x year panel held in memory column by column, sorted by county, year and GEOID
+    (the county shard order), with row ranges per county. Tract lookups read the memory-mapped
+    tract store (tract_store.py) instead of the panel.
+    """
+    def __init__(self, panel, tracts):
+        panel = panel.copy()
+        panel['Tract ID'] = tract_codes(panel['GEOID'])
+        panel['County FIPS'] = county_fips(panel['GEOID'].to_numpy())
+        self.panel = panel.sort_values(by=['County FIPS', 'Year', 'GEOID'], kind='stable').reset_index(drop=True)
+        self.attrs = list(PANEL_ATTRS)
+        self.tracts = tracts
+
+        fips = self.panel['County FIPS'].to_numpy()
+        self.counties, starts = np.unique(fips, return_index=True)
+        self.county_ranges = dict(zip(self.counties.tolist(), zip(starts.tolist(), starts[1:].tolist() + [len(fips)])))
+
+    def _attrs(self, attrs):
+        if attrs is None:
+            return self.attrs
+        unknown = [a for a in attrs if a not in self.attrs]
+        if unknown:
+            raise QueryError(400, f"unknown attributes: {', '.join(unknown)}")
+        return attrs
+
+    def county_list(self):
+        listing = []
+        for fips, (start, end) in self.county_ranges.items():
+            rows = self.panel.iloc[start:end]
+            listing.append({"fips": fips_string(fips), "county": rows['County'].iloc[0],
+                            "tracts": int(rows['GEOID'].nunique()),
+                            "years": sorted(int(y) for y in rows['Year'].unique())})
+        return listing
+
+    def county(self, fips, years=None, attrs=None):
+        """
+        Rows of one county, optionally for some years and attributes, in the county shard layout.
+        Returns None for an unknown county.
+        """
+        attrs = self._attrs(attrs)
+        span = self.county_ranges.get(int(fips))
+        if span is None:
+            return None
+        rows = self.panel.iloc[span[0]:span[1]]
+        if years is not None:
+            rows = rows[rows['Year'].isin(_ints(years, "years"))]
+        if rows.empty:
+            return {"county": self.panel['County'].iloc[span[0]], "fips": fips_string(fips),
+                    "columns": {col: [] for col in ['GEOID', 'Tract ID', 'Year'] + attrs}}
+        return county_shard(rows, attrs)
+
+    def tract(self, geoid, attrs=None):
+        """
+        Every year of one tract (GEOID with or without its leading zero). Returns None if unknown.
+        """
+        attrs = self._attrs(attrs)
+        geoid = _ints([geoid], "tract")[0]
+        row = self.tracts.row(geoid)
+        if row is None:
+            return None
+        years = self.tracts.present_columns(row)
+        values = self.tracts.values[row, years][:, [self.tracts.planes[a] for a in attrs]]
+        result = {"Year": self.tracts.years[years].tolist()}
+        result.update((attr, [_json_value(v) for v in values[:, i].tolist()]) for i, attr in enumerate(attrs))
+        return {"geoid": f"{geoid:011d}", "county": self.tracts.county_names[county_fips(geoid)],
+                "fips": fips_string(county_fips(geoid)), "tract": tract_codes([geoid])[0], "columns": result}
+
+
+class ResponseCache:
+    """
+    Least-recently-used cache of finished responses: key -> (body, content type, ETag).
+    Gzipped bodies are added to an entry the first time a client accepts them.
+    """
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, body, content_type, etag=None):
+        entry = {"body": body, "type": content_type, "etag": etag or f'"{hashlib.sha1(body).hexdigest()[:20]}"',
+                 "gzip": None}
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        return entry
+
+
+class QueryService:
+    """
+    Answers HTTP requests for the site, the data directory and the /api/ slices.
+    """
+    def __init__(self, data_dir, site_dir=SITE_DIR, cache_size=CACHE_SIZE):
+        self.data_dir = os.path.abspath(data_dir)
+        self.site_dir = os.path.abspath(site_dir) if site_dir else None
+        panel = load_panel(data_dir)
+        self.store = PanelStore(panel, open_store(data_dir)) if panel is not None else None
+        self.cache = ResponseCache(cache_size)
+
+    def _json(self, payload):
+        return json.dumps(payload, separators=(",", ":")).encode(), "application/json"
+
+    def _api(self, method, parts, query, body):
+        if self.store is None:
+            raise QueryError(404, "no processed attribute files in the data directory")
+        attrs = _list_param(query, "attrs")
+        if method == "POST" and parts == ["bulk"]:
+            try:
+                queries = json.loads(body or b"{}").get("queries", [])
+            except (ValueError, AttributeError):
+                raise QueryError(400, "bulk requests take a JSON object with a 'queries' list")
+            if not isinstance(queries, list) or not all(isinstance(q, dict) for q in queries):
+                raise QueryError(400, "'queries' must be a list of JSON objects")
+            results = []
+            for q in queries:
+                if any(not isinstance(q.get(name, []), list) for name in ("years", "attrs")):
+                    raise QueryError(400, "a query's 'years' and 'attrs' must be lists")
+                if "county" in q:
+                    results.append(self.store.county(_ints([q["county"]], "county")[0], q.get("years"), q.get("attrs")))
+                elif "tract" in q:
+                    results.append(self.store.tract(q["tract"], q.get("attrs")))
+                else:
+                    raise QueryError(400, "each query needs a 'county' or a 'tract'")
+            return self._json({"results": results})
+        if method not in ("GET", "HEAD"):
+            raise QueryError(405, f"{method} is not supported here")
+        if parts == ["counties"]:
+            return self._json(self.store.county_list())
+        if len(parts) == 2 and parts[0] == "county":
+            result = self.store.county(_ints([parts[1]], "county")[0], _list_param(query, "years"), attrs)
+        elif len(parts) == 2 and parts[0] == "tract":
+            result = self.store.tract(parts[1], attrs)
+        else:
+            raise QueryError(404, "unknown endpoint")
+        if result is None:
+            raise QueryError(404, "no such county or tract")
+        return self._json(result)
+
+    def _static_file(self, path):
+        if path.startswith(DATA_PREFIX):
+            root, relative = self.data_dir, path[len(DATA_PREFIX):]
+        elif self.site_dir:
+            root, relative = self.site_dir, path.lstrip("/") or "index.html"
+        else:
+            return None
+        file_name = os.path.realpath(os.path.join(root, unquote(relative)))
+        if not file_name.startswith(os.path.realpath(root) + os.sep):
+            return None
+        if os.path.isdir(file_name):
+            file_name = os.path.join(file_name, "index.html")
+        return file_name, relative
+
+    def respond(self, method, target, body=b""):
+        """
+        Builds the response to one request.
+
+        Returns:
+            dict: a cache entry ({"body", "type", "etag", "gzip"}) or {"status", "error"}
+        """
+        url = urlsplit(target)
+        key = (method == "POST", url.path, url.query, body if method == "POST" else b"")
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry
+
+        if url.path.startswith("/api/"):
+            parts = [p for p in url.path[len("/api/"):].split("/") if p]
+            payload, content_type = self._api(method, parts, parse_qs(url.query), body)
+            return self.cache.put(key, payload, content_type)
+
+        if method not in ("GET", "HEAD"):
+            raise QueryError(405, f"{method} is not supported here")
+        located = self._static_file(url.path)
+        if located is None:
+            raise QueryError(404, "not found")
+        file_name, relative = located
+        if os.path.isfile(file_name):
+            stat = os.stat(file_name)
+            # Static files are cached per modification time, so edits on disk are picked up
+            key = ("file", file_name, stat.st_mtime_ns, stat.st_size)
+            entry = self.cache.get(key)
+            if entry is None:
+                with open(file_name, "rb") as f:
+                    content_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+                    entry = self.cache.put(key, f.read(), content_type, f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"')
+            return entry
+        # Without a counties/ folder on disk, shards are built from the in-memory panel
+        shard = SHARD_PATH.match(relative) if url.path.startswith(DATA_PREFIX) else None
+        if shard and self.store is not None:
+            result = self.store.county(int(shard.group(1)))
+            if result is not None:
+                return self.cache.put(key, *self._json(result))
+        raise QueryError(404, "not found")
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serves HTTP/1.1 requests on one connection until the client closes it or asks to.
+        """
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0) or 0)
+                body = await reader.readexactly(length) if 0 < length <= MAX_BODY_BYTES else b""
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+
+                try:
+                    if length > MAX_BODY_BYTES:
+                        raise QueryError(413, "request body too large")
+                    response = self.respond(method, target, body)
+                except QueryError as error:
+                    response = {"status": error.status, "error": str(error)}
+                except Exception as error:
+                    response = {"status": 500, "error": f"{type(error).__name__}: {error}"}
+
+                writer.write(self._encode(response, method, headers, keep_alive))
+                await writer.drain()
+                if not keep_alive or length > MAX_BODY_BYTES:
+                    break
+        finally:
+            writer.close()
+
+    def _encode(self, response, method, headers, keep_alive):
+        extra = {"Connection": "keep-alive" if keep_alive else "close"}
+        if "error" in response:
+            status, body, content_type = response["status"], json.dumps({"error": response["error"]}).encode(), "application/json"
+        elif response["etag"] in [tag.strip() for tag in headers.get("if-none-match", "").split(",")]:
+            status, body, content_type = 304, b"", None
+            extra["ETag"] = response["etag"]
+        else:
+            status, body, content_type = 200, response["body"], response["type"]
+            extra["ETag"] = response["etag"]
+            extra["Vary"] = "Accept-Encoding"
+            if "gzip" in headers.get("accept-encoding", "") and len(body) >= GZIP_MIN_BYTES:
+                if response["gzip"] is None:
+                    response["gzip"] = gzip.compress(body, compresslevel=6)
+                body = response["gzip"]
+                extra["Content-Encoding"] = "gzip"
+
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}"]
+        if content_type:
+            lines.append(f"Content-Type: {content_type}")
+        lines.append(f"Content-Length: {len(body)}")
+        lines.extend(f"{name}: {value}" for name, value in extra.items())
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        return head if method == "HEAD" else head + body
+
+
+async def serve(data_dir, site_dir=SITE_DIR, host="127.0.0.1", port=8000, cache_size=CACHE_SIZE):
+    """
+    Runs the service until interrupted.
+
+    Args:
+        data_dir (str): Directory with the processed CSVs / panel and the rest of src/data/.
+        site_dir (str, optional): Directory served at "/" (the src/ folder), or None for data and API only.
+        host (str, optional): Interface to listen on. Defaults to 127.0.0.1 (local only).
+        port (int, optional): Port to listen on. Defaults to 8000.
+        cache_size (int, optional): Responses kept in the LRU cache. Defaults to CACHE_SIZE.
+    """
+    service = QueryService(data_dir, site_dir, cache_size)
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"Serving {service.site_dir or 'no site'} with data from {service.data_dir} on http://{host}:{port}/")
+    if service.store is None:
+        print("Warning: no processed attribute files found; only static files are served.")
+    async with server:
+        await server.serve_forever()
+
+
+# ES modules are only executed when served as JavaScript
+mimetypes.add_type("application/javascript", ".js")
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the site and tract/year slices of the processed data locally.")
+    parser.add_argument("--data-dir", default=os.path.join(SITE_DIR, "data"), help="processed data directory (default: src/data)")
+    parser.add_argument("--site-dir", default=SITE_DIR, help="site directory served at / (default: src)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="responses kept in the LRU cache")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.data_dir, args.site_dir, args.host, args.port, args.cache_size))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,302 @@
+import atexit
+import cProfile
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import threading
+import time
+from contextlib import contextmanager
+
+# Per-stage instrumentation of the build. Off by default, when every stage() is a no-op;
+# set ACS_RUN_REPORT to a .json or .csv path to have any script write a run report on exit
+# (and ACS_PROFILE_DIR to also dump one cProfile file per stage, table and year):
+#   ACS_RUN_REPORT=run.json ACS_PROFILE_DIR=profiles python3 s1901_data_filter.py
+REPORT_ENV = "ACS_RUN_REPORT"
+PROFILE_ENV = "ACS_PROFILE_DIR"
+# Seconds between resident memory samples while a stage is running
+SAMPLE_INTERVAL = 0.005
+REPORT_FIELDS = ["stage", "table", "year", "calls", "wall_s", "cpu_s", "peak_rss_delta_mb",
+                 "rows_in", "rows_out", "bytes_in", "bytes_out"]
+
+_enabled = False
+_profile_dir = None
+_started = None
+# Process that enabled recording; a forked worker starts its own records and memory sampler
+_pid = None
+# (stage, table, year) -> accumulated record, and -> cProfile.Profile when profiling
+_records = {}
+_profiles = {}
+_lock = threading.Lock()
+# Stages running right now (on any thread), whose peak memory the sampler keeps up to date
+_open_stages = set()
+# Threads with a profiler enabled; cProfile can only run one profiler per thread
+_profiling = threading.local()
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = None
+
+
+def _rss_bytes():
+    # Current resident set size, from /proc on Linux; None where it isn't available
+    if _PAGE_SIZE is None:
+        return None
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _sample_memory():
+    while _enabled:
+        rss = _rss_bytes()
+        if rss is None:
+            return
+        with _lock:
+            for stage in _open_stages:
+                stage.peak = max(stage.peak, rss)
+        time.sleep(SAMPLE_INTERVAL)
+
+
+def table_name(spec):
+    """
+    Label of a table in the report: its output file name without the extension ("total_pop").
+    """
+    return None if spec is None else os.path.splitext(spec["output"])[0]
+
+
+def frame_bytes(df):
+    # Shallow in-memory size of a DataFrame (string columns count their pointers only)
+    return int(df.memory_usage(index=False, deep=False).sum())
+
+
+class _Stage:
+    """
+    One running stage. Rows and bytes are added by the instrumented code.
+    """
+    def __init__(self):
+        self.rows_in = self.rows_out = self.bytes_in = self.bytes_out = 0
+        self.start_rss = _rss_bytes()
+        self.peak = self.start_rss or 0
+
+    def add(self, rows_in=0, rows_out=0, bytes_in=0, bytes_out=0):
+        self.rows_in += rows_in
+        self.rows_out += rows_out
+        self.bytes_in += bytes_in
+        self.bytes_out += bytes_out
+
+    def input(self, df):
+        self.add(rows_in=len(df), bytes_in=frame_bytes(df))
+
+    def output(self, df):
+        self.add(rows_out=len(df), bytes_out=frame_bytes(df))
+
+
+class _NoStage:
+    """
+    Stand-in yielded while instrumentation is off; it is falsy, so callers can skip any
+    work done only for the report with `if stage:`.
+    """
+    def __bool__(self):
+        return False
+
+    def add(self, rows_in=0, rows_out=0, bytes_in=0, bytes_out=0):
+        pass
+
+    def input(self, df):
+        pass
+
+    def output(self, df):
+        pass
+
+
+_NO_STAGE = _NoStage()
+
+
+def enable(profile_dir=None):
+    """
+    Starts recording stages in this process (and cProfile data per stage if profile_dir is given).
+    """
+    global _enabled, _profile_dir, _started, _pid
+    if _enabled and _pid == os.getpid():
+        return
+    if _pid is not None and _pid != os.getpid():
+        _records.clear()
+        _profiles.clear()
+        _open_stages.clear()
+    _enabled, _profile_dir, _started, _pid = True, profile_dir, time.time(), os.getpid()
+    threading.Thread(target=_sample_memory, daemon=True).start()
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def settings():
+    """
+    The enable() arguments of this process, or None when instrumentation is off, for
+    turning it on in worker processes.
+    """
+    return {"profile_dir": _profile_dir} if _enabled else None
+
+
+@contextmanager
+def stage(name, spec=None, year=None):
+    """
+    Times one pipeline stage for a table and year: wall time, CPU time of the calling thread,
+    peak resident memory above the level at the start, and rows and bytes in and out.
+    Repeated stages with the same name, table and year (such as the chunks of a streamed
+    file) are added up into one record.
+
+    Yields:
+        An object whose add(), input(df) and output(df) count rows and bytes; falsy when
+        instrumentation is off.
+    """
+    if not _enabled:
+        yield _NO_STAGE
+        return
+
+    key = (name, table_name(spec), year)
+    record = _Stage()
+    with _lock:
+        _open_stages.add(record)
+    profiler = None
+    if _profile_dir is not None and not getattr(_profiling, "active", False):
+        with _lock:
+            profiler = _profiles.setdefault(key, cProfile.Profile())
+        _profiling.active = True
+        profiler.enable()
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield record
+    finally:
+        wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+        if profiler is not None:
+            profiler.disable()
+            _profiling.active = False
+        end_rss = _rss_bytes()
+        with _lock:
+            _open_stages.discard(record)
+            peak = None
+            if record.start_rss is not None:
+                peak = (max(record.peak, end_rss or 0) - record.start_rss) / (1 << 20)
+            total = _records.setdefault(key, {"stage": name, "table": key[1], "year": year, "calls": 0,
+                                              "wall_s": 0.0, "cpu_s": 0.0, "peak_rss_delta_mb": None,
+                                              "rows_in": 0, "rows_out": 0, "bytes_in": 0, "bytes_out": 0})
+            total["calls"] += 1
+            total["wall_s"] += wall
+            total["cpu_s"] += cpu
+            if peak is not None:
+                total["peak_rss_delta_mb"] = max(peak, total["peak_rss_delta_mb"] or 0.0)
+            for field in ("rows_in", "rows_out", "bytes_in", "bytes_out"):
+                total[field] += getattr(record, field)
+
+
+def _dump_profiles():
+    with _lock:
+        profiles = list(_profiles.items())
+        _profiles.clear()
+    if not profiles:
+        return
+    os.makedirs(_profile_dir, exist_ok=True)
+    for (name, table, year), profiler in profiles:
+        label = "-".join(str(part) for part in (name, table, year) if part is not None)
+        profiler.dump_stats(os.path.join(_profile_dir, f"{label}.prof"))
+
+
+def take_records():
+    """
+    Returns this process's records and forgets them (dumping its profiles first), so worker
+    processes can hand their stages to the process writing the report.
+    """
+    _dump_profiles()
+    with _lock:
+        records = list(_records.values())
+        _records.clear()
+    return records
+
+
+def add_records(records):
+    """
+    Adds records taken in another process to this process's report.
+    """
+    with _lock:
+        for record in records:
+            key = (record["stage"], record["table"], record["year"])
+            total = _records.get(key)
+            if total is None:
+                _records[key] = dict(record)
+                continue
+            for field in ("calls", "wall_s", "cpu_s", "rows_in", "rows_out", "bytes_in", "bytes_out"):
+                total[field] += record[field]
+            peaks = [p for p in (total["peak_rss_delta_mb"], record["peak_rss_delta_mb"]) if p is not None]
+            total["peak_rss_delta_mb"] = max(peaks) if peaks else None
+
+
+def _rounded(record):
+    record = dict(record)
+    for field in ("wall_s", "cpu_s"):
+        record[field] = round(record[field], 6)
+    if record["peak_rss_delta_mb"] is not None:
+        record["peak_rss_delta_mb"] = round(record["peak_rss_delta_mb"], 3)
+    return record
+
+
+def write_report(path):
+    """
+    Writes the recorded stages to path: a CSV with one row per stage, table and year if the
+    path ends in .csv, otherwise JSON with the same rows, totals per stage and the machine.
+    Profiles (if enabled) are dumped alongside.
+    """
+    _dump_profiles()
+    with _lock:
+        records = sorted((_rounded(r) for r in _records.values()),
+                         key=lambda r: (r["table"] or "", r["year"] or 0, r["stage"]))
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+        return path
+
+    totals = {}
+    for record in records:
+        total = totals.setdefault(record["stage"], {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_rss_delta_mb": None,
+                                                    "rows_in": 0, "rows_out": 0, "bytes_in": 0, "bytes_out": 0})
+        for field in ("calls", "wall_s", "cpu_s", "rows_in", "rows_out", "bytes_in", "bytes_out"):
+            total[field] += record[field]
+        if record["peak_rss_delta_mb"] is not None:
+            total["peak_rss_delta_mb"] = max(record["peak_rss_delta_mb"], total["peak_rss_delta_mb"] or 0.0)
+    report = {
+        "started": None if _started is None else time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(_started)),
+        "wall_s": None if _started is None else round(time.time() - _started, 3),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "profile_dir": _profile_dir,
+        "totals": {name: _rounded(total) for name, total in totals.items()},
+        "stages": records,
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def _write_env_report():
+    path = write_report(os.environ[REPORT_ENV])
+    print(f"Run report written to {path}")
+
+
+# Scripts run with ACS_RUN_REPORT set report on exit; worker processes hand their records back instead
+if os.environ.get(REPORT_ENV) and multiprocessing.parent_process() is None:
+    enable(os.environ.get(PROFILE_ENV))
+    atexit.register(_write_env_report)
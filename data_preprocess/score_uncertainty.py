@@ -0,0 +1,190 @@
+import numpy as np
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from gentrification_score import REVERSED_ATTRS, SCORE_ATTRS, compute_scores, county_medians, previous_present_year
+
+# Monte Carlo confidence intervals of the gentrification scores from the ACS margins of error.
+# Every score attribute of both years of a score is drawn REPLICATES times from a normal
+# distribution around its estimate, with standard error MoE / 1.645 (ACS margins of error
+# are 90% intervals), and the score is recomputed from every draw. The county medians a
+# tract is compared with are held at their estimates: a median over a county's tracts moves
+# far less than any one tract's estimate.
+REPLICATES = 1000
+MOE_Z = 1.645
+CONFIDENCE = 0.90
+# ACS 5-year estimates of years less than five years apart share sample years, so the draws
+# of a score's two years are correlated by the share of sample years they have in common, as
+# the Census Bureau's guidance for comparing overlapping periods does
+PERIOD_YEARS = 5
+# Values drawn per chunk of one year's scores, which bounds memory; chunks are the parallel tasks
+CHUNK_VALUES = 1 << 22
+# Scores drawn from one random stream. A chunk is made of whole blocks, so the draws don't
+# depend on the chunk size
+SEED_BLOCK = 64
+# A score is reliable when it is defined in at least MIN_DEFINED_SHARE of the replicates
+# (a draw at or below zero leaves it undefined) and its interval is at most MAX_INTERVAL_WIDTH wide
+MIN_DEFINED_SHARE = 0.95
+MAX_INTERVAL_WIDTH = 0.2
+SEED = 0
+
+
+def _quantiles(samples, defined, quantiles):
+    # Linearly interpolated quantiles along axis 0 over the defined samples only (NaN sorts last)
+    ordered = np.sort(samples, axis=0)
+    count = defined.sum(axis=0)
+    results = []
+    for q in quantiles:
+        position = q * np.maximum(count - 1, 0)
+        below = np.floor(position).astype(np.int64)
+        above = np.minimum(below + 1, np.maximum(count - 1, 0))
+        low = np.take_along_axis(ordered, below[None], axis=0)[0]
+        high = np.take_along_axis(ordered, above[None], axis=0)[0]
+        results.append(np.where(count > 0, low + (position - below) * (high - low), np.nan))
+    return results
+
+
+def simulate_scores(task):
+    """
+    Score replicates of one chunk of scores, drawn all at once as replicates x scores x
+    attributes arrays. Runs in a worker process.
+
+    Args:
+        task (tuple): (current and previous estimates and standard errors (scores x attrs each),
+                      correlation of the two years' draws per score, county median term per
+                      score and attribute, attribute signs, replicates, (seed, scores) of
+                      every block of the chunk)
+
+    Returns:
+        tuple: (lower bound, upper bound, standard deviation, share of defined replicates), per score
+    """
+    current, previous, current_se, previous_se, correlation, median_term, sign, replicates, blocks = task
+    first, second = np.empty((2, replicates) + current.shape)
+    offset = 0
+    for seed, size in blocks:
+        first[:, offset:offset + size], second[:, offset:offset + size] = np.random.default_rng(seed).standard_normal(
+            (2, replicates, size, current.shape[1]))
+        offset += size
+    second = correlation[:, None] * first + np.sqrt(1 - correlation ** 2)[:, None] * second
+    current = current + current_se * first
+    previous = previous + previous_se * second
+    defined = ((current > 0) & (previous > 0)).all(axis=2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.log(current / previous) - median_term
+    scores = np.where(defined, (terms * sign).sum(axis=2) / len(sign), np.nan)
+    tail = (1 - CONFIDENCE) / 2
+    lower, upper = _quantiles(scores, defined, (tail, 1 - tail))
+    count = defined.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(defined, scores, 0).sum(axis=0) / count
+        spread = np.sqrt(np.where(defined, (scores - mean) ** 2, 0).sum(axis=0) / count)
+    return lower, upper, spread, count / replicates
+
+
+def is_reliable(defined, lower, upper):
+    """
+    Whether scores are reliable: defined in at least MIN_DEFINED_SHARE of the replicates,
+    with an interval at most MAX_INTERVAL_WIDTH wide (False without an interval).
+    """
+    with np.errstate(invalid="ignore"):
+        return (defined >= MIN_DEFINED_SHARE) & (upper - lower <= MAX_INTERVAL_WIDTH)
+
+
+def score_intervals(array, scores, attrs=SCORE_ATTRS, replicates=REPLICATES, workers=1, seed=SEED):
+    """
+    Monte Carlo confidence intervals and a reliability flag for every defined score whose
+    attributes all have margins of error in both years. Every year's scores are split into
+    blocks of SEED_BLOCK, each drawn from its own stream seeded by the year and its place in
+    the year, and the blocks into chunks of about CHUNK_VALUES drawn values, so the intervals
+    depend neither on the number of workers or the chunk size nor on which other years are
+    scored (the scores of a year recomputed after an append get the same intervals as in a
+    full build).
+
+    Args:
+        array (dict): Output of build_tract_array or TractStore.tract_array, with "moe".
+        scores (dict): Output of compute_scores on the same array.
+        replicates (int, optional): Draws per score.
+        workers (int, optional): Worker processes drawing the chunks.
+
+    Returns:
+        dict: "lower", "upper", "se" (tracts x years, NaN without an interval), "defined"
+              (share of defined replicates) and "reliable" (tracts x years booleans).
+    """
+    values, moe, county = np.asarray(array["values"]), np.asarray(array["moe"]), array["county"]
+    n_counties = len(array["counties"])
+    previous = previous_present_year(array["present"], county, n_counties)[county]
+
+    rows = np.arange(values.shape[0])[:, None]
+    prev_index = np.maximum(previous, 0)
+    has_moe = ~np.isnan(moe).any(axis=2)
+    simulate = ~np.isnan(scores["score"]) & has_moe & has_moe[rows, prev_index]
+    tract, year = np.nonzero(simulate)
+    prev = prev_index[tract, year]
+
+    years = np.asarray(array["years"])
+    gap = years[year] - years[prev]
+    correlation = np.clip(1 - gap / PERIOD_YEARS, 0, 1)
+    # County medians of the simulated years and the years they are compared with
+    needed = np.union1d(year, prev)
+    medians = county_medians(values[:, needed], county, n_counties)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        median_term = np.log(medians[county[tract], np.searchsorted(needed, year)]
+                             / medians[county[tract], np.searchsorted(needed, prev)])
+    sign = np.array([-1.0 if attr in REVERSED_ATTRS else 1.0 for attr in attrs])
+    chunk = max(1, CHUNK_VALUES // (2 * replicates * len(attrs) * SEED_BLOCK)) * SEED_BLOCK
+    # Score indexes in year order, then tract order within a year
+    order = np.argsort(year, kind="stable")
+    starts = np.searchsorted(year[order], np.unique(year))
+    ends = np.append(starts[1:], len(order))
+    chunks = []
+    for first, last in zip(starts, ends):
+        y = int(years[year[order[first]]])
+        for start in range(first, last, chunk):
+            stop = min(start + chunk, last)
+            blocks = [([seed, y, (b - first) // SEED_BLOCK], min(SEED_BLOCK, stop - b))
+                      for b in range(start, stop, SEED_BLOCK)]
+            chunks.append((blocks, order[start:stop]))
+    tasks = [(values[tract[s], year[s]], values[tract[s], prev[s]], moe[tract[s], year[s]] / MOE_Z,
+              moe[tract[s], prev[s]] / MOE_Z, correlation[s], median_term[s], sign, replicates, blocks)
+             for blocks, s in chunks]
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(simulate_scores, tasks))
+    else:
+        outcomes = [simulate_scores(task) for task in tasks]
+
+    shape = scores["score"].shape
+    result = {key: np.full(shape, np.nan) for key in ("lower", "upper", "se", "defined")}
+    if outcomes:
+        simulated = np.concatenate([s for _, s in chunks])
+        for key, column in zip(("lower", "upper", "se", "defined"), zip(*outcomes)):
+            result[key][tract[simulated], year[simulated]] = np.concatenate(column)
+    result["reliable"] = is_reliable(result["defined"], result["lower"], result["upper"])
+    return result
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    from tract_store import load_tract_array
+
+    parser = argparse.ArgumentParser(description="Monte Carlo confidence intervals of the gentrification scores.")
+    parser.add_argument("--data-dir", default=".", help="directory with the processed CSVs")
+    parser.add_argument("--replicates", type=int, default=REPLICATES)
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    array = load_tract_array(args.data_dir, SCORE_ATTRS)
+    if array is None:
+        print("No processed attribute files found. Exiting.")
+    else:
+        scores = compute_scores(array)
+        start = time.perf_counter()
+        intervals = score_intervals(array, scores, replicates=args.replicates, workers=args.workers or os.cpu_count() or 1)
+        defined = ~np.isnan(scores["score"])
+        with_interval = ~np.isnan(intervals["lower"])
+        print(f"Drew {args.replicates} replicates of {with_interval.sum()} of {defined.sum()} scores "
+              f"in {time.perf_counter() - start:.2f}s; {intervals['reliable'].sum()} are reliable")
+        print(f"Median {CONFIDENCE:.0%} interval width: {np.nanmedian(intervals['upper'] - intervals['lower']):.4f}")
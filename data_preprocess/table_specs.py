@@ -0,0 +1,129 @@
+# Declarative specs for every ACS table used by the visualization.
+# Each spec tells acs_engine.py where to find a table's yearly Data CSVs and how to
+# turn them into the Tract ID / County / value / Year layout used in src/data/.
+#
+# Spec keys:
+#   file_pattern:  yearly Data CSV name, formatted with the year
+#   output:        default name of the combined output CSV
+#   header_row:    0 to name columns by S-code (NAME, S2506_C01_009E, ...),
+#                  1 to name them by label (Geographic Area Name, Estimate!!Total, ...)
+#   name_column:   column holding "Census Tract X; Y County; California"
+#   columns:       output column name -> list of rules, the first rule whose "years"
+#                  range (inclusive, optional) contains the year is used. A rule finds
+#                  its source column by "position", exact "column" name(s) or regex
+#                  "pattern", and may divide by a "denominator" column and "scale" it.
+#                  Each value keeps its margin of error in a "<column> MoE" column; a rule
+#                  may point at it with "moe" (a rule of its own), otherwise it is the
+#                  column whose S-code ends in "M" instead of the estimate's "E"
+#   fill_value:    value used for suppressed/missing estimates (None keeps NaN);
+#                  a rule may override it with its own "fill". Annotation values such as
+#                  "2,000+" or "-" are decoded by acs_sentinels.py, which also records a
+#                  status code per cell in a "<column> Status" column
+#   aggregate:     how split tracts sharing a Tract ID are combined (None keeps every row)
+#   gap_fill:      None, or {"method": "linear" | "nearest" | "ffill" | "bfill", "limit": n or None}
+#                  to fill the values a rule leaves missing (a fill of None) from the tract's
+#                  other years, filling runs of at most "limit" missing years (gap_fill.py);
+#                  filled values are marked in a "<column> Imputed" column
+#   measure:       "count" or "median": how tract_crosswalk.py moves the values onto new tract
+#                  boundaries (counts are split by weight, medians and percentages averaged)
+
+TABLE_SPECS = {
+    # Total population
+    "B01003": {
+        "file_pattern": "ACSDT5Y{year}.B01003-Data.csv",
+        "output": "total_pop.csv",
+        "header_row": 1,
+        "name_column": "Geographic Area Name",
+        "columns": {
+            "Estimate!!Total": [
+                # The 2010 file has its estimate and margin of error columns swapped
+                {"years": (2010, 2010), "position": 3, "moe": {"position": 2}},
+                {"position": 2},
+            ],
+        },
+        "fill_value": 0,
+        "aggregate": None,
+        "gap_fill": None,
+        "measure": "count",
+    },
+    # Occupancy status
+    "B25002": {
+        "file_pattern": "ACSDT5Y{year}.B25002-Data.csv",
+        "output": "vac_status.csv",
+        "header_row": 1,
+        "name_column": "Geographic Area Name",
+        "columns": {
+            # The ':?' makes the colon optional, matching both "Total" and "Total:"
+            "Vacant Units": [{"pattern": r"Estimate!!Total:?!!Vacant$"}],
+        },
+        "fill_value": 0,
+        "aggregate": None,
+        "gap_fill": None,
+        "measure": "count",
+    },
+    # Median gross rent
+    "B25064": {
+        "file_pattern": "ACSDT5Y{year}.B25064-Data.csv",
+        "output": "gross_rent.csv",
+        "header_row": 1,
+        "name_column": "Geographic Area Name",
+        "columns": {
+            "Median_Gross_Rent": [{"column": "Estimate!!Median gross rent"}],
+        },
+        "fill_value": 0,
+        "aggregate": "mean",
+        "gap_fill": None,
+        "measure": "median",
+    },
+    # Median household income
+    "S1901": {
+        "file_pattern": "ACSST5Y{year}.S1901-Data.csv",
+        "output": "house_income.csv",
+        "header_row": 1,
+        "name_column": "Geographic Area Name",
+        "columns": {
+            "Median_Household_Income": [{"column": [
+                "Estimate!!Households!!Median income (dollars)",
+                "Households!!Estimate!!Median income (dollars)",
+            ]}],
+        },
+        "fill_value": 0,
+        "aggregate": "mean",
+        "gap_fill": None,
+        "measure": "median",
+    },
+    # Median home value
+    "S2506": {
+        "file_pattern": "ACSST5Y{year}.S2506-Data.csv",
+        "output": "home_value.csv",
+        "header_row": 0,
+        "name_column": "NAME",
+        "columns": {
+            "Median_Home_Value": [{"column": "S2506_C01_009E"}],
+        },
+        "fill_value": 0,
+        "aggregate": None,
+        "gap_fill": None,
+        "measure": "median",
+    },
+    # Educational attainment
+    "S1501": {
+        "file_pattern": "ACSST5Y{year}.S1501-Data.csv",
+        "output": "edu_attain.csv",
+        "header_row": 0,
+        "name_column": "NAME",
+        "columns": {
+            "25_Plus_Bachelors_Degree_Or_Higher_Count": [
+                # Before 2018 the column is already a percentage; gaps are filled linearly
+                {"years": (2010, 2017), "column": "S1501_C01_015E", "fill": None},
+                # From 2018 on it is a count, so divide by the population 25 years and over
+                {"years": (2018, 9999), "column": "S1501_C01_015E",
+                 "denominator": "S1501_C01_006E", "scale": 100},
+            ],
+        },
+        "fill_value": 0,
+        "aggregate": "mean",
+        "gap_fill": {"method": "linear", "limit": None},
+        "measure": "median",
+    },
+}
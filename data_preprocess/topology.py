@@ -0,0 +1,369 @@
+import numpy as np
+import argparse
+import json
+import os
+import zipfile
+
+from tract_keys import fips_string
+
+# Builds the map files the site draws from the full-size TopoJSON downloads
+# (https://github.com/jethin/us-counties-tracts-topojson): the county outlines of a region
+# (filtered-counties.topo.json) and one tract topology per county (tracts/<fips>.topo.json).
+# Only the arcs the kept geometries use are written, re-quantized to a grid covering the
+# output's own extent and simplified on that grid; unused properties are dropped, and each
+# tract can carry its integer GEOID and gentrification scores so the heatmap needs no join.
+
+COUNTIES_FILE = "filtered-counties.topo.json"
+TRACTS_DIR = "tracts"
+# Grid size of the quantized coordinates (TopoJSON's "quantization"); 10,000 steps across a
+# county is well below a pixel of the 960 x 600 heatmap
+QUANTIZATION = 10000
+# Douglas-Peucker tolerance in grid steps; arc end points, and so shared borders, are kept
+SIMPLIFY_TOLERANCE = 1.0
+# Properties kept on each geometry; everything else in the downloads is dropped
+COUNTY_PROPERTIES = ["id", "name"]
+TRACT_PROPERTIES = ["id"]
+
+
+def read_topology(location, name=None):
+    """
+    Reads a TopoJSON file, or the file `name` inside a directory or zip archive (such as the
+    tracts.zip download, whose members are <fips>.topo.json). Returns None if it isn't there.
+    """
+    if name is None:
+        with open(location) as f:
+            return json.load(f)
+    if os.path.isdir(location):
+        path = os.path.join(location, name)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+    with zipfile.ZipFile(location) as zf:
+        members = [m for m in zf.namelist() if os.path.basename(m) == name]
+        if not members:
+            return None
+        with zf.open(members[0]) as f:
+            return json.load(f)
+
+
+def geometry_id(geometry):
+    """
+    Identifier of a geometry: its "id" property (as in the downloads), its id member or GEOID.
+    """
+    properties = geometry.get("properties") or {}
+    for value in (properties.get("id"), geometry.get("id"), properties.get("GEOID")):
+        if value is not None:
+            return str(value)
+    return None
+
+
+def decode_arcs(topology):
+    """
+    Absolute coordinates of every arc (float64 arrays of shape points x 2), undoing the
+    delta encoding of quantized topologies.
+    """
+    transform = topology.get("transform")
+    arcs = []
+    for arc in topology["arcs"]:
+        points = np.asarray(arc, dtype=np.float64).reshape(-1, len(arc[0]) if arc else 2)[:, :2]
+        if transform is not None:
+            points = np.cumsum(points, axis=0) * transform["scale"] + transform["translate"]
+        arcs.append(points)
+    return arcs
+
+
+def arc_refs(arcs):
+    """
+    Every arc index in a (nested) arcs member, with ~i (arc i reversed) given as i.
+    """
+    if isinstance(arcs, int):
+        yield arcs if arcs >= 0 else ~arcs
+        return
+    for item in arcs:
+        yield from arc_refs(item)
+
+
+def _renumber(arcs, new_index):
+    if isinstance(arcs, int):
+        return int(new_index[arcs]) if arcs >= 0 else ~int(new_index[~arcs])
+    return [_renumber(item, new_index) for item in arcs]
+
+
+def iter_geometries(geometry):
+    """
+    The geometry itself, or the members of a GeometryCollection.
+    """
+    if geometry.get("type") == "GeometryCollection":
+        for member in geometry.get("geometries", []):
+            yield from iter_geometries(member)
+    else:
+        yield geometry
+
+
+def simplify_lines(lines, tolerance):
+    """
+    Douglas-Peucker simplification of many arcs at once. Every round splits all pending
+    (first, last) spans of all arcs together, at their farthest point from the chord, so the
+    number of Python-level steps grows with the depth of the recursion, not the point count.
+
+    Args:
+        lines (list): Arrays of points (points x 2), one per arc.
+        tolerance (float): Largest distance from the chord a dropped point may have.
+
+    Returns:
+        list: Mask of the points to keep per arc; the first and last are always kept.
+    """
+    lengths = np.array([len(line) for line in lines], dtype=np.int64)
+    if len(lines) == 0:
+        return []
+    points = np.concatenate(lines).astype(np.float64)
+    ends = np.cumsum(lengths)
+    keep = np.zeros(len(points), dtype=bool)
+    first, last = ends - lengths, ends - 1
+    keep[first] = keep[last] = True
+
+    while True:
+        pending = last - first > 1
+        first, last = first[pending], last[pending]
+        if len(first) == 0:
+            break
+        inner = last - first - 1
+        span = np.repeat(np.arange(len(first)), inner)
+        offset = np.cumsum(inner) - inner
+        index = first[span] + 1 + np.arange(inner.sum()) - offset[span]
+        chord = points[last] - points[first]
+        delta = points[index] - points[first][span]
+        length = np.hypot(chord[:, 0], chord[:, 1])[span]
+        cross = np.abs(chord[span, 0] * delta[:, 1] - chord[span, 1] * delta[:, 0])
+        # A closed arc has no chord: measure from its end point
+        distance = np.where(length > 0, cross / np.where(length > 0, length, 1), np.hypot(delta[:, 0], delta[:, 1]))
+
+        farthest = np.maximum.reduceat(distance, offset)
+        is_farthest = np.flatnonzero(distance == farthest[span])
+        _, first_hit = np.unique(span[is_farthest], return_index=True)
+        split = index[is_farthest[first_hit]]
+        far = farthest > tolerance
+        split, first, last = split[far], first[far], last[far]
+        keep[split] = True
+        first, last = np.concatenate([first, split]), np.concatenate([split, last])
+    return np.split(keep, ends[:-1])
+
+
+def encode_arcs(arcs, quantization=QUANTIZATION, tolerance=SIMPLIFY_TOLERANCE, points=None):
+    """
+    Quantizes arcs onto a quantization x quantization grid spanning their extent (and that of
+    any other points, such as point geometries), simplifies them on that grid and
+    delta-encodes them. Repeated points are dropped; closed arcs keep at least four points so
+    rings stay valid.
+
+    Returns:
+        tuple: (transform dict, list of delta-encoded integer arcs, bbox [x0, y0, x1, y1])
+    """
+    spanned = list(arcs) + ([points] if points is not None and len(points) else [])
+    every_point = np.concatenate(spanned) if spanned else np.zeros((1, 2))
+    low, high = every_point.min(axis=0), every_point.max(axis=0)
+    scale = np.where(high > low, (high - low) / (quantization - 1), 1.0)
+    grids = []
+    for points in arcs:
+        grid = np.round((points - low) / scale).astype(np.int64)
+        moved = np.append(True, (grid[1:] != grid[:-1]).any(axis=1))
+        moved[-1] = True
+        grids.append(grid[moved])
+    masks = simplify_lines(grids, tolerance) if tolerance > 0 else [None] * len(grids)
+
+    encoded = []
+    for grid, mask in zip(grids, masks):
+        closed = len(grid) > 1 and (grid[0] == grid[-1]).all()
+        if mask is not None and (not closed or mask.sum() >= 4):
+            grid = grid[mask]
+        if len(grid) == 1:
+            grid = np.repeat(grid, 2, axis=0)
+        encoded.append(np.vstack([grid[:1], np.diff(grid, axis=0)]).tolist())
+    transform = {"scale": scale.tolist(), "translate": low.tolist()}
+    return transform, encoded, low.tolist() + high.tolist()
+
+
+def subset_topology(topology, object_name, keep=None, properties=("id",), extra=None,
+                    quantization=QUANTIZATION, tolerance=SIMPLIFY_TOLERANCE):
+    """
+    New topology holding only some geometries of one object, with only the arcs they use.
+
+    Args:
+        topology (dict): Source TopoJSON.
+        object_name (str): Object to take the geometries from ("counties", "tracts"); the
+                           first object is used if the topology has no object by that name.
+        keep (callable, optional): Predicate on a geometry's id. Defaults to keeping all.
+        properties (sequence, optional): Property names to keep. Defaults to ("id",).
+        extra (dict, optional): Geometry id -> properties to add.
+        quantization (int, optional): Grid size of the output coordinates.
+        tolerance (float, optional): Simplification tolerance in grid steps (0 turns it off).
+
+    Returns:
+        dict: The new topology, or None if no geometry was kept.
+    """
+    objects = topology["objects"]
+    source = objects.get(object_name) or next(iter(objects.values()))
+    geometries = []
+    for geometry in iter_geometries(source):
+        geoid = geometry_id(geometry)
+        if keep is not None and not keep(geoid):
+            continue
+        old_properties = geometry.get("properties") or {}
+        new_properties = {name: old_properties[name] for name in properties if name in old_properties}
+        new_properties.update((extra or {}).get(geoid, {}))
+        kept = {key: value for key, value in geometry.items() if key not in ("properties", "id", "bbox")}
+        kept["properties"] = new_properties
+        geometries.append(kept)
+    if not geometries:
+        return None
+
+    arcs = decode_arcs(topology)
+    # Built with an integer dtype, so geometries without arcs (points, nulls) still index new_index
+    used = np.unique(np.fromiter((ref for geometry in geometries if "arcs" in geometry
+                                  for ref in arc_refs(geometry["arcs"])), dtype=np.int64))
+    new_index = np.full(len(arcs), -1, dtype=np.int64)
+    new_index[used] = np.arange(len(used))
+    # Points are quantized (not delta-encoded) positions
+    old_transform = topology.get("transform")
+    points = {}
+    for g, geometry in enumerate(geometries):
+        if "arcs" not in geometry and "coordinates" in geometry:
+            points[g] = np.asarray(geometry["coordinates"], dtype=np.float64).reshape(-1, 2)
+            if old_transform is not None:
+                points[g] = points[g] * old_transform["scale"] + old_transform["translate"]
+    transform, encoded, bbox = encode_arcs([arcs[i] for i in used], quantization, tolerance,
+                                           np.concatenate(list(points.values())) if points else None)
+
+    low, scale = np.array(transform["translate"]), np.array(transform["scale"])
+    for g, geometry in enumerate(geometries):
+        if "arcs" in geometry:
+            geometry["arcs"] = _renumber(geometry["arcs"], new_index)
+        elif g in points:
+            grid = np.round((points[g] - low) / scale).astype(np.int64)
+            geometry["coordinates"] = grid[0].tolist() if geometry["type"] == "Point" else grid.tolist()
+    return {"type": "Topology", "bbox": bbox, "transform": transform,
+            "objects": {object_name: {"type": "GeometryCollection", "geometries": geometries}},
+            "arcs": encoded}
+
+
+def write_topology(topology, path):
+    """
+    Writes a topology as compact JSON, replacing path only once it is complete.
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        # json.dumps runs the C encoder in one shot; json.dump streams through the pure Python one
+        f.write(json.dumps(topology, separators=(",", ":")))
+    os.replace(temp_path, path)
+    return os.path.getsize(path)
+
+
+def tract_scores(scores_dir, fips):
+    """
+    Scores of one county's tracts from <fips>.scores.json (gentrification_score.py), as
+    tract code -> {year: score or null}, or None if the county has no score file.
+    """
+    score_file = os.path.join(scores_dir, f"{fips}.scores.json")
+    if not os.path.exists(score_file):
+        return None
+    with open(score_file) as f:
+        records = json.load(f)
+    scores = {}
+    for record in records:
+        scores.setdefault(record["tractId"], {})[str(record["year"])] = record["score"]
+    return scores
+
+
+def write_map_files(region, county_topology, tract_topologies=None, output_dir=".", scores_dir=None,
+                    quantization=QUANTIZATION, tolerance=SIMPLIFY_TOLERANCE):
+    """
+    Writes the county outlines of a region and the tract topology of each of its counties.
+
+    Args:
+        region (dict): {"counties": [...] or None, "states": [...] or None}, as from build.load_region;
+                       None for both keeps every county.
+        county_topology (str): County TopoJSON of a state (06.topo.json) or the whole country.
+        tract_topologies (str, optional): Directory or zip archive (tracts.zip) of <fips>.topo.json
+                                          tract files. Defaults to writing the counties only.
+        output_dir (str, optional): Where filtered-counties.topo.json and tracts/ are written.
+        scores_dir (str, optional): Directory of <fips>.scores.json files whose scores are embedded
+                                    in the tract properties, with each tract's integer GEOID.
+        quantization (int, optional): Grid size of the output coordinates.
+        tolerance (float, optional): Simplification tolerance in grid steps.
+
+    Returns:
+        list: county FIPS codes whose tracts were written.
+    """
+    counties, states = region.get("counties"), region.get("states")
+
+    def in_region(geoid):
+        if geoid is None:
+            return False
+        if counties is None and states is None:
+            return True
+        return geoid in (counties or []) or geoid[:2] in (states or [])
+
+    topology = read_topology(county_topology)
+    size = os.path.getsize(county_topology)
+    filtered = subset_topology(topology, "counties", in_region, COUNTY_PROPERTIES,
+                               quantization=quantization, tolerance=tolerance)
+    if filtered is None:
+        print(f"No counties of the region found in {county_topology}.")
+        return []
+    county_ids = sorted(geometry_id(g) for g in filtered["objects"]["counties"]["geometries"])
+    counties_file = os.path.join(output_dir, COUNTIES_FILE)
+    written = write_topology(filtered, counties_file)
+    print(f"Wrote {len(county_ids)} counties to {counties_file} ({size / 1024:.0f} KB -> {written / 1024:.0f} KB)")
+    if tract_topologies is None:
+        return []
+
+    done = []
+    for fips in county_ids:
+        fips = fips_string(fips)
+        tracts = read_topology(tract_topologies, f"{fips}.topo.json")
+        if tracts is None:
+            print(f"Warning: {fips}.topo.json not found in {tract_topologies}. Skipping this county.")
+            continue
+        extra = None
+        scores = tract_scores(scores_dir, fips) if scores_dir else None
+        if scores_dir:
+            extra = {}
+            for geometry in iter_geometries(next(iter(tracts["objects"].values()))):
+                geoid = geometry_id(geometry)
+                if geoid is None or not geoid.isdigit():
+                    continue
+                extra[geoid] = {"geoid": int(geoid)}
+                if scores is not None:
+                    extra[geoid]["scores"] = scores.get(geoid[-6:], {})
+        tract_file = os.path.join(output_dir, TRACTS_DIR, f"{fips}.topo.json")
+        subset = subset_topology(tracts, "tracts", None, TRACT_PROPERTIES, extra, quantization, tolerance)
+        written = write_topology(subset, tract_file)
+        print(f"Wrote {len(subset['objects']['tracts']['geometries'])} tracts to {tract_file} ({written / 1024:.0f} KB)")
+        done.append(fips)
+    return done
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    from build import REGIONS, load_region
+
+    parser = argparse.ArgumentParser(description="Build the county and tract TopoJSON files of a region.")
+    parser.add_argument("county_topology", help="county TopoJSON (e.g. 06.topo.json)")
+    parser.add_argument("--tracts", help="directory or zip archive (tracts.zip) of <fips>.topo.json tract files")
+    parser.add_argument("--region", help=f"named region ({', '.join(REGIONS)}) or a JSON region file (default: bay_area)")
+    parser.add_argument("--county", action="append", help="county FIPS code to include (e.g. 06001); repeatable")
+    parser.add_argument("--state", action="append", help="state FIPS code to include (e.g. 06); repeatable")
+    parser.add_argument("--output-dir", default=".", help="where filtered-counties.topo.json and tracts/ are written")
+    parser.add_argument("--scores-dir", help="embed GEOIDs and the scores of the <fips>.scores.json files in this directory")
+    parser.add_argument("--quantization", type=int, default=QUANTIZATION, help="grid size of the output coordinates")
+    parser.add_argument("--simplify", type=float, default=SIMPLIFY_TOLERANCE,
+                        help="simplification tolerance in grid steps (0 to keep every point)")
+    args = parser.parse_args()
+
+    if args.region is None and not args.county and not args.state:
+        args.region = "bay_area"
+    write_map_files(load_region(args.region, args.county, args.state), args.county_topology, args.tracts,
+                    args.output_dir, args.scores_dir, args.quantization, args.simplify)
@@ -0,0 +1,151 @@
+import numpy as np
+import argparse
+import os
+import time
+import zipfile
+from scipy import sparse
+
+from topology import arc_refs, decode_arcs, geometry_id, iter_geometries, read_topology
+
+# Rook adjacency of census tracts: two tracts are neighbours when their boundaries share a
+# line, not just a corner. Inside one topology that is any arc both use. Tract files are
+# per county and quantized separately, so tracts of different files are matched by the
+# vertices of their outer arcs snapped to a SNAP_DEGREES grid, needing at least two in common.
+ADJACENCY_FILE = "tract_adjacency.npz"
+SNAP_DEGREES = 1e-4
+# Snapped longitudes and latitudes are packed into one int64 cell key
+_CELL_BASE = 1 << 32
+
+
+def topology_parts(topology, snap=SNAP_DEGREES):
+    """
+    What one topology contributes to the adjacency: the GEOID of each of its tract geometries,
+    pairs of geometries sharing an arc, and the snapped vertex cells of the arcs used by only
+    one geometry (the outer boundary, where neighbours from other files can touch).
+
+    Returns:
+        tuple: (int64 GEOIDs, (row, column) index arrays of shared-arc pairs,
+                (geometry index, cell key) arrays of outer vertices)
+    """
+    objects = topology["objects"]
+    source = objects.get("tracts") or next(iter(objects.values()))
+    geoids, geometry_index, arc_index = [], [], []
+    for geometry in iter_geometries(source):
+        geoid = geometry_id(geometry)
+        if geoid is None or not geoid.isdigit() or "arcs" not in geometry:
+            continue
+        refs = list(arc_refs(geometry["arcs"]))
+        geometry_index.extend([len(geoids)] * len(refs))
+        arc_index.extend(refs)
+        geoids.append(int(geoid))
+
+    n_arcs = len(topology["arcs"])
+    incidence = sparse.csr_matrix((np.ones(len(arc_index)), (geometry_index, arc_index)),
+                                  shape=(len(geoids), n_arcs))
+    incidence.data[:] = 1
+    shared = sparse.triu(incidence @ incidence.T, k=1).tocoo()
+
+    users = np.asarray(incidence.sum(axis=0)).ravel()
+    outer = np.flatnonzero(users == 1)
+    arcs = decode_arcs(topology)
+    owner = incidence.tocsc()
+    vertex_geometry, vertex_cell = [], []
+    for arc in outer:
+        points = arcs[arc]
+        cells = np.round(points / snap).astype(np.int64)
+        vertex_cell.append(cells[:, 0] * _CELL_BASE + cells[:, 1])
+        vertex_geometry.append(np.full(len(points), owner.indices[owner.indptr[arc]], dtype=np.int64))
+    outer_vertices = (np.concatenate(vertex_geometry) if vertex_geometry else np.zeros(0, dtype=np.int64),
+                      np.concatenate(vertex_cell) if vertex_cell else np.zeros(0, dtype=np.int64))
+    return np.array(geoids, dtype=np.int64), (shared.row, shared.col), outer_vertices
+
+
+def build_adjacency(topologies, snap=SNAP_DEGREES):
+    """
+    Rook adjacency of every tract in a list of topologies (such as the per-county tract files).
+
+    Returns:
+        tuple: (sorted int64 GEOIDs, symmetric boolean CSR matrix over them)
+    """
+    parts = [topology_parts(topology, snap) for topology in topologies]
+    if not parts:
+        return np.zeros(0, dtype=np.int64), sparse.csr_matrix((0, 0), dtype=bool)
+    offsets = np.cumsum([0] + [len(geoids) for geoids, _, _ in parts])
+    geoids, node = np.unique(np.concatenate([geoids for geoids, _, _ in parts]), return_inverse=True)
+    rows = [node[offset + row] for offset, (_, (row, _), _) in zip(offsets, parts)]
+    cols = [node[offset + col] for offset, (_, (_, col), _) in zip(offsets, parts)]
+
+    # Tracts of different files with at least two outer vertices in the same cells
+    vertex_node = np.concatenate([node[offset + geometry] for offset, (_, _, (geometry, _)) in zip(offsets, parts)])
+    vertex_file = np.concatenate([np.full(len(geometry), i) for i, (_, _, (geometry, _)) in enumerate(parts)])
+    vertex_cell = np.concatenate([cell for _, _, (_, cell) in parts])
+    if len(parts) > 1 and len(vertex_cell):
+        pairs = np.unique(np.column_stack([vertex_cell, vertex_node, vertex_file]), axis=0)
+        cells, cell_index = np.unique(pairs[:, 0], return_inverse=True)
+        membership = sparse.csr_matrix((np.ones(len(pairs)), (pairs[:, 1], cell_index)),
+                                       shape=(len(geoids), len(cells)))
+        common = sparse.triu(membership @ membership.T, k=1).tocoo()
+        node_file = np.zeros(len(geoids), dtype=np.int64)
+        node_file[pairs[:, 1]] = pairs[:, 2]
+        across = (common.data >= 2) & (node_file[common.row] != node_file[common.col])
+        rows.append(common.row[across])
+        cols.append(common.col[across])
+
+    row = np.concatenate(rows).astype(np.int64)
+    col = np.concatenate(cols).astype(np.int64)
+    edges = sparse.coo_matrix((np.ones(2 * len(row), dtype=bool), (np.append(row, col), np.append(col, row))),
+                              shape=(len(geoids), len(geoids))).tocsr()
+    edges.setdiag(False)
+    edges.eliminate_zeros()
+    edges.sort_indices()
+    return geoids, edges
+
+
+def tract_topologies(location, counties=None):
+    """
+    Reads the <fips>.topo.json tract files of some counties (all of them when counties is
+    None) from a directory or zip archive.
+    """
+    if os.path.isdir(location):
+        names = sorted(name for name in os.listdir(location) if name.endswith(".topo.json"))
+    else:
+        with zipfile.ZipFile(location) as zf:
+            names = sorted(os.path.basename(m) for m in zf.namelist() if m.endswith(".topo.json"))
+    if counties is not None:
+        names = [name for name in names if name.split(".")[0] in set(counties)]
+    return [read_topology(location, name) for name in names]
+
+
+def write_adjacency(geoids, adjacency, path):
+    """
+    Stores the adjacency as its CSR arrays next to the GEOID of every row.
+    """
+    np.savez(path, geoids=geoids, indptr=adjacency.indptr, indices=adjacency.indices)
+    return path
+
+
+def load_adjacency(path):
+    """
+    Returns:
+        tuple: (sorted int64 GEOIDs, symmetric boolean CSR matrix), as written by write_adjacency.
+    """
+    with np.load(path) as stored:
+        geoids, indptr, indices = stored["geoids"], stored["indptr"], stored["indices"]
+    adjacency = sparse.csr_matrix((np.ones(len(indices), dtype=bool), indices, indptr),
+                                  shape=(len(geoids), len(geoids)))
+    return geoids, adjacency
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the rook adjacency of the tracts in tract TopoJSON files.")
+    parser.add_argument("tracts", help="directory or zip archive (tracts.zip) of <fips>.topo.json tract files")
+    parser.add_argument("--county", action="append", help="county FIPS code to include (e.g. 06001); default: all")
+    parser.add_argument("--output", default=ADJACENCY_FILE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    geoids, adjacency = build_adjacency(tract_topologies(args.tracts, args.county))
+    write_adjacency(geoids, adjacency, args.output)
+    print(f"Wrote {len(geoids)} tracts with {adjacency.nnz // 2} neighbour pairs to {args.output} "
+          f"in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import json
+import os
+import shutil
+
+from acs_loader import write_json_atomic
+from acs_sentinels import moe_column
+from panel import PANEL_FILE, panel_keys
+from table_specs import TABLE_SPECS
+
+# Rows that appending years (acs_engine.append_table) added to or changed in the processed
+# CSVs, kept next to them until build.update_derived brings the derived files (panel, store,
+# shards, scores, cubes) up to date:
+#   <table>.pkl     the table's new and changed rows: GEOID, County, Year, values and margins of error
+#   manifest.json   {"rebuild": true} once an append found the derived files already out of date,
+#                   which only a full build can fix
+CHANGES_DIR = "pending_changes"
+MANIFEST_FILE = "manifest.json"
+
+
+def _table_name(spec):
+    return os.path.splitext(spec["output"])[0]
+
+
+def derived_current(data_dir, table_file):
+    """
+    Whether the derived files of data_dir plus the pending changes account for a table's
+    current CSV: the panel is at least as new as it, or its last write was an append whose
+    rows are pending (so appending several years before updating the derived files doesn't
+    force a full build).
+    """
+    panel_file = os.path.join(data_dir, PANEL_FILE)
+    if not (os.path.exists(panel_file) and os.path.exists(table_file)):
+        return False
+    rows_file = os.path.join(data_dir, CHANGES_DIR, f"{os.path.splitext(os.path.basename(table_file))[0]}.pkl")
+    newest = max(os.path.getmtime(panel_file), os.path.getmtime(rows_file) if os.path.exists(rows_file) else 0)
+    return newest >= os.path.getmtime(table_file)
+
+
+def record_changes(spec, rows, data_dir=".", rebuild=False):
+    """
+    Adds a table's new and changed rows to the pending changes of data_dir. Rows of a tract
+    and year that is already pending replace the earlier ones.
+
+    Args:
+        spec (dict): The table's spec.
+        rows (pandas.DataFrame or None): Rows as written to the table's CSV.
+        rebuild (bool, optional): The derived files weren't current before the change.
+    """
+    changes_dir = os.path.join(data_dir, CHANGES_DIR)
+    manifest_file = os.path.join(changes_dir, MANIFEST_FILE)
+    manifest = {"rebuild": False}
+    if os.path.exists(manifest_file):
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+    os.makedirs(changes_dir, exist_ok=True)
+
+    if rows is not None:
+        value_cols = list(spec["columns"])
+        rows = rows[['GEOID', 'County', 'Year'] + value_cols + [moe_column(col) for col in value_cols]]
+        rows_file = os.path.join(changes_dir, f"{_table_name(spec)}.pkl")
+        if os.path.exists(rows_file):
+            rows = pd.concat([pd.read_pickle(rows_file), rows], ignore_index=True)
+        # The panel keeps the last row of a tract and year, so the latest pending row wins
+        rows = rows.drop_duplicates(subset=['GEOID', 'Year'], keep='last')
+        rows['County'] = rows['County'].astype('category')
+        rows.to_pickle(rows_file)
+    manifest["rebuild"] = manifest["rebuild"] or rebuild
+    write_json_atomic(manifest_file, manifest)
+
+
+def load_changes(data_dir="."):
+    """
+    Returns:
+        tuple or None: (table code -> pending rows, whether a full rebuild is needed), or None
+                       if nothing is pending.
+    """
+    changes_dir = os.path.join(data_dir, CHANGES_DIR)
+    manifest_file = os.path.join(changes_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_file):
+        return None
+    with open(manifest_file) as f:
+        manifest = json.load(f)
+    changes = {}
+    for code, spec in TABLE_SPECS.items():
+        rows_file = os.path.join(changes_dir, f"{_table_name(spec)}.pkl")
+        if os.path.exists(rows_file):
+            changes[code] = pd.read_pickle(rows_file)
+    return changes, manifest["rebuild"]
+
+
+def changed_keys(changes):
+    """
+    Sorted panel keys (GEOID * 10000 + Year) of every pending tract-year.
+    """
+    keys = [panel_keys(rows['GEOID'], rows['Year']) for rows in changes.values()]
+    return np.unique(np.concatenate(keys)) if keys else np.zeros(0, dtype=np.int64)
+
+
+def clear_changes(data_dir="."):
+    """
+    Drops the pending changes once the derived files include them.
+    """
+    shutil.rmtree(os.path.join(data_dir, CHANGES_DIR), ignore_errors=True)
@@ -0,0 +1,243 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from acs_loader import rule_for_year
+from acs_sentinels import STATUS_NOT_APPLICABLE, moe_column, status_column
+from tract_keys import county_fips, tract_labels
+
+# Reallocates tables published on 2010 tract boundaries (ACS 2010-2019) onto 2020 tracts
+# (ACS 2020 on), so every tract has one series across the redistricting. A relationship file
+# lists (2010 tract, 2020 tract, weight) parts and becomes one sparse target x source matrix;
+# a table is then moved with one sparse x dense product per attribute over all of its years.
+
+# Years published on the source geography
+SOURCE_YEARS = (2010, 2019)
+# Column names of the relationship files this reads without being told (source, target, weight):
+# the Census Bureau's pipe-delimited tab20_tract20_tract10_natl.txt (area-weighted by land area
+# of each part) and NHGIS' population-weighted nhgis_tr2010_tr2020 crosswalk
+RELATIONSHIP_FORMATS = [
+    ("GEOID_TRACT_10", "GEOID_TRACT_20", "AREALAND_PART"),
+    ("tr2010ge", "tr2020ge", "wt_pop"),
+]
+MEASURES = ("count", "median")
+
+
+def _shares(groups, weights, n_groups):
+    # Each part's share of its group's total weight; groups whose weight is all zero (water-only
+    # tracts) are shared equally between their parts
+    totals = np.bincount(groups, weights, minlength=n_groups)
+    counts = np.bincount(groups, minlength=n_groups)
+    empty = totals[groups] <= 0
+    return np.where(empty, 1 / counts[groups], weights / np.where(empty, 1, totals[groups]))
+
+
+class Crosswalk:
+    """
+    Sparse relationship between source and target tracts.
+
+    allocation (targets x sources) splits each source tract's counts over its target tracts
+    in proportion to the weights, so every column sums to 1. composition (targets x sources)
+    gives each target tract's make-up from its source tracts, so every row sums to 1; medians
+    and percentages are averaged with it. Parts with a zero share (the zero-area slivers of the
+    Census file) are left out of both, so they don't link a source tract to a target tract.
+    """
+    def __init__(self, source, target, weight):
+        self.parts = (np.asarray(source, dtype=np.int64), np.asarray(target, dtype=np.int64),
+                      np.asarray(weight, dtype=np.float64))
+        source, target, weight = self.parts
+        self.sources, source_index = np.unique(source, return_inverse=True)
+        self.targets, target_index = np.unique(target, return_inverse=True)
+        shape = (len(self.targets), len(self.sources))
+        self.allocation = sparse.csr_matrix(
+            (_shares(source_index, weight, shape[1]), (target_index, source_index)), shape=shape)
+        self.composition = sparse.csr_matrix(
+            (_shares(target_index, weight, shape[0]), (target_index, source_index)), shape=shape)
+        self.allocation.eliminate_zeros()
+        self.composition.eliminate_zeros()
+
+    def with_identity(self, geoids):
+        """
+        Returns a crosswalk that also maps each of geoids onto itself.
+        """
+        source, target, weight = self.parts
+        return Crosswalk(np.concatenate([source, geoids]), np.concatenate([target, geoids]),
+                         np.concatenate([weight, np.ones(len(geoids))]))
+
+    def reallocate(self, values, has_data, measure):
+        """
+        Moves values given per source tract (sources x years) onto the target tracts.
+
+        Args:
+            values (numpy.ndarray): Source values, one row per entry of self.sources.
+            has_data (numpy.ndarray): Mask of the source values that hold an estimate.
+            measure (str): "count" to add up the parts of each source tract, "median" to
+                           average the source tracts making up each target.
+
+        Returns:
+            numpy.ndarray: Target values (targets x years), NaN where no source had an estimate.
+        """
+        values = np.where(has_data, values, 0.0)
+        matrix = self.allocation if measure == "count" else self.composition
+        covered = matrix @ has_data.astype(np.float64)
+        total = matrix @ values
+        if measure != "count":
+            # Average over the sources that have an estimate only
+            total = total / np.where(covered > 0, covered, 1)
+        return np.where(covered > 0, total, np.nan)
+
+    def reallocate_moe(self, moe, has_data, measure):
+        """
+        Margins of error of reallocate's target values: the source margins, scaled by the
+        same weights, add in quadrature (and are divided like the values for medians).
+
+        Returns:
+            numpy.ndarray: Target margins of error, NaN where no source had an estimate or
+                           one that did has no margin of error.
+        """
+        matrix = self.allocation if measure == "count" else self.composition
+        known = has_data & ~np.isnan(moe)
+        total = np.sqrt(matrix.multiply(matrix) @ np.where(known, moe, 0.0) ** 2)
+        covered = matrix @ has_data.astype(np.float64)
+        if measure != "count":
+            total = total / np.where(covered > 0, covered, 1)
+        unknown = matrix @ (has_data & ~known).astype(np.float64)
+        return np.where((covered > 0) & (unknown == 0), total, np.nan)
+
+    def reallocate_status(self, status):
+        """
+        Most severe status code among the source tracts of each target tract (sources x years
+        in, targets x years out); -1 stands for a source tract without a row and is returned
+        for target tracts none of whose sources has one.
+        """
+        indptr = self.composition.indptr
+        result = np.full((len(self.targets),) + status.shape[1:], -1, dtype=status.dtype)
+        nonempty = np.diff(indptr) > 0
+        if nonempty.any():
+            parts = status[self.composition.indices]
+            result[nonempty] = np.maximum.reduceat(parts, indptr[:-1][nonempty], axis=0)
+        return result
+
+
+def load_relationship(file_name, source_col=None, target_col=None, weight_col=None):
+    """
+    Reads a tract relationship file into a Crosswalk. The delimiter (|, tab or comma) is taken
+    from the header line, and the columns default to the first of RELATIONSHIP_FORMATS the
+    file has. Parts without both GEOIDs are dropped.
+
+    Args:
+        file_name (str): Relationship file, one row per (source tract, target tract) part.
+        source_col (str, optional): Column of source tract GEOIDs.
+        target_col (str, optional): Column of target tract GEOIDs.
+        weight_col (str, optional): Column of part weights (population, housing units, land area...).
+
+    Returns:
+        Crosswalk: The relationship as sparse matrices.
+    """
+    with open(file_name, encoding="utf-8-sig") as f:
+        header = f.readline()
+    sep = "|" if "|" in header else "\t" if "\t" in header else ","
+    columns = [col.strip() for col in header.rstrip("\r\n").split(sep)]
+    for known in RELATIONSHIP_FORMATS:
+        if source_col is None and target_col is None and all(col in columns for col in known[:2]):
+            source_col, target_col, weight_col = known[0], known[1], weight_col or known[2]
+            break
+    if source_col is None or target_col is None or weight_col is None:
+        raise ValueError(f"Can't tell the source, target and weight columns of {file_name}; columns are {columns}")
+
+    df = pd.read_csv(file_name, sep=sep, usecols=[source_col, target_col, weight_col],
+                     dtype={source_col: str, target_col: str}, encoding="utf-8-sig")
+    source = pd.to_numeric(df[source_col], errors="coerce")
+    target = pd.to_numeric(df[target_col], errors="coerce")
+    weight = pd.to_numeric(df[weight_col], errors="coerce").fillna(0).clip(lower=0)
+    keep = (source.notna() & target.notna()).to_numpy()
+    crosswalk = Crosswalk(source[keep].to_numpy(np.int64), target[keep].to_numpy(np.int64), weight[keep].to_numpy())
+    print(f"Loaded {keep.sum()} tract parts ({len(crosswalk.sources)} source, {len(crosswalk.targets)} target tracts) "
+          f"from {file_name}")
+    return crosswalk
+
+
+def crosswalk_table(df, spec, crosswalk, source_years=SOURCE_YEARS):
+    """
+    Moves the source years of one combined table onto the target geography. Split tracts
+    listed more than once in a year keep their last row (as the panel does). Counts are split
+    between target tracts by weight; medians and percentages are averaged over the source
+    tracts making up each target, skipping estimates that were suppressed or missing. Margins
+    of error combine in quadrature with the same weights. A target tract's status is the most
+    severe of its sources', and a target tract none of whose sources has an estimate gets the
+    fill value of the year's rule. Source tracts the relationship file doesn't list are kept
+    as they are, and only target tracts in the counties of the table's source tracts get rows,
+    so a region's build doesn't pick up tracts of the neighbouring counties.
+
+    Args:
+        df (pandas.DataFrame): Combined table as built by acs_engine.combine_years.
+        spec (dict): The table's spec, whose "measure" says how its values are moved.
+        crosswalk (Crosswalk): Relationship from load_relationship.
+        source_years (tuple, optional): First and last year published on the source geography.
+
+    Returns:
+        pandas.DataFrame: The table with the source years on the target geography, in year order.
+    """
+    if spec["measure"] not in MEASURES:
+        raise ValueError(f"Unknown measure {spec['measure']!r} for {spec['output']}; expected one of {MEASURES}")
+    value_cols = list(spec["columns"])
+    is_source = df['Year'].between(*source_years).to_numpy()
+    if not is_source.any():
+        return df
+    rows = df[is_source].drop_duplicates(subset=['GEOID', 'Year'], keep='last')
+
+    unlisted = np.setdiff1d(rows['GEOID'].to_numpy(np.int64), crosswalk.sources)
+    if len(unlisted):
+        print(f"  Warning: {len(unlisted)} tracts aren't in the relationship file. Keeping them as they are.")
+        crosswalk = crosswalk.with_identity(unlisted)
+
+    years = np.unique(rows['Year'].to_numpy())
+    source_row = np.searchsorted(crosswalk.sources, rows['GEOID'].to_numpy(np.int64))
+    year_col = np.searchsorted(years, rows['Year'].to_numpy())
+    shape = (len(crosswalk.sources), len(years))
+
+    present = np.full(shape, -1, dtype=np.int8)
+    present[source_row, year_col] = 0
+    moved, moved_moe = {}, {}
+    target_status = {}
+    for col in value_cols:
+        values = np.full(shape, np.nan)
+        values[source_row, year_col] = rows[col].to_numpy(np.float64)
+        status = present.copy()
+        status[source_row, year_col] = rows[status_column(col)].to_numpy(np.int8)
+        # Target tracts without any estimate get the fill value of the year's rule, as in extract_values
+        fills = [(rule_for_year(spec["columns"][col], year) or {}).get("fill", spec["fill_value"]) for year in years]
+        fills = np.array([np.nan if fill is None else fill for fill in fills])
+        # A suppressed or missing estimate only holds the fill value; split tracts combined by the
+        # spec's aggregate may mix one with real estimates, which are kept
+        no_estimate = (status < 0) | ((status >= STATUS_NOT_APPLICABLE) & (values == fills))
+        has_data = ~np.isnan(values) & ~no_estimate
+        moved[col] = crosswalk.reallocate(values, has_data, spec["measure"])
+        moved[col] = np.where(np.isnan(moved[col]), fills, moved[col])
+        moe = np.full(shape, np.nan)
+        moe[source_row, year_col] = rows[moe_column(col)].to_numpy(np.float64)
+        moved_moe[col] = crosswalk.reallocate_moe(moe, has_data, spec["measure"])
+        target_status[col] = crosswalk.reallocate_status(status)
+    in_counties = np.isin(county_fips(crosswalk.targets), county_fips(rows['GEOID'].to_numpy(np.int64)))
+    has_row = (crosswalk.reallocate_status(present) >= 0) & in_counties[:, None]
+
+    # Row order within the source years: year, then GEOID
+    year, target = np.nonzero(has_row.T)
+    geoid = crosswalk.targets[target]
+    fips, first_row = np.unique(county_fips(df['GEOID'].to_numpy()), return_index=True)
+    names = dict(zip(fips.tolist(), df['County'].iloc[first_row].astype(str).tolist()))
+    result = pd.DataFrame({'GEOID': geoid, 'Tract ID': tract_labels(geoid)})
+    result['County'] = pd.Series(county_fips(geoid)).map(names)
+    for col in value_cols:
+        result[col] = moved[col][target, year]
+    result['Year'] = years[year]
+    for col in value_cols:
+        result[status_column(col)] = target_status[col][target, year]
+    for col in value_cols:
+        result[moe_column(col)] = moved_moe[col][target, year]
+    print(f"  Reallocated {len(rows)} rows of {len(years)} years onto {len(result)} target tract rows.")
+
+    combined = pd.concat([result, df[~is_source]], ignore_index=True)
+    combined = combined.sort_values('Year', kind='stable', ignore_index=True)
+    combined['County'] = combined['County'].astype('category')
+    return combined[df.columns]
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+# A tract GEOID is state (2 digits) + county (3) + tract (6), e.g. 06001400100.
+# Stored as an int64, the leading zero of the state code is dropped: 6001400100.
+TRACT_DIGITS = 6
+COUNTY_DIVISOR = 10 ** TRACT_DIGITS
+STATE_DIVISOR = 10 ** (TRACT_DIGITS + 3)
+
+
+def parse_geo_ids(geo_ids):
+    """
+    Turns ACS GEO_IDs ("1400000US06001400100") into int64 tract GEOIDs (6001400100).
+    Anything that isn't a census tract GEO_ID becomes -1.
+
+    Args:
+        geo_ids (pandas.Series): Raw GEO_ID strings.
+
+    Returns:
+        numpy.ndarray: int64 GEOIDs
+    """
+    is_tract = geo_ids.str.startswith('1400000US', na=False)
+    geoid = pd.to_numeric(geo_ids.str[-11:].where(is_tract), errors='coerce')
+    return geoid.fillna(-1).to_numpy(dtype=np.int64)
+
+
+def county_fips(geoid):
+    """
+    5 digit county FIPS code (state + county) of each GEOID, as an integer (6001 for 06001).
+    """
+    return np.asarray(geoid) // COUNTY_DIVISOR
+
+
+def state_fips(geoid):
+    """
+    2 digit state FIPS code of each GEOID, as an integer (6 for 06).
+    """
+    return np.asarray(geoid) // STATE_DIVISOR
+
+
+def in_region(geoid, counties=None, states=None):
+    """
+    Mask of GEOIDs inside a region given as county and/or state FIPS codes
+    (ints or zero-padded strings, e.g. "06001" / 6001 and "06" / 6). With neither given,
+    every GEOID is inside.
+    """
+    geoid = np.asarray(geoid)
+    if counties is None and states is None:
+        return np.ones(len(geoid), dtype=bool)
+    mask = np.zeros(len(geoid), dtype=bool)
+    if counties is not None:
+        mask |= np.isin(county_fips(geoid), [int(c) for c in counties])
+    if states is not None:
+        mask |= np.isin(state_fips(geoid), [int(s) for s in states])
+    return mask
+
+
+def tract_codes(geoid):
+    """
+    Six digit tract codes ("400100"), as used by the tract topo.json ids and the county page.
+    """
+    codes, inverse = np.unique(np.asarray(geoid) % COUNTY_DIVISOR, return_inverse=True)
+    return np.array([f"{code:06d}" for code in codes], dtype=object)[inverse]
+
+
+def tract_labels(geoid):
+    """
+    Tract numbers as printed in ACS names: 400100 -> "4001", 400302 -> "4003.02".
+    """
+    codes, inverse = np.unique(np.asarray(geoid) % COUNTY_DIVISOR, return_inverse=True)
+    labels = [f"{code // 100}.{code % 100:02d}" if code % 100 else f"{code // 100}" for code in codes]
+    return np.array(labels, dtype=object)[inverse]
+
+
+def fips_string(fips):
+    """
+    Zero-padded 5 digit county FIPS string (6001 -> "06001"), as used for file names.
+    """
+    return f"{int(fips):05d}"
@@ -0,0 +1,235 @@
+import numpy as np
+import json
+import os
+import shutil
+import time
+
+from gentrification_score import build_tract_array
+from panel import PANEL_ATTRS, PANEL_MOES, load_panel, panel_keys
+from table_specs import TABLE_SPECS
+from tract_keys import county_fips, fips_string
+
+# Binary tract x year x attribute store, written next to the processed CSVs:
+#   values.npy   float64 tracts x years x attributes, NaN where missing (memory-mapped on open)
+#   moe.npy      float64 margins of error in the same layout, NaN where there is none
+#   valid.npy    bitmask of the non-missing values, packed 8 attributes per byte along the last axis
+#   present.npy  bitmask of the tract x year rows that exist, packed along the year axis
+#   geoids.npy   sorted int64 GEOID per row (tract key -> row by binary search)
+#   years.npy    ACS year per column
+#   meta.json    attribute -> plane, county FIPS -> name, shape and format version
+STORE_DIR = "tract_store"
+STORE_VERSION = 2
+
+
+def write_store(data_dir=".", output_dir=None):
+    """
+    Builds the store from the tract x year panel. The files are written into a temporary
+    directory that replaces the old store in one rename, so readers never see half a store.
+
+    Args:
+        data_dir (str, optional): Directory containing the processed attribute CSVs. Defaults to ".".
+        output_dir (str, optional): Store directory. Defaults to <data_dir>/tract_store.
+
+    Returns:
+        str or None: The store directory, or None if there was no data.
+    """
+    merged = load_panel(data_dir)
+    if merged is None:
+        return None
+    array = build_tract_array(merged, PANEL_ATTRS)
+    names = merged.groupby(county_fips(merged['GEOID'].to_numpy()))['County'].first()
+    return _save_store(output_dir or os.path.join(data_dir, STORE_DIR), array["values"],
+                       build_tract_array(merged, PANEL_MOES)["values"], array["present"], array["geoids"],
+                       array["years"], names.to_dict())
+
+
+def _save_store(store_dir, values, moe, present, geoids, years, county_names):
+    # Writes the store's files into a staging directory and swaps it in
+    staging = f"{store_dir}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    np.save(os.path.join(staging, "values.npy"), np.ascontiguousarray(values, dtype=np.float64))
+    np.save(os.path.join(staging, "moe.npy"), np.ascontiguousarray(moe, dtype=np.float64))
+    np.save(os.path.join(staging, "valid.npy"), np.packbits(~np.isnan(values), axis=2))
+    np.save(os.path.join(staging, "present.npy"), np.packbits(present, axis=1))
+    np.save(os.path.join(staging, "geoids.npy"), np.asarray(geoids, dtype=np.int64))
+    np.save(os.path.join(staging, "years.npy"), np.asarray(years, dtype=np.int64))
+    with open(os.path.join(staging, "meta.json"), "w") as f:
+        json.dump({"version": STORE_VERSION, "attributes": {attr: i for i, attr in enumerate(PANEL_ATTRS)},
+                   "counties": {fips_string(fips): name for fips, name in sorted(county_names.items())},
+                   "shape": list(values.shape)}, f, indent=2)
+
+    previous = f"{store_dir}.old"
+    if os.path.exists(store_dir):
+        os.replace(store_dir, previous)
+    os.replace(staging, store_dir)
+    shutil.rmtree(previous, ignore_errors=True)
+    return store_dir
+
+
+def update_store(data_dir, panel, keys):
+    """
+    Brings the store up to date with the panel rows of some changed tract-years, growing it by
+    any new tracts and years. Everything else is copied over from the current store, so only
+    the changed rows are laid out again.
+
+    Args:
+        data_dir (str): Directory containing the store.
+        panel (pandas.DataFrame): The updated panel (panel.update_panel).
+        keys (numpy.ndarray): Sorted panel keys of the changed tract-years.
+
+    Returns:
+        str or None: The store directory, or None if there is no store of this version to update.
+    """
+    store_dir = os.path.join(data_dir, STORE_DIR)
+    meta_file = os.path.join(store_dir, "meta.json")
+    if not os.path.exists(meta_file):
+        return None
+    with open(meta_file) as f:
+        if json.load(f)["version"] != STORE_VERSION:
+            return None
+    store = TractStore(store_dir)
+    if store.attributes != PANEL_ATTRS:
+        return None
+    rows = panel.iloc[np.searchsorted(panel_keys(panel['GEOID'], panel['Year']), keys)]
+    geoids = np.union1d(store.geoids, rows['GEOID'].to_numpy(np.int64))
+    years = np.union1d(store.years, rows['Year'].to_numpy(np.int64))
+
+    shape = (len(geoids), len(years), len(PANEL_ATTRS))
+    values, moe = np.full(shape, np.nan), np.full(shape, np.nan)
+    present = np.zeros(shape[:2], dtype=bool)
+    old_rows, old_columns = np.searchsorted(geoids, store.geoids)[:, None], np.searchsorted(years, store.years)
+    values[old_rows, old_columns] = store.values
+    moe[old_rows, old_columns] = store.moe
+    present[old_rows, old_columns] = store.present()
+
+    tract = np.searchsorted(geoids, rows['GEOID'].to_numpy(np.int64))
+    year = np.searchsorted(years, rows['Year'].to_numpy(np.int64))
+    values[tract, year] = rows[PANEL_ATTRS].to_numpy(dtype=np.float64)
+    moe[tract, year] = rows[PANEL_MOES].to_numpy(dtype=np.float64)
+    present[tract, year] = True
+
+    county_names = dict(store.county_names)
+    new_counties = rows.groupby(county_fips(rows['GEOID'].to_numpy()))['County'].first()
+    for fips, name in new_counties.items():
+        county_names.setdefault(fips, name)
+    del store
+    return _save_store(store_dir, values, moe, present, geoids, years, county_names)
+
+
+class TractStore:
+    """
+    An opened store. values is a read-only memory map, so opening costs the same for any
+    dataset size and pages are read from disk only when touched.
+    """
+    def __init__(self, store_dir):
+        with open(os.path.join(store_dir, "meta.json")) as f:
+            meta = json.load(f)
+        if meta["version"] != STORE_VERSION:
+            raise ValueError(f"{store_dir} has store version {meta['version']}, expected {STORE_VERSION}")
+        self.planes = meta["attributes"]
+        self.attributes = sorted(self.planes, key=self.planes.get)
+        self.county_names = {int(fips): name for fips, name in meta["counties"].items()}
+        self.values = np.load(os.path.join(store_dir, "values.npy"), mmap_mode="r")
+        self.moe = np.load(os.path.join(store_dir, "moe.npy"), mmap_mode="r")
+        self.geoids = np.load(os.path.join(store_dir, "geoids.npy"), mmap_mode="r")
+        self.years = np.load(os.path.join(store_dir, "years.npy"))
+        self._valid_bits = np.load(os.path.join(store_dir, "valid.npy"), mmap_mode="r")
+        self._present_bits = np.load(os.path.join(store_dir, "present.npy"), mmap_mode="r")
+        self.columns = {int(year): i for i, year in enumerate(self.years)}
+
+    def row(self, geoid):
+        """
+        Row of a tract GEOID, or None if the store doesn't have it.
+        """
+        row = int(np.searchsorted(self.geoids, geoid))
+        return row if row < len(self.geoids) and self.geoids[row] == geoid else None
+
+    def value(self, geoid, year, attr):
+        """
+        One value, NaN if missing; KeyError for an unknown tract, year or attribute.
+        """
+        row = self.row(geoid)
+        if row is None:
+            raise KeyError(geoid)
+        return float(self.values[row, self.columns[year], self.planes[attr]])
+
+    def is_valid(self, row, column, plane):
+        return bool(self._valid_bits[row, column, plane // 8] & (0x80 >> (plane % 8)))
+
+    def valid(self):
+        """
+        Unpacked tracts x years x attributes validity mask.
+        """
+        return np.unpackbits(self._valid_bits, axis=2, count=len(self.attributes)).astype(bool)
+
+    def present(self):
+        """
+        Unpacked tracts x years mask of the rows that exist in the panel.
+        """
+        return np.unpackbits(self._present_bits, axis=1, count=len(self.years)).astype(bool)
+
+    def present_columns(self, row):
+        """
+        Year columns in which one tract row exists.
+        """
+        return np.flatnonzero(np.unpackbits(self._present_bits[row], count=len(self.years)))
+
+    def tract_array(self, attrs=PANEL_ATTRS):
+        """
+        The same dict gentrification_score.build_tract_array returns, for some attributes,
+        plus their margins of error under "moe". Selecting planes copies only those
+        attributes out of the memory maps.
+        """
+        planes = [self.planes[attr] for attr in attrs]
+        every_plane = planes == list(range(len(self.attributes)))
+        values = self.values if every_plane else self.values[:, :, planes]
+        moe = self.moe if every_plane else self.moe[:, :, planes]
+        counties, county = np.unique(county_fips(np.asarray(self.geoids)), return_inverse=True)
+        return {"values": values, "moe": moe, "present": self.present(), "geoids": np.asarray(self.geoids),
+                "county": county, "counties": counties, "years": self.years}
+
+
+def open_store(data_dir=".", rebuild=True):
+    """
+    Opens the store in data_dir, first (re)building it when it is missing, older than any
+    processed attribute CSV or of another store version, and rebuild is True.
+
+    Returns:
+        TractStore or None: None if there is no store and no data to build one from.
+    """
+    store_dir = os.path.join(data_dir, STORE_DIR)
+    meta_file = os.path.join(store_dir, "meta.json")
+    sources = [os.path.join(data_dir, spec["output"]) for spec in TABLE_SPECS.values()]
+    newest_source = max((os.path.getmtime(f) for f in sources if os.path.exists(f)), default=0)
+    stale = not os.path.exists(meta_file) or os.path.getmtime(meta_file) < newest_source
+    if not stale:
+        with open(meta_file) as f:
+            stale = json.load(f)["version"] != STORE_VERSION
+    if rebuild and stale:
+        if write_store(data_dir) is None:
+            return None
+    if not os.path.exists(meta_file):
+        return None
+    return TractStore(store_dir)
+
+
+def load_tract_array(data_dir=".", attrs=PANEL_ATTRS):
+    """
+    build_tract_array's output for some attributes, read from the store when it is current
+    (and rebuilt from the panel otherwise). Returns None if there is no data.
+    """
+    store = open_store(data_dir)
+    return None if store is None else store.tract_array(attrs)
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    store_dir = write_store()
+    if store_dir is None:
+        print("No processed attribute files found. Exiting.")
+    else:
+        start = time.perf_counter()
+        store = TractStore(store_dir)
+        print(f"Wrote {store.values.shape[0]} tracts x {len(store.years)} years x {len(store.attributes)} "
+              f"attributes to {store_dir} (opened in {(time.perf_counter() - start) * 1000:.1f} ms)")
@@ -0,0 +1,211 @@
+import numpy as np
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from scipy.special import stdtr
+
+from county_shards import _json_value
+from hotspots import tract_variables
+from panel import YEAR_SCALE
+from tract_keys import county_fips, fips_string
+
+# Robust trend and change-point of every tract's yearly series of the gentrification score and
+# every panel attribute, fitted for all tracts at once on the tracts x years matrix:
+#   slope        Theil-Sen slope over every year (the median of the slopes between all pairs of
+#                years), in the variable's units per year
+#   onset        first year after the single change-point: the split into two Theil-Sen fits
+#                with the smallest total absolute residual, each side with at least MIN_SEGMENT values
+#   pre/post     Theil-Sen slopes before and from the onset
+#   confidence   1 - p of the slope change: a t-test whose residual scale is the mean absolute
+#                residual of both fits (times sqrt(pi / 2), a standard deviation for normal noise,
+#                with four fitted parameters), Bonferroni-corrected for the number of splits tried
+# Missing years are left out of every fit; a tract without enough values for a split has no onset.
+MIN_SEGMENT = 3
+# Tracts per parallel task
+CHUNK_TRACTS = 20000
+
+
+def _row_medians(values):
+    # Median of every row over its non-NaN values (NaN sorts last), NaN for an empty row
+    if values.shape[1] == 0:
+        return np.full(values.shape[0], np.nan)
+    ordered = np.sort(values, axis=1)
+    count = (~np.isnan(values)).sum(axis=1)
+    low = np.take_along_axis(ordered, np.maximum((count - 1) // 2, 0)[:, None], axis=1)[:, 0]
+    high = np.take_along_axis(ordered, (count // 2)[:, None], axis=1)[:, 0]
+    return np.where(count > 0, (low + high) / 2, np.nan)
+
+
+def theil_sen(values, x):
+    """
+    Theil-Sen line of every row of values: the slope is the median of the slopes between all
+    pairs of valid points, the intercept the median of y - slope * x.
+
+    Args:
+        values (numpy.ndarray): series x points, NaN where missing.
+        x (numpy.ndarray): The points' positions (years).
+
+    Returns:
+        tuple: (slope, intercept, residuals (series x points, NaN where missing))
+    """
+    first, second = np.triu_indices(len(x), k=1)
+    with np.errstate(invalid="ignore"):
+        slope = _row_medians((values[:, second] - values[:, first]) / (x[second] - x[first]))
+        residual = values - slope[:, None] * x
+    intercept = _row_medians(residual)
+    return slope, intercept, residual - intercept[:, None]
+
+
+def _spread(residual, x):
+    # Sum of squared deviations from their mean of the positions with a value; the standard
+    # error of a slope is the residual scale over its square root
+    valid = ~np.isnan(residual)
+    mean = np.where(valid, x, 0.0).sum(axis=1) / np.maximum(valid.sum(axis=1), 1)
+    return np.where(valid, (x - mean[:, None]) ** 2, 0.0).sum(axis=1)
+
+
+def fit_trends(task):
+    """
+    Trend and change-point of a chunk of series. Every split is fitted for all series that have
+    enough values on both sides at once; only the loop over the splits is in Python. Runs in a
+    worker process.
+
+    Args:
+        task (tuple): (series x years values, NaN where missing; the years)
+
+    Returns:
+        dict: "slope", "onset" (year, NaN without a change-point), "pre", "post" and
+              "confidence", one value per series.
+    """
+    values, years = task
+    x = (years - years[0]).astype(np.float64)
+    valid = ~np.isnan(values)
+    n = values.shape[0]
+    slope = theil_sen(values, x)[0]
+
+    best = np.full(n, np.inf)
+    onset = np.full(n, -1)
+    pre, post, pre_spread, post_spread = (np.full(n, np.nan) for _ in range(4))
+    splits = np.zeros(n, dtype=np.int64)
+    for k in range(1, len(x)):
+        rows = np.flatnonzero((valid[:, :k].sum(axis=1) >= MIN_SEGMENT) & (valid[:, k:].sum(axis=1) >= MIN_SEGMENT))
+        if len(rows) == 0:
+            continue
+        before, _, before_residual = theil_sen(values[rows, :k], x[:k])
+        after, _, after_residual = theil_sen(values[rows, k:], x[k:])
+        cost = np.nansum(np.abs(before_residual), axis=1) + np.nansum(np.abs(after_residual), axis=1)
+        splits[rows] += 1
+        # Strictly better only, so a tie keeps the earlier onset
+        better = cost < best[rows]
+        update = rows[better]
+        best[update] = cost[better]
+        onset[update] = k
+        pre[update], post[update] = before[better], after[better]
+        pre_spread[update] = _spread(before_residual[better], x[:k])
+        post_spread[update] = _spread(after_residual[better], x[k:])
+
+    found = onset >= 0
+    count = valid.sum(axis=1)
+    dof = np.maximum(count - 4, 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scale = np.sqrt(np.pi / 2) * best / np.sqrt(count * dof)
+        t = (post - pre) / (scale * np.sqrt(1 / pre_spread + 1 / post_spread))
+    # Exact fits have no residuals: any change of slope is then certain, none is no evidence
+    p = np.where(np.isnan(t), 1.0, 2 * stdtr(dof, -np.abs(np.nan_to_num(t))))
+    confidence = np.where(found, 1 - np.minimum(p * np.maximum(splits, 1), 1), np.nan)
+    return {"slope": slope, "onset": np.where(found, years[np.maximum(onset, 0)], np.nan),
+            "pre": pre, "post": post, "confidence": confidence}
+
+
+def compute_trends(variables, years, workers=1):
+    """
+    Trend and change-point of every tract's series of every variable. The tracts are split
+    into chunks of CHUNK_TRACTS, one task each, so the results don't depend on the number of
+    workers.
+
+    Args:
+        variables (dict): Variable name -> tracts x years array (NaN where missing).
+        years (numpy.ndarray): The years of the columns.
+        workers (int, optional): Worker processes fitting the chunks.
+
+    Returns:
+        dict: variable -> output of fit_trends for all tracts
+    """
+    years = np.asarray(years)
+    names = [name for name, values in variables.items() for _ in range(0, values.shape[0], CHUNK_TRACTS)]
+    tasks = [(values[start:start + CHUNK_TRACTS], years)
+             for values in variables.values() for start in range(0, values.shape[0], CHUNK_TRACTS)]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(fit_trends, tasks))
+    else:
+        outcomes = [fit_trends(task) for task in tasks]
+
+    results = {}
+    for name, outcome in zip(names, outcomes):
+        results.setdefault(name, []).append(outcome)
+    return {name: {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0]}
+            for name, chunks in results.items()}
+
+
+def write_trends(data_dir=".", output_dir="counties", workers=None, decimals=6, changed_keys=None):
+    """
+    Computes the trends and change-points of every tract and writes them as one column-oriented
+    <fips>.trends.json per county, like the hotspot layers: {"fips", "columns": {"GEOID",
+    "<variable> slope", "<variable> onset", "<variable> pre slope", "<variable> post slope",
+    "<variable> confidence"}}, one entry per tract.
+
+    Args:
+        data_dir (str, optional): Directory with the processed CSVs.
+        output_dir (str, optional): Directory to write the county files into. Defaults to "counties".
+        workers (int, optional): Worker processes. Defaults to the number of CPUs.
+        changed_keys (numpy.ndarray, optional): Panel keys of the tract-years changed since the
+                                                files were written; a change moves its county's
+                                                medians and so every score of the county, so
+                                                only these counties are fitted and rewritten.
+    """
+    array, variables = tract_variables(data_dir)
+    if array is None:
+        print("No processed attribute files found. Exiting.")
+        return None
+
+    county = county_fips(array["geoids"])
+    rows = np.arange(len(array["geoids"]))
+    if changed_keys is not None:
+        rows = np.flatnonzero(np.isin(county, county_fips(changed_keys // YEAR_SCALE)))
+    variables = {name: values[rows] for name, values in variables.items()}
+    start = time.perf_counter()
+    results = compute_trends(variables, array["years"], workers or os.cpu_count() or 1)
+    print(f"Fitted trends of {len(variables)} variables for {len(rows)} tracts x {len(array['years'])} years "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    def rounded(values):
+        return [_json_value(None if np.isnan(v) else round(float(v), decimals)) for v in values]
+
+    os.makedirs(output_dir, exist_ok=True)
+    for fips in np.unique(county[rows]):
+        tract = np.flatnonzero(county[rows] == fips)
+        columns = {"GEOID": array["geoids"][rows[tract]].tolist()}
+        for name, r in results.items():
+            columns[f"{name} slope"] = rounded(r["slope"][tract])
+            columns[f"{name} onset"] = [None if np.isnan(v) else int(v) for v in r["onset"][tract]]
+            columns[f"{name} pre slope"] = rounded(r["pre"][tract])
+            columns[f"{name} post slope"] = rounded(r["post"][tract])
+            columns[f"{name} confidence"] = rounded(r["confidence"][tract])
+        trends_file = os.path.join(output_dir, f"{fips_string(fips)}.trends.json")
+        with open(trends_file, "w") as f:
+            json.dump({"fips": fips_string(fips), "columns": columns}, f, separators=(",", ":"))
+        print(f"Wrote trends of {len(tract)} tracts for county {fips_string(fips)} to {trends_file}")
+    return results
+
+
+# --- Main execution block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit a robust trend and change-point to every tract's yearly series.")
+    parser.add_argument("--data-dir", default=".", help="directory with the processed CSVs")
+    parser.add_argument("--output-dir", default="counties", help="where the <fips>.trends.json files are written")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+    write_trends(args.data_dir, args.output_dir, args.workers)
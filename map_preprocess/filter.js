@@ -1,28 +1,48 @@
 const fs = require("fs");
 
-// Combined FIPS code list
-const targetIDs = new Set(["06001", "06013", "06041", "06055", "06075", "06081", "06085", "06095", "06097"]);
-//const mapCountyIDs = ["06087", "06047", "06099", "06077", "06009", "06005", "06017", "06067", "06113", "06101", "06011", "06033", "06045", "06061", "06057", "06115"];
-//const targetIDs = new Set([...bayAreaCountyIDs]);
+// Usage: node filter.js [region.json | FIPS code ...] [--topology 06.topo.json] [--output filtered-counties.topo.json]
+// A region is a JSON file {"counties": [...], "states": [...]} (the same file data_preprocess/build.py
+// takes with --region) or a list of county (06001) and state (06) FIPS codes.
+// Without one, the nine Bay Area counties are kept.
+const bayAreaCountyIDs = ["06001", "06013", "06041", "06055", "06075", "06081", "06085", "06095", "06097"];
+
+const args = process.argv.slice(2);
+function option(name, fallback) {
+  const i = args.indexOf(name);
+  return i === -1 ? fallback : args.splice(i, 2)[1];
+}
+const topologyFile = option("--topology", "06.topo.json");
+const outputFile = option("--output", "filtered-counties.topo.json");
+
+let region = { counties: bayAreaCountyIDs, states: [] };
+if (args.length === 1 && args[0].endsWith(".json")) {
+  region = JSON.parse(fs.readFileSync(args[0], "utf8"));
+} else if (args.length > 0) {
+  region = { counties: args.filter((id) => id.length === 5), states: args.filter((id) => id.length <= 2) };
+}
+const targetIDs = new Set((region.counties || []).map((id) => String(id).padStart(5, "0")));
+const targetStates = (region.states || []).map((id) => String(id).padStart(2, "0"));
 
 // Load the original TopoJSON
-const topojson = JSON.parse(fs.readFileSync("06.topo.json", "utf8"));
+const topojson = JSON.parse(fs.readFileSync(topologyFile, "utf8"));
 
 //Error Check
 if (!topojson.objects || !topojson.objects.counties) {
-  console.error("Missing 'objects.counties' in cali.json");
+  console.error(`Missing 'objects.counties' in ${topologyFile}`);
   process.exit(1);
 }
 
 // Filter counties
 const originalCounties = topojson.objects.counties.geometries;
-const filteredCounties = originalCounties.filter((geom) => targetIDs.has(geom.properties.id));
+const filteredCounties = originalCounties.filter(
+  (geom) => targetIDs.has(geom.properties.id) || targetStates.some((state) => geom.properties.id.startsWith(state))
+);
 
 
 // Replace with filtered counties
 topojson.objects.counties.geometries = filteredCounties;
 
 // Write filtered TopoJSON to file
-fs.writeFileSync("filtered-counties.topo.json", JSON.stringify(topojson));
+fs.writeFileSync(outputFile, JSON.stringify(topojson));
 
-console.log("filtered-counties.json created successfully");
+console.log(`${outputFile} created successfully (${filteredCounties.length} counties)`);
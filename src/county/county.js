@@ -2,7 +2,7 @@ import { genScore} from "./dashboards/heatmap.js";
 import { updateAnnotationsForYear } from './dashboards/annotations.js';
 import { renderMedianTable } from './dashboards/medianTable.js';
 import { initializeStreamGraph, updateStreamGraph } from './dashboards/streamGraph.js';
-import { countyids, attributeFiles, allAnnotations } from './values.js';
+import { countyids, attributeFiles, countyShardDir, allAnnotations } from './values.js';
 
 //global variables
 const county = window.location.search.replace("%20", " ").substr(1);
@@ -14,6 +14,9 @@ const width = 960, height = 600;
 let data = []; //data has all data for current county across all years. ALL DATA FOR COUNTY
 let yearData = []; //data filtered to current year on year slider. HEATMAP + BAR CHART
 let Scores = []; //holds score data for all years
+let precomputedScores = null; //scores loaded from <fips>.scores.json, if the data folder has them
+let countyCube = null; //medians and stream series loaded from <fips>.cube.json, if the data folder has them
+let tractTrends = null; //score change-points loaded from <fips>.trends.json, keyed by Tract ID, if the data folder has them
 let tractData = []; //data filtered to specific tract based on heatmap click. STREAM GRAPH
 let selectedTractId = null; // Track currently selected tract
 
@@ -38,8 +41,8 @@ function updateTractTimeSeries(tractID) {
   
   //console.log("Filtered tract data:", tractData.length, "records");
   
-  // Update stream graph with new tract data
-  updateStreamGraph(tractData);
+  // Update stream graph with new tract data (using its precomputed series when there is a cube)
+  updateStreamGraph(tractData, countyCube && countyCube.stream[tractID]);
   
   // Highlight selected tract
   highlightSelectedTract(tractID);
@@ -151,6 +154,25 @@ function showTractInfoBox(d) {
     .attr("class", "score")
     .text(`Gentrification Score: ${typeof tractScore === "number" ? tractScore.toFixed(3) : "N/A"}`);
 
+  // Precomputed scores carry a 90% interval from the ACS margins of error and a reliability flag
+  if (tractScoreObj && typeof tractScoreObj.lower === "number" && typeof tractScoreObj.upper === "number") {
+    box.append("div")
+      .attr("class", "score-interval")
+      .text(`90% interval: ${tractScoreObj.lower.toFixed(3)} to ${tractScoreObj.upper.toFixed(3)}` +
+        (tractScoreObj.reliable ? "" : " (unreliable)"));
+  } else if (tractScoreObj && tractScoreObj.reliable === false && typeof tractScore === "number") {
+    box.append("div").attr("class", "score-interval").text("Margins of error unavailable (unreliable)");
+  }
+
+  // Change-point of the tract's score series (data_preprocess/tract_trends.py)
+  const trend = tractTrends && tractTrends.get(tractId);
+  if (trend && trend.onset !== null && trend.confidence >= TREND_CONFIDENCE) {
+    box.append("div")
+      .attr("class", "score-trend")
+      .text(`Score ${trendDirection(trend.post)} from ${trend.onset}, ${trendDirection(trend.pre)} before ` +
+        `(confidence ${trend.confidence.toFixed(2)})`);
+  }
+
   attributes.forEach(({ key, label }) => {
     let value = tractInfo[key];
     // Format numbers with no decimal places if value is a number and not NaN
@@ -188,7 +210,11 @@ function updateregions(colorScale, scores) {
     .attr("fill", function(d) {
       if (!d || !d.properties) return "#fff";
       const tractId = d.properties.id.substr(5).trim();
-      const scoreObj = scores.find(s => s.tractId === tractId);
+      // Tract files built by data_preprocess/topology.py carry their scores ({year: score or null})
+      const embedded = d.properties.scores;
+      const scoreObj = embedded && scores.length
+        ? (String(year) in embedded ? { score: embedded[year] === null ? undefined : embedded[year] } : undefined)
+        : scores.find(s => s.tractId === tractId);
       if (scoreObj && typeof scoreObj.score === "number" && scoreObj.score > 0) {
         return colorScale(scoreObj.score);
       } else if (scoreObj && typeof scoreObj.score === "undefined") {
@@ -357,28 +383,108 @@ function updateheatmap() {
 }
 
 
-// Load and merge all CSVs
-Promise.all(attributeFiles.map((d) => d3.csv(d.file))).then((datasets) => {
-  const keys = attributeFiles.map((d) => d.column);
-  
-  // Merge all datasets (all single-attribute)
-  datasets.forEach((data, i) => {
-    data.forEach((d) => {
-      if (d.County.trim() === county) {
-        const key = `${d["Tract ID"]}_${d["Year"]}`;
-        if (!filteredData.has(key)) {
-          filteredData.set(key, {
-            "Tract ID": preprocessTractID(d["Tract ID"].replace(".", "")),
-            Year: d["Year"],
-          });
+// Turn a county shard ({columns: {name: [values]}}) back into one object per tract and year.
+// Missing values are left undefined, as they were when merging the CSVs.
+function shardToRows(shard) {
+  const names = Object.keys(shard.columns);
+  return shard.columns["Year"].map((_, i) => {
+    const row = {};
+    names.forEach((name) => {
+      const value = shard.columns[name][i];
+      if (value !== null) row[name] = value;
+    });
+    return row;
+  });
+}
+
+// Fallback for data folders without county shards: load and merge all CSVs
+function loadAttributeCSVs() {
+  return Promise.all(attributeFiles.map((d) => d3.csv(d.file))).then((datasets) => {
+    const keys = attributeFiles.map((d) => d.column);
+
+    // Merge all datasets (all single-attribute)
+    datasets.forEach((data, i) => {
+      data.forEach((d) => {
+        if (d.County.trim() === county) {
+          // Newer CSVs carry the integer GEOID, whose last six digits are the topo.json tract code
+          const tractID = d.GEOID
+            ? d.GEOID.padStart(11, "0").substr(5)
+            : preprocessTractID(d["Tract ID"].replace(".", ""));
+          const key = `${tractID}_${d["Year"]}`;
+          if (!filteredData.has(key)) {
+            filteredData.set(key, {
+              "Tract ID": tractID,
+              Year: d["Year"],
+            });
+          }
+          filteredData.get(key)[keys[i]] = d[keys[i]];
         }
-        filteredData.get(key)[keys[i]] = d[keys[i]];
-      }
+      });
     });
+
+    return Array.from(filteredData.values());
   });
-  
+}
+
+// Precomputed scores (data_preprocess/gentrification_score.py) store undefined scores as null
+function loadPrecomputedScores() {
+  return d3.json(`${countyShardDir}${countyids[county]}.scores.json`)
+    .then((scores) => {
+      scores.forEach((s) => { if (s.score === null) s.score = undefined; });
+      return scores;
+    })
+    .catch(() => null);
+}
+
+// Score change-points of every tract, from the column-oriented <fips>.trends.json
+const TREND_VARIABLE = "Gentrification_Score";
+const TREND_CONFIDENCE = 0.9;
+
+function trendsByTract(trends) {
+  const columns = trends.columns;
+  const byTract = new Map();
+  columns.GEOID.forEach((geoid, i) => {
+    byTract.set(String(geoid).slice(-6), {
+      onset: columns[`${TREND_VARIABLE} onset`][i],
+      pre: columns[`${TREND_VARIABLE} pre slope`][i],
+      post: columns[`${TREND_VARIABLE} post slope`][i],
+      confidence: columns[`${TREND_VARIABLE} confidence`][i],
+    });
+  });
+  return byTract;
+}
+
+// Direction of a trend slope
+function trendDirection(slope) {
+  return slope > 0 ? "rising" : slope < 0 ? "falling" : "flat";
+}
+
+// The year's annotations, plus how many tracts' scores started rising that year: rising from
+// the onset, and not already rising as fast before it
+function annotationsForYear(year) {
+  const notes = [...(allAnnotations[year] || [])];
+  if (tractTrends) {
+    let rising = 0;
+    tractTrends.forEach((t) => {
+      if (String(t.onset) === String(year) && t.post > 0 && t.post > t.pre && t.confidence >= TREND_CONFIDENCE) rising++;
+    });
+    if (rising > 0) notes.push(`${rising} tracts' gentrification scores started rising this year`);
+  }
+  return notes;
+}
+
+// Load the pre-merged shard for this county (written by data_preprocess/county_shards.py)
+Promise.all([
+  d3.json(`${countyShardDir}${countyids[county]}.json`).then(shardToRows).catch(loadAttributeCSVs),
+  loadPrecomputedScores(),
+  d3.json(`${countyShardDir}${countyids[county]}.cube.json`).catch(() => null),
+  d3.json(`${countyShardDir}${countyids[county]}.trends.json`).then(trendsByTract).catch(() => null),
+]).then(([rows, scores, cube, trends]) => {
   // Convert to global array
-  data = Array.from(filteredData.values());
+  data = rows;
+  precomputedScores = scores;
+  countyCube = cube;
+  tractTrends = trends;
   console.log(data);
   updateyearData();
   init();
@@ -442,7 +548,7 @@ function updateStreamGraphTitle(tractID) {
 
 //CALL ALL VISUALIZATION FUNCTIONS HERE
 function init() {
-  updateAnnotationsForYear(allAnnotations[year] || []); 
+  updateAnnotationsForYear(annotationsForYear(year)); 
   
   // Initialize stream graph
   initializeStreamGraph();
@@ -521,10 +627,10 @@ function init() {
 
     svg.append("g").attr("style", "font-family: 'Lato';");
     //called heatmap here bc need to wait for svg to load and loads on page open
-    Scores = getTractScores();
+    Scores = precomputedScores || getTractScores();
     updateheatmap();
     // After heatmap is updated, NOW we update the barchart
-    renderMedianTable("#med-table-container", yearData); 
+    renderMedianTable("#med-table-container", yearData, countyCube); 
     // initial update of annotation title
     updateAnnotationTitle(year);
   });
@@ -544,9 +650,9 @@ yearSlider.addEventListener("input", () => {
 yearSlider.onchange = function(){
   year = yearSlider.value; 
   updateyearData(); 
-  updateAnnotationsForYear(allAnnotations[year] || []);
+  updateAnnotationsForYear(annotationsForYear(year));
   updateheatmap();
-  renderMedianTable("#med-table-container", yearData);
+  renderMedianTable("#med-table-container", yearData, countyCube);
   updateAnnotationTitle(year);
 
   // Instead of removing the box, update it if a tract is selected
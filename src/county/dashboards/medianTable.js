@@ -1,5 +1,16 @@
-// Given a current year and svg container from county.js, render the Median Table
-export function renderMedianTable(containerId, currentYearData) {
+// Median of one attribute for a year, looked up in the county's precomputed aggregate cube
+// (data_preprocess/county_cube.py). Returns undefined where the county has no value.
+function cubeMedian(cube, key, year) {
+  const a = cube.attributes.indexOf(key);
+  const y = cube.years.indexOf(+year);
+  if (a < 0 || y < 0) return undefined;
+  const median = cube.median[a][y];
+  return median === null ? undefined : median;
+}
+
+// Given a current year and svg container from county.js, render the Median Table.
+// With the county's aggregate cube the medians are read from it instead of computed from tract rows.
+export function renderMedianTable(containerId, currentYearData, cube = null) {
   // Map from CSV variables to human-readable labels and units
   const unitsMap = {
   "Total Population": "People",
@@ -39,8 +50,9 @@ export function renderMedianTable(containerId, currentYearData) {
 
   // Compute and append data rows
   Object.entries(attributeMap).forEach(([label, key]) => {
-    const values = currentYearData.map(d => +d[key]).filter(v => !isNaN(v));
-    const median = d3.median(values);
+    const median = cube
+      ? cubeMedian(cube, key, year)
+      : d3.median(currentYearData.map(d => +d[key]).filter(v => !isNaN(v)));
 
     const row = tbody.append("tr");
     row.append("td").text(label);
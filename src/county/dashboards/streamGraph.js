@@ -72,7 +72,9 @@ function initializeStreamGraph() {
 }
 
 
-function updateStreamGraph(tractData) {
+// `series` is the tract's precomputed stream series from the county cube ({Year: [...], column: [...]},
+// already divided by the tract's maximum per attribute); without it the series is computed from tractData
+function updateStreamGraph(tractData, series = null) {
   const baselineY = y(0);
   //console.log("tractData sample:", tractData[0]);
   if (!isInitialized) {
@@ -84,24 +86,7 @@ function updateStreamGraph(tractData) {
     return;
   }
 
-  const maxValues = {};
-  keys.forEach(k => {
-    const rawKey = attributeMap[k];
-    maxValues[k] = d3.max(tractData, d => +d[rawKey] || 0);
-  });
-
-  // Transform tractData to the format expected by the stack generator and normalize the values
-  const processedData = tractData.map(function(d) {
-    return {
-      Year: +d.Year,
-      home_value: (+d[attributeMap.home_value] || 0) / maxValues.home_value,
-      income: (+d[attributeMap.income] || 0) / maxValues.income,
-      rent: (+d[attributeMap.rent] || 0) / maxValues.rent,
-      education: (+d[attributeMap.education] || 0) / maxValues.education,
-      occupancy: (+d[attributeMap.occupancy] || 0) / maxValues.occupancy,
-      population: (+d[attributeMap.population] || 0) / maxValues.population
-    };
-  });
+  const processedData = series ? seriesToRows(series) : normalizeTractData(tractData);
 
   const layers = stack(processedData);
   
@@ -143,6 +128,39 @@ function updateStreamGraph(tractData) {
     .style("font-size", "12px");
 }
 
+// Transform tractData to the format expected by the stack generator and normalize the values
+function normalizeTractData(tractData) {
+  const maxValues = {};
+  keys.forEach(k => {
+    const rawKey = attributeMap[k];
+    maxValues[k] = d3.max(tractData, d => +d[rawKey] || 0);
+  });
+
+  return tractData.map(function(d) {
+    return {
+      Year: +d.Year,
+      home_value: (+d[attributeMap.home_value] || 0) / maxValues.home_value,
+      income: (+d[attributeMap.income] || 0) / maxValues.income,
+      rent: (+d[attributeMap.rent] || 0) / maxValues.rent,
+      education: (+d[attributeMap.education] || 0) / maxValues.education,
+      occupancy: (+d[attributeMap.occupancy] || 0) / maxValues.occupancy,
+      population: (+d[attributeMap.population] || 0) / maxValues.population
+    };
+  });
+}
+
+// Same rows from a precomputed series; null (an attribute that is 0 every year) is NaN, as 0 / 0 was
+function seriesToRows(series) {
+  return series.Year.map(function(year, i) {
+    const row = { Year: year };
+    keys.forEach(k => {
+      const value = series[attributeMap[k]][i];
+      row[k] = value === null ? NaN : value;
+    });
+    return row;
+  });
+}
+
 function createLegend() {
   const legendContainer = d3.select("#legend-container");
   legendContainer.html(""); // Clear existing legend
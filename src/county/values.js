@@ -23,6 +23,9 @@ export const attributeFiles = [
   { file: "../data/vac_status.csv", column: "Vacant Units" },
 ];
 
+// Directory of per-county shards (<fips>.json) merging all attribute files for one county
+export const countyShardDir = "../data/counties/";
+
 // year-annotation pair of all annotations used in visualization. Year selected based on timeline event.
 export const allAnnotations = {
   "2010": [
@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+# The preprocessing scripts import each other as top-level modules, as when run from data_preprocess/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data_preprocess"))
+
+LAST_YEAR = 2023
+
+
+@pytest.fixture(scope="session")
+def synthetic_build(tmp_path_factory):
+    """
+    A small synthetic ACS tree (acs_synth at scale 0.05) built in full for 2010 to LAST_YEAR.
+
+    Returns:
+        tuple: (region, input directory, output directory)
+    """
+    from acs_synth import generate
+    from build import build_derived, load_region, run_build
+
+    root = tmp_path_factory.mktemp("synthetic")
+    data_dir, output_dir = str(root / "data"), str(root / "full")
+    generate(data_dir, scale=0.05, end_year=LAST_YEAR)
+    region = load_region()
+    run_build(region, start_year=2010, end_year=LAST_YEAR, input_dir=data_dir, output_dir=output_dir, workers=1)
+    build_derived(output_dir, region)
+    return region, data_dir, output_dir
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import acs_sentinels
+from acs_sentinels import (STATUS_BOTTOM_CODED, STATUS_CONTROLLED, STATUS_INVALID, STATUS_MISSING,
+                           STATUS_NOT_APPLICABLE, STATUS_OK, STATUS_SUPPRESSED, STATUS_TOP_CODED,
+                           decode_estimates)
+
+# (raw cell, decoded value, status)
+CELLS = [
+    ("1234", 1234.0, STATUS_OK),
+    ("-12.5", -12.5, STATUS_OK),
+    ("1.5e3", 1500.0, STATUS_OK),
+    ("007", 7.0, STATUS_OK),
+    (" 42 ", 42.0, STATUS_OK),
+    ("1,234", 1234.0, STATUS_OK),
+    ("250-", 250.0, STATUS_BOTTOM_CODED),
+    ("2,500-", 2500.0, STATUS_BOTTOM_CODED),
+    ("-5-", -5.0, STATUS_BOTTOM_CODED),
+    ("2,000+", 2000.0, STATUS_TOP_CODED),
+    ("250,000+", 250000.0, STATUS_TOP_CODED),
+    ("1,000,000+", 1000000.0, STATUS_TOP_CODED),
+    ("3500 +", 3500.0, STATUS_TOP_CODED),
+    ("**", np.nan, STATUS_CONTROLLED),
+    ("***", np.nan, STATUS_CONTROLLED),
+    ("*****", np.nan, STATUS_CONTROLLED),
+    ("(X)", np.nan, STATUS_NOT_APPLICABLE),
+    ("-", np.nan, STATUS_SUPPRESSED),
+    ("N", np.nan, STATUS_SUPPRESSED),
+    (" N ", np.nan, STATUS_SUPPRESSED),
+    ("", np.nan, STATUS_MISSING),
+    (None, np.nan, STATUS_MISSING),
+    ("abc", np.nan, STATUS_INVALID),
+    ("+5", np.nan, STATUS_INVALID),
+    ("1.", np.nan, STATUS_INVALID),
+    (".5", np.nan, STATUS_INVALID),
+    ("inf", np.nan, STATUS_INVALID),
+    ("nan", np.nan, STATUS_INVALID),
+    ("*", np.nan, STATUS_INVALID),
+]
+PLAIN = [cell for cell, _, status in CELLS if status == STATUS_OK and cell == cell.strip() and "," not in cell]
+
+
+@pytest.fixture(params=["pyarrow", "pandas"])
+def parser(request, monkeypatch):
+    # Both parsers of the fast pass: pyarrow compute kernels, and pd.to_numeric without pyarrow
+    if request.param == "pyarrow":
+        pytest.importorskip("pyarrow")
+    else:
+        monkeypatch.setattr(acs_sentinels, "pa", None)
+    return request.param
+
+
+@pytest.mark.parametrize("cell, value, status", CELLS)
+def test_cell_is_decoded(parser, cell, value, status):
+    values, statuses = decode_estimates(pd.Series([cell], dtype=object))
+    assert statuses.tolist() == [status]
+    np.testing.assert_array_equal(values, [value])
+
+
+def test_column_decodes_like_its_cells(parser):
+    # Cells the fast pass parses and cells left to the slow path, mixed in one column
+    raw = pd.Series([cell for cell, _, _ in CELLS] * 3, dtype=object)
+    values, statuses = decode_estimates(raw)
+    assert statuses.tolist() == [status for _, _, status in CELLS] * 3
+    np.testing.assert_array_equal(values, [value for _, value, _ in CELLS] * 3)
+    assert statuses.dtype == np.int8
+
+
+@pytest.mark.parametrize("cell", PLAIN)
+def test_fast_pass_agrees_with_slow_path(parser, cell):
+    # Surrounding spaces fail the fast pass's pattern, so the padded cell goes through the slow path
+    fast = decode_estimates(pd.Series([cell], dtype=object))
+    slow = decode_estimates(pd.Series([f" {cell} "], dtype=object))
+    np.testing.assert_array_equal(fast[0], slow[0])
+    np.testing.assert_array_equal(fast[1], slow[1])
+
+
+def test_numeric_column_has_nothing_to_decode():
+    values, statuses = decode_estimates(pd.Series([1.0, np.nan, 3.0]))
+    np.testing.assert_array_equal(values, [1.0, np.nan, 3.0])
+    assert statuses.tolist() == [STATUS_OK, STATUS_MISSING, STATUS_OK]
@@ -0,0 +1,54 @@
+import filecmp
+import os
+
+import pytest
+
+from build import build_derived, run_build, update_derived
+from conftest import LAST_YEAR
+from tract_changes import CHANGES_DIR, load_changes
+
+
+@pytest.fixture(scope="module")
+def builds(synthetic_build, tmp_path_factory):
+    """
+    The synthetic tree built again for all but the last two years, with those appended one at
+    a time and the derived files then updated once from the pending changes, next to its full
+    build. The second append also fills some gaps of the first one's year again.
+    """
+    region, data_dir, full_dir = synthetic_build
+    appended_dir = str(tmp_path_factory.mktemp("appended"))
+    run_build(region, start_year=2010, end_year=LAST_YEAR - 2, input_dir=data_dir, output_dir=appended_dir, workers=1)
+    build_derived(appended_dir, region)
+    for year in (LAST_YEAR - 1, LAST_YEAR):
+        run_build(region, start_year=year, end_year=year, input_dir=data_dir, output_dir=appended_dir,
+                  workers=1, append=True)
+    # The update must work from the pending changes, not fall back to a full build
+    changes, rebuild = load_changes(appended_dir)
+    assert not rebuild and changes
+    update_derived(appended_dir, region)
+    return region, data_dir, full_dir, appended_dir
+
+
+def _files(directory):
+    return sorted(os.path.relpath(os.path.join(parent, name), directory)
+                  for parent, _, names in os.walk(directory) for name in names)
+
+
+def test_append_matches_full_build(builds):
+    _, _, full_dir, appended_dir = builds
+    files = _files(full_dir)
+    # Tables, panel, tract store, shards, scores, cubes and trends
+    assert any(name.endswith(".scores.json") for name in files)
+    assert any(name.endswith(".cube.json") for name in files)
+    assert _files(appended_dir) == files
+    assert not os.path.exists(os.path.join(appended_dir, CHANGES_DIR))
+    different = [name for name in files
+                 if not filecmp.cmp(os.path.join(full_dir, name), os.path.join(appended_dir, name), shallow=False)]
+    assert different == []
+
+
+def test_appending_an_existing_year_raises(builds):
+    region, data_dir, _, appended_dir = builds
+    with pytest.raises(ValueError):
+        run_build(region, start_year=LAST_YEAR, end_year=LAST_YEAR, input_dir=data_dir, output_dir=appended_dir,
+                  workers=1, append=True)
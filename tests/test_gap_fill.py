@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from acs_engine import extract_values, fill_gaps_by_tract
+from acs_loader import resolve_header_map
+from acs_sentinels import imputed_column
+from gap_fill import METHODS, fill_gaps, fill_table_gaps
+from table_specs import TABLE_SPECS
+
+# One tract per case: leading and trailing gaps, runs of every length up to past the limit,
+# no values at all, and a tract with a single row
+SERIES = [
+    [np.nan, np.nan, 3.0, np.nan, 5.0, np.nan, np.nan, np.nan, 9.0, np.nan],
+    [1.0, np.nan, np.nan, np.nan, np.nan, 6.0, 7.0, np.nan, np.nan, 10.0],
+    [np.nan, 2.0, np.nan, np.nan, 8.0, np.nan, np.nan, np.nan, np.nan, np.nan],
+    [np.nan, np.nan, np.nan],
+    [4.0, 2.0, np.nan, 3.0],
+    [np.nan],
+]
+
+
+def run_lengths(series):
+    # Length of the run of missing values every value belongs to (0 for the values themselves)
+    missing = series.isna()
+    run = (missing != missing.shift()).cumsum()
+    return missing.groupby(run).transform("sum").where(missing, 0)
+
+
+def pandas_fill(series, method, limit):
+    """
+    The same filling by pandas: interpolate(limit_area="inside") between values, the nearest
+    value before the first or after the last one for linear, ffill and bfill, with runs longer
+    than the limit left missing as a whole (pandas fills the first limit values of those).
+    """
+    if method == "linear":
+        filled = series.interpolate(limit_area="inside").ffill().bfill()
+    elif method == "nearest":
+        filled = series.interpolate("nearest", limit_area="inside").ffill().bfill()
+    elif method == "ffill":
+        filled = series.ffill()
+    else:
+        filled = series.bfill()
+    if limit is not None:
+        filled = filled.where(run_lengths(series) <= limit, np.nan)
+    return filled
+
+
+def table(series_list):
+    geoid = np.concatenate([np.full(len(s), 6001400100 + i, dtype=np.int64) for i, s in enumerate(series_list)])
+    return geoid, np.concatenate([np.asarray(s, dtype=np.float64) for s in series_list])
+
+
+@pytest.mark.parametrize("limit", [None, 1, 2, 3])
+@pytest.mark.parametrize("method", METHODS)
+def test_fill_matches_pandas(method, limit):
+    geoid, values = table(SERIES)
+    (filled, imputed), = fill_table_gaps(geoid, [values], method, limit)
+    expected = pd.Series(values).groupby(geoid).transform(lambda s: pandas_fill(s, method, limit)).to_numpy()
+    np.testing.assert_array_equal(filled, expected)
+    np.testing.assert_array_equal(imputed, np.isnan(values) & ~np.isnan(expected))
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3])
+def test_interior_runs_within_the_limit_match_interpolate(limit):
+    geoid, values = table(SERIES)
+    (filled, _), = fill_table_gaps(geoid, [values], "linear", limit)
+    series = pd.Series(values)
+    inside = series.groupby(geoid).transform(lambda s: s.interpolate(limit=limit, limit_area="inside")).to_numpy()
+    runs = series.groupby(geoid).transform(run_lengths).to_numpy()
+    interior = ~np.isnan(inside) & (runs <= limit)
+    np.testing.assert_array_equal(filled[interior], inside[interior])
+    # Longer interior runs, which pandas fills partly, stay missing as a whole
+    assert np.isnan(filled[np.isnan(values) & (runs > limit)]).all()
+
+
+def test_fill_gaps_ignores_positions_without_rows():
+    values = np.array([[1.0, np.nan, 3.0, np.nan]])
+    slots = np.array([[True, True, True, False]])
+    filled, imputed = fill_gaps(values, slots, "linear", limit=1)
+    np.testing.assert_array_equal(filled, [[1.0, 2.0, 3.0, np.nan]])
+    np.testing.assert_array_equal(imputed, [[False, True, False, False]])
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        fill_gaps(np.zeros((1, 1)), np.ones((1, 1), dtype=bool), "cubic")
+
+
+def test_only_rules_without_a_fill_leave_gaps():
+    # S1501 fills suppressed estimates with 0 from 2018 on, but leaves them missing before
+    # ("fill": None), where the linear gap filling takes over
+    spec = TABLE_SPECS["S1501"]
+    col = list(spec["columns"])[0]
+    codes = ["GEO_ID", "NAME", "S1501_C01_015E", "S1501_C01_006E"]
+    cells = {2015: "30", 2016: "-", 2017: "40", 2018: "450", 2019: "-", 2020: "500"}
+    rows = []
+    for year, cell in cells.items():
+        df = pd.DataFrame([["1400000US06001400100", "Census Tract 4001; Alameda County; California", cell, "1000"]])
+        header_map = resolve_header_map(spec, year, codes, codes)
+        value, _, _ = extract_values(df, header_map, spec, year, "test")[col]
+        rows.append({"GEOID": 6001400100, "Year": year, col: value.iloc[0]})
+    filled = fill_gaps_by_tract(pd.DataFrame(rows), [col], spec["gap_fill"])
+    assert filled[col].tolist() == pytest.approx([30.0, 35.0, 40.0, 45.0, 0.0, 50.0])
+    assert filled[imputed_column(col)].tolist() == [False, True, False, False, False, False]
@@ -0,0 +1,86 @@
+import math
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from gentrification_score import SCORE_ATTRS, build_tract_array, compute_scores, js_gen_scores, score_records
+
+INCOME, HOME_VALUE, RENT, VACANT, EDUCATION = SCORE_ATTRS
+BASE = {INCOME: 100.0, HOME_VALUE: 500.0, RENT: 20.0, VACANT: 10.0, EDUCATION: 30.0}
+NAMES = {"income": INCOME, "home_value": HOME_VALUE, "rent": RENT, "vacant": VACANT, "education": EDUCATION}
+
+
+def tract(geoid, year, **changes):
+    # A row of the base values, with some attributes changed by short name
+    return {"GEOID": geoid, "Year": year, **BASE, **{NAMES[name]: value for name, value in changes.items()}}
+
+
+def python_scores(rows):
+    """compute_scores' records for one county, by Tract ID, for the later year."""
+    array = build_tract_array(pd.DataFrame(rows))
+    (records,) = score_records(array, compute_scores(array), decimals=None).values()
+    return {r["tractId"]: r for r in records}
+
+
+def js_scores(rows):
+    """genScore's results in heatmap.js for the same rows."""
+    df = pd.DataFrame(rows)
+    df["Tract ID"] = df["GEOID"].astype(str).str[-6:]
+    df = df.astype(object).where(df.notna(), None)
+    prev, curr = (df[df["Year"] == year].to_dict("records") for year in sorted(df["Year"].unique()))
+    (results,) = js_gen_scores([{"prev": prev, "curr": curr}])
+    return {r["tractId"]: r for r in results}
+
+
+IMPLEMENTATIONS = [
+    pytest.param(python_scores, id="python"),
+    pytest.param(js_scores, id="heatmap.js", marks=pytest.mark.skipif(shutil.which("node") is None,
+                                                                       reason="node is not installed")),
+]
+
+# Two tracts: X's income triples and Y's stays, so the county median income doubles (100 -> 200)
+MEDIAN_ROWS = [
+    tract(6001400100, 2010), tract(6001400200, 2010),
+    tract(6001400100, 2011, income=300.0), tract(6001400200, 2011),
+]
+
+# Five tracts whose medians don't move: A's income doubles, B's bachelor's share doubles,
+# C has no vacant units in 2011 and D has no home value in 2010
+ATTRIBUTE_ROWS = [tract(6001400000 + i, 2010) for i in range(1, 6)]
+ATTRIBUTE_ROWS[3][HOME_VALUE] = np.nan
+ATTRIBUTE_ROWS += [
+    tract(6001400001, 2011, income=200.0),
+    tract(6001400002, 2011, education=60.0),
+    tract(6001400003, 2011, vacant=0.0),
+    tract(6001400004, 2011),
+    tract(6001400005, 2011),
+]
+
+
+@pytest.mark.parametrize("scores", IMPLEMENTATIONS)
+def test_scores_against_county_median_growth(scores):
+    result = scores(MEDIAN_ROWS)
+    # Each term is log(tract growth) - log(median growth), averaged over the five attributes
+    assert result["400100"]["score"] == pytest.approx((math.log(3) - math.log(2)) / 5)
+    assert result["400200"]["score"] == pytest.approx(-math.log(2) / 5)
+    assert result["400100"]["undefinedAttrs"] == result["400200"]["undefinedAttrs"] == []
+
+
+@pytest.mark.parametrize("scores", IMPLEMENTATIONS)
+def test_income_growth_raises_and_education_growth_lowers_the_score(scores):
+    result = scores(ATTRIBUTE_ROWS)
+    assert result["400001"]["score"] == pytest.approx(math.log(2) / 5)
+    # Educational attainment enters with its sign reversed
+    assert result["400002"]["score"] == pytest.approx(-math.log(2) / 5)
+    assert result["400005"]["score"] == pytest.approx(0)
+
+
+@pytest.mark.parametrize("scores", IMPLEMENTATIONS)
+def test_zero_and_missing_attributes_are_undefined(scores):
+    result = scores(ATTRIBUTE_ROWS)
+    assert result["400003"]["score"] is None
+    assert result["400003"]["undefinedAttrs"] == [VACANT]
+    assert result["400004"]["score"] is None
+    assert result["400004"]["undefinedAttrs"] == [HOME_VALUE]
@@ -0,0 +1,116 @@
+import itertools
+import math
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+from hotspots import compute_hotspots, getis_ord, morans_i, spatial_lag
+
+# A 3 x 3 rook lattice holding 1..9 row by row:
+#   1 2 3
+#   4 5 6
+#   7 8 9
+# Deviations from the mean 5 are -4..4 and their sum of squares is 60.
+SIDE = 3
+VALUES = np.arange(1.0, 10.0)[:, None]
+PERMUTATIONS = 999
+
+
+def rook_lattice(side):
+    pairs = [(r * side + c, r * side + c + 1) for r in range(side) for c in range(side - 1)]
+    pairs += [(r * side + c, (r + 1) * side + c) for r in range(side - 1) for c in range(side)]
+    first, second = np.array(pairs).T
+    return sparse.csr_matrix((np.ones(2 * len(pairs)), (np.r_[first, second], np.r_[second, first])),
+                             shape=(side * side, side * side))
+
+
+ADJACENCY = rook_lattice(SIDE)
+VALID = np.ones_like(VALUES, dtype=bool)
+
+
+def test_spatial_lag_is_the_mean_of_the_neighbours():
+    lag, neighbours = spatial_lag(ADJACENCY, VALUES, VALID)
+    np.testing.assert_allclose(lag[:, 0], [3, 3, 4, 13 / 3, 5, 17 / 3, 6, 7, 7])
+    np.testing.assert_array_equal(neighbours[:, 0], [2, 3, 2, 3, 4, 3, 2, 3, 2])
+
+
+def test_missing_tracts_are_nobodys_neighbour():
+    valid = VALID.copy()
+    valid[4] = False
+    lag, neighbours = spatial_lag(ADJACENCY, np.where(valid, VALUES, np.nan), valid)
+    # The middle of the top row keeps only the corners, 1 and 3
+    assert lag[1, 0] == 2
+    assert neighbours[1, 0] == 2
+    assert np.isnan(lag[4, 0])
+
+
+def test_morans_i():
+    # Row-standardized: sum_i z_i * lag(z)_i = 8 + 6 + 2 + 2/3 + 0 + 2/3 + 2 + 6 + 8 = 100/3 over 60
+    np.testing.assert_allclose(morans_i(ADJACENCY, VALUES, VALID), [5 / 9])
+
+
+def test_getis_ord():
+    # Binary weights with the tract itself, S^2 = 60 / 9: a corner has W = 3 and sum 1 + 2 + 4 = 7,
+    # so Gi* = (7 - 5 * 3) / sqrt(60 / 9 * (9 * 3 - 9) / 8) = -8 / sqrt(15); the middle of an
+    # edge has W = 4 and sum 11, so (11 - 20) / sqrt(60 / 9 * (36 - 16) / 8) = -9 / sqrt(50 / 3)
+    corner, edge = 8 / math.sqrt(15), 9 / math.sqrt(50 / 3)
+    expected = [-corner, -edge, -corner + 4 / math.sqrt(15), -edge + 6 / math.sqrt(50 / 3), 0,
+                edge - 6 / math.sqrt(50 / 3), corner - 4 / math.sqrt(15), edge, corner]
+    np.testing.assert_allclose(getis_ord(ADJACENCY, VALUES, VALID)[:, 0], expected)
+
+
+def folded(share):
+    # Expected pseudo p-value of a test whose permuted statistic is at least the observed one
+    # with probability share
+    return min(share, 1 - share)
+
+
+def exact_moran_share():
+    # Share of all 9! orders of the values whose Moran's I is at least the observed 5 / 9
+    orders = np.array(list(itertools.permutations(range(SIDE * SIDE))))
+    z = VALUES[:, 0] - VALUES.mean()
+    weights = np.diag(1 / np.diff(ADJACENCY.indptr)) @ ADJACENCY.toarray()
+    shuffled = z[orders]
+    statistic = np.einsum("pi,pi->p", shuffled, shuffled @ weights.T)
+    return np.mean(statistic >= 100 / 3 - 1e-9)
+
+
+def exact_local_share(tract):
+    # Conditional randomization: the tract keeps its value and its k neighbours' are every k of
+    # the other eight
+    z = VALUES[:, 0] - VALUES.mean()
+    neighbours = ADJACENCY[tract].indices
+    others = np.delete(z, tract)
+    sums = [sum(pick) for pick in itertools.combinations(others, len(neighbours))]
+    return np.mean(np.array(sums) >= z[neighbours].sum() - 1e-9)
+
+
+@pytest.fixture(scope="module")
+def hotspots():
+    return compute_hotspots(ADJACENCY, {"x": VALUES}, permutations=PERMUTATIONS, workers=1, seed=0)["x"]
+
+
+def within_sampling_error(p, share):
+    # Four standard errors of a share estimated from PERMUTATIONS draws, plus the +1 of the pseudo p-value
+    expected = folded(share)
+    return abs(p - expected) <= 4 * math.sqrt(expected * (1 - expected) / PERMUTATIONS) + 1 / (PERMUTATIONS + 1)
+
+
+def test_moran_p_value_matches_the_exact_permutation_test(hotspots):
+    share = exact_moran_share()
+    assert within_sampling_error(hotspots["moran_p"][0], share)
+    assert hotspots["moran_p"][0] < 0.05
+
+
+@pytest.mark.parametrize("tract", range(SIDE * SIDE))
+def test_gi_p_values_match_the_exact_permutation_test(hotspots, tract):
+    assert within_sampling_error(hotspots["p"][tract, 0], exact_local_share(tract))
+
+
+def test_p_values_depend_only_on_the_seed(hotspots):
+    again = compute_hotspots(ADJACENCY, {"x": VALUES}, permutations=PERMUTATIONS, workers=2, seed=0)["x"]
+    np.testing.assert_array_equal(again["p"], hotspots["p"])
+    np.testing.assert_array_equal(again["moran_p"], hotspots["moran_p"])
+    other = compute_hotspots(ADJACENCY, {"x": VALUES}, permutations=PERMUTATIONS, workers=1, seed=1)["x"]
+    assert not np.array_equal(other["p"], hotspots["p"])
@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from query_service import QueryError, QueryService
+
+
+@pytest.fixture(scope="module")
+def service(synthetic_build):
+    return QueryService(synthetic_build[2], site_dir=None)
+
+
+def bulk(service, payload):
+    return service.respond("POST", "/api/bulk", json.dumps(payload).encode())
+
+
+@pytest.mark.parametrize("payload", [
+    {"queries": ["06001"]},
+    {"queries": {"a": 1}},
+    {"queries": [{"county": "06001"}, 6001]},
+    {"queries": [{"county": "06001", "years": "2015"}]},
+    {"queries": [{"tract": "6001400100", "attrs": "Median_Gross_Rent"}]},
+    ["06001"],
+])
+def test_malformed_bulk_requests_are_rejected(service, payload):
+    with pytest.raises(QueryError) as error:
+        bulk(service, payload)
+    assert error.value.status == 400
+
+
+def test_bulk_request(service):
+    entry = bulk(service, {"queries": [{"county": "06001", "years": [2015], "attrs": ["Median_Gross_Rent"]}]})
+    (result,) = json.loads(entry["body"])["results"]
+    assert result["fips"] == "06001"
+    assert set(result["columns"]["Year"]) == {2015}
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+import score_uncertainty
+from gentrification_score import SCORE_ATTRS, compute_scores
+from score_uncertainty import MAX_INTERVAL_WIDTH, MIN_DEFINED_SHARE, is_reliable, score_intervals
+
+REPLICATES = 200
+
+
+@pytest.fixture(scope="module")
+def scored(synthetic_build):
+    from tract_store import load_tract_array
+
+    array = load_tract_array(synthetic_build[2], SCORE_ATTRS)
+    return array, compute_scores(array)
+
+
+def test_zero_margins_of_error_give_the_score(scored):
+    array, scores = scored
+    exact = dict(array, moe=np.where(np.isnan(array["moe"]), np.nan, 0.0))
+    intervals = score_intervals(exact, scores, replicates=REPLICATES)
+    has_interval = ~np.isnan(intervals["lower"])
+    assert has_interval.any()
+    np.testing.assert_array_equal(intervals["lower"][has_interval], intervals["upper"][has_interval])
+    np.testing.assert_allclose(intervals["lower"][has_interval], scores["score"][has_interval], rtol=0, atol=1e-12)
+    np.testing.assert_allclose(intervals["se"][has_interval], 0, atol=1e-12)
+    assert intervals["reliable"][has_interval].all()
+
+
+@pytest.mark.parametrize("chunk_values, workers", [(1, 1), (1, 2), (1 << 30, 1)])
+def test_intervals_depend_only_on_the_seed(scored, monkeypatch, chunk_values, workers):
+    # One block per chunk, and everything of a year in one chunk, against the default chunking
+    array, scores = scored
+    expected = score_intervals(array, scores, replicates=REPLICATES)
+    monkeypatch.setattr(score_uncertainty, "CHUNK_VALUES", chunk_values)
+    intervals = score_intervals(array, scores, replicates=REPLICATES, workers=workers)
+    for key in ("lower", "upper", "se", "defined", "reliable"):
+        np.testing.assert_array_equal(intervals[key], expected[key])
+    other = score_intervals(array, scores, replicates=REPLICATES, seed=1)
+    assert not np.array_equal(other["lower"], expected["lower"], equal_nan=True)
+
+
+@pytest.mark.parametrize("defined, width, reliable", [
+    (MIN_DEFINED_SHARE, MAX_INTERVAL_WIDTH, True),
+    (1.0, 0.0, True),
+    (MIN_DEFINED_SHARE - 0.005, MAX_INTERVAL_WIDTH, False),
+    (MIN_DEFINED_SHARE, MAX_INTERVAL_WIDTH + 1e-9, False),
+    (np.nan, np.nan, False),
+])
+def test_reliability_thresholds(defined, width, reliable):
+    assert bool(is_reliable(np.array(defined), np.array(0.0), np.array(width))) is reliable
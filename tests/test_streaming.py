@@ -0,0 +1,48 @@
+import filecmp
+import os
+
+import pytest
+
+from conftest import LAST_YEAR
+from table_specs import TABLE_SPECS
+
+OUTPUTS = [spec["output"] for spec in TABLE_SPECS.values()]
+
+
+def build(region, input_dir, output_dir, **options):
+    from build import run_build
+
+    run_build(region, start_year=2010, end_year=LAST_YEAR, input_dir=input_dir, output_dir=output_dir,
+              workers=1, use_cache=False, **options)
+
+
+@pytest.fixture(scope="module")
+def streamed(synthetic_build, tmp_path_factory):
+    # Chunks far smaller than a year's file, so every file is read in several of them
+    region, data_dir, _ = synthetic_build
+    output_dir = str(tmp_path_factory.mktemp("streamed"))
+    build(region, data_dir, output_dir, streaming=True, chunk_size=25)
+    return output_dir
+
+
+@pytest.fixture(scope="module")
+def zipped(synthetic_build, tmp_path_factory):
+    # The same synthetic tree, every table and year zipped like the data.census.gov downloads
+    from acs_synth import generate
+
+    region = synthetic_build[0]
+    zip_dir, output_dir = str(tmp_path_factory.mktemp("zipped")), str(tmp_path_factory.mktemp("zipped_build"))
+    generate(zip_dir, scale=0.05, end_year=LAST_YEAR, as_zip=True)
+    assert not any(name.endswith("-Data.csv") for name in os.listdir(zip_dir))
+    build(region, zip_dir, output_dir)
+    return output_dir
+
+
+@pytest.mark.parametrize("output", OUTPUTS)
+def test_streaming_matches_in_memory(streamed, synthetic_build, output):
+    assert filecmp.cmp(os.path.join(streamed, output), os.path.join(synthetic_build[2], output), shallow=False)
+
+
+@pytest.mark.parametrize("output", OUTPUTS)
+def test_zip_input_matches_extracted_csvs(zipped, synthetic_build, output):
+    assert filecmp.cmp(os.path.join(zipped, output), os.path.join(synthetic_build[2], output), shallow=False)
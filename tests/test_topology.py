@@ -0,0 +1,20 @@
+from topology import subset_topology
+
+
+def test_subset_without_arcs_keeps_points():
+    # Only point and null geometries: no arc is used, and the grid spans the points instead
+    topology = {
+        "type": "Topology",
+        "transform": {"scale": [0.001, 0.001], "translate": [-122.0, 37.0]},
+        "arcs": [[[0, 0], [10, 10]]],
+        "objects": {"tracts": {"type": "GeometryCollection", "geometries": [
+            {"type": "MultiPoint", "id": "a", "coordinates": [[1, 2], [401, 302]]},
+            {"type": None, "id": "b"},
+        ]}},
+    }
+    subset = subset_topology(topology, "tracts")
+    assert subset["arcs"] == []
+    assert subset["bbox"] == [-121.999, 37.002, -121.599, 37.302]
+    points, empty = subset["objects"]["tracts"]["geometries"]
+    assert points["coordinates"] == [[0, 0], [9999, 9999]]
+    assert empty == {"type": None, "properties": {}}
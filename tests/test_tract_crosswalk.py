@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from acs_sentinels import STATUS_SUPPRESSED, STATUS_TOP_CODED, moe_column, status_column
+from table_specs import TABLE_SPECS
+from tract_crosswalk import Crosswalk, crosswalk_table
+
+POPULATION = TABLE_SPECS["B01003"]
+TOTAL = list(POPULATION["columns"])[0]
+RENT = TABLE_SPECS["B25064"]
+MEDIAN = list(RENT["columns"])[0]
+A, B = 6001400100, 6001400200
+T1, T2 = 6001400101, 6001400102
+# A splits 3:1 into T1 and T2; all of B goes to T2, where it outweighs A's part 3:1
+SPLIT = Crosswalk([A, A, B], [T1, T2, T2], [3, 1, 3])
+
+
+def table(spec, rows):
+    """A combined table as combine_years builds it from (GEOID, year, {column: (value, status, moe)}) rows."""
+    records = []
+    for geoid, year, values in rows:
+        record = {"GEOID": geoid, "Tract ID": str(geoid % 10 ** 6), "County": "Alameda", "Year": year}
+        for col, (value, status, moe) in values.items():
+            record.update({col: value, status_column(col): status, moe_column(col): moe})
+        records.append(record)
+    value_cols = list(spec["columns"])
+    columns = (["GEOID", "Tract ID", "County"] + value_cols + ["Year"]
+               + [status_column(col) for col in value_cols] + [moe_column(col) for col in value_cols])
+    df = pd.DataFrame(records)[columns]
+    df[[status_column(col) for col in value_cols]] = df[[status_column(col) for col in value_cols]].astype(np.int8)
+    return df
+
+
+def test_zero_weight_parts_add_no_target_tracts():
+    # The Census file lists zero-area slivers, here of a tract in a neighbouring county
+    crosswalk = Crosswalk([6001400100] * 2, [6001400100, 6013300100], [1000, 0])
+    moved = crosswalk_table(table(POPULATION, [(6001400100, 2015, {TOTAL: (500.0, 0, 10.0)})]), POPULATION, crosswalk)
+    assert moved["GEOID"].tolist() == [6001400100]
+    assert moved[TOTAL].tolist() == [500.0]
+
+
+def test_targets_outside_the_source_counties_are_dropped():
+    # Even a target made up only of zero-weight parts (shared equally) stays out of the region
+    crosswalk = Crosswalk([6001400100, 6001400100], [6001400100, 6013300100], [0, 0])
+    moved = crosswalk_table(table(POPULATION, [(6001400100, 2015, {TOTAL: (500.0, 0, 10.0)})]), POPULATION, crosswalk)
+    assert moved["GEOID"].tolist() == [6001400100]
+    assert moved[TOTAL].tolist() == pytest.approx([250.0])
+
+
+def test_counts_are_split_by_weight_with_moes_in_quadrature():
+    df = table(POPULATION, [(A, 2015, {TOTAL: (400.0, 0, 40.0)}), (B, 2015, {TOTAL: (100.0, 0, 30.0)}),
+                            (T1, 2021, {TOTAL: (310.0, 0, 25.0)})])
+    moved = crosswalk_table(df, POPULATION, SPLIT)
+    assert moved["GEOID"].tolist() == [T1, T2, T1]
+    assert moved["Year"].tolist() == [2015, 2015, 2021]
+    assert moved[TOTAL].tolist() == pytest.approx([300.0, 200.0, 310.0])
+    assert moved[moe_column(TOTAL)].tolist() == pytest.approx([30.0, np.sqrt(10.0 ** 2 + 30.0 ** 2), 25.0])
+
+
+def test_medians_are_averaged_over_the_sources_of_each_target():
+    df = table(RENT, [(A, 2015, {MEDIAN: (1000.0, 0, 40.0)}), (B, 2015, {MEDIAN: (2000.0, 0, 40.0)})])
+    moved = crosswalk_table(df, RENT, SPLIT)
+    assert moved[MEDIAN].tolist() == pytest.approx([1000.0, 0.25 * 1000.0 + 0.75 * 2000.0])
+    assert moved[moe_column(MEDIAN)].tolist() == pytest.approx([40.0, np.sqrt(10.0 ** 2 + 30.0 ** 2)])
+
+
+def test_status_is_the_worst_part_and_suppressed_estimates_are_skipped():
+    df = table(RENT, [(A, 2015, {MEDIAN: (1000.0, STATUS_TOP_CODED, 40.0)}),
+                      (B, 2015, {MEDIAN: (0.0, STATUS_SUPPRESSED, np.nan)})])
+    moved = crosswalk_table(df, RENT, SPLIT)
+    assert moved[status_column(MEDIAN)].tolist() == [STATUS_TOP_CODED, STATUS_SUPPRESSED]
+    # T2's median comes from A alone, whose margin of error is known
+    assert moved[MEDIAN].tolist() == pytest.approx([1000.0, 1000.0])
+    assert moved[moe_column(MEDIAN)].tolist() == pytest.approx([40.0, 40.0])
@@ -0,0 +1,66 @@
+import filecmp
+import os
+
+import numpy as np
+import pytest
+
+from conftest import LAST_YEAR
+from gentrification_score import SCORE_ATTRS, build_tract_array
+from panel import PANEL_ATTRS, PANEL_MOES, load_panel, panel_keys, write_panel
+from tract_store import STORE_DIR, TractStore, update_store, write_store
+
+
+@pytest.fixture(scope="module")
+def panel(synthetic_build):
+    return load_panel(synthetic_build[2])
+
+
+def assert_same_array(array, expected):
+    for key in ("values", "present", "geoids", "county", "counties", "years"):
+        np.testing.assert_array_equal(np.asarray(array[key]), expected[key])
+
+
+@pytest.mark.parametrize("attrs", [PANEL_ATTRS, SCORE_ATTRS, PANEL_ATTRS[::-1]])
+def test_tract_array_matches_the_panel(synthetic_build, panel, attrs):
+    store = TractStore(os.path.join(synthetic_build[2], STORE_DIR))
+    array = store.tract_array(attrs)
+    assert_same_array(array, build_tract_array(panel, attrs))
+    np.testing.assert_array_equal(np.asarray(array["moe"]),
+                                  build_tract_array(panel, [PANEL_MOES[PANEL_ATTRS.index(a)] for a in attrs])["values"])
+
+
+def test_valid_bits_and_lookups_match_the_values(synthetic_build, panel):
+    store = TractStore(os.path.join(synthetic_build[2], STORE_DIR))
+    np.testing.assert_array_equal(store.valid(), ~np.isnan(np.asarray(store.values)))
+    row = panel.iloc[len(panel) // 2]
+    for attr in PANEL_ATTRS:
+        np.testing.assert_array_equal(store.value(row['GEOID'], int(row['Year']), attr), row[attr])
+        r, c, p = store.row(row['GEOID']), store.columns[int(row['Year'])], store.planes[attr]
+        assert store.is_valid(r, c, p) == (not np.isnan(row[attr]))
+    assert store.row(1) is None
+
+
+def test_update_store_matches_a_fresh_store(panel, tmp_path):
+    # A store of the panel without its last year and without some tracts, brought up to date
+    # with those rows plus some earlier rows whose values changed
+    geoids = np.unique(panel['GEOID'])
+    changed = panel.copy()
+    earlier = changed.index[(changed['Year'] == LAST_YEAR - 3) & changed['GEOID'].isin(geoids[::7])]
+    changed.loc[earlier, PANEL_ATTRS[0]] = changed.loc[earlier, PANEL_ATTRS[0]] * 2 + 1
+    new = (panel['Year'] == LAST_YEAR) | panel['GEOID'].isin(geoids[3::11])
+    keys = np.sort(panel_keys(changed['GEOID'], changed['Year'])[new.to_numpy() | changed.index.isin(earlier)])
+
+    updated_dir, fresh_dir = tmp_path / "updated", tmp_path / "fresh"
+    updated_dir.mkdir()
+    fresh_dir.mkdir()
+    write_panel(panel[~new].reset_index(drop=True), str(updated_dir))
+    write_store(str(updated_dir))
+    assert update_store(str(updated_dir), changed, keys) is not None
+    write_panel(changed, str(fresh_dir))
+    write_store(str(fresh_dir))
+
+    names = sorted(os.listdir(fresh_dir / STORE_DIR))
+    assert sorted(os.listdir(updated_dir / STORE_DIR)) == names
+    different = [name for name in names
+                 if not filecmp.cmp(updated_dir / STORE_DIR / name, fresh_dir / STORE_DIR / name, shallow=False)]
+    assert different == []
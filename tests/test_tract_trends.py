@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+import tract_trends
+from tract_trends import MIN_SEGMENT, compute_trends, fit_trends, theil_sen
+
+YEARS = np.arange(2010, 2024)
+X = (YEARS - YEARS[0]).astype(np.float64)
+
+
+def piecewise(onset, pre, post, offset=0.0):
+    # Slope pre before the onset year and post from it, with a jump of offset at the onset so
+    # only the one split fits exactly
+    k = int(np.searchsorted(YEARS, onset))
+    return np.where(X < k, 100 + pre * X, 100 + pre * (k - 1) + offset + post * (X - k + 1))
+
+
+def test_theil_sen_ignores_an_outlier():
+    values = 3 + 2 * X
+    values[4] = 1000
+    slope, intercept, residual = theil_sen(values[None], X)
+    assert slope[0] == 2
+    assert intercept[0] == 3
+    assert np.count_nonzero(residual) == 1
+
+
+@pytest.mark.parametrize("onset, pre, post", [
+    (2013, 2.0, -1.5),
+    (2016, 0.5, 4.0),
+    (2020, -3.0, 0.0),
+    (2021, 1.0, 1.0 + 1e-3),
+])
+def test_piecewise_series_are_recovered(onset, pre, post):
+    fit = fit_trends((piecewise(onset, pre, post, offset=10.0)[None], YEARS))
+    assert fit["onset"][0] == onset
+    assert fit["pre"][0] == pytest.approx(pre, abs=1e-12)
+    assert fit["post"][0] == pytest.approx(post, abs=1e-12)
+    # Exact fits leave no residuals, so the change of slope is certain
+    assert fit["confidence"][0] == 1
+
+
+def test_missing_years_are_left_out():
+    values = piecewise(2017, 1.0, -2.0, offset=5.0)
+    values[[1, 9]] = np.nan
+    fit = fit_trends((values[None], YEARS))
+    assert fit["onset"][0] == 2017
+    assert (fit["pre"][0], fit["post"][0]) == pytest.approx((1.0, -2.0))
+
+
+def test_straight_lines_get_low_confidence():
+    exact = 5 + 0.7 * X
+    noisy = exact + np.random.default_rng(0).normal(0, 1, (500, len(X)))
+    fit = fit_trends((np.vstack([exact, noisy]), YEARS))
+    assert fit["slope"][0] == pytest.approx(0.7)
+    assert fit["confidence"][0] == 0
+    # A confidence of at least 0.9 for at most the 10% of lines the test's level allows
+    assert np.mean(fit["confidence"][1:] >= 0.9) <= 0.1
+    assert np.median(fit["confidence"][1:]) < 0.5
+
+
+@pytest.mark.parametrize("count", range(1, 2 * MIN_SEGMENT + 1))
+def test_short_series_have_no_onset(count):
+    values = np.full(len(X), np.nan)
+    kept = np.linspace(0, len(X) - 1, count).astype(int)
+    values[kept] = piecewise(2016, 1.0, -1.0, offset=10.0)[kept]
+    fit = fit_trends((values[None], YEARS))
+    if count < 2 * MIN_SEGMENT:
+        assert np.isnan(fit["onset"][0]) and np.isnan(fit["confidence"][0])
+        assert np.isnan(fit["pre"][0]) and np.isnan(fit["post"][0])
+    else:
+        assert not np.isnan(fit["onset"][0])
+    assert np.isnan(fit["slope"][0]) == (count < 2)
+
+
+def test_results_do_not_depend_on_the_chunks(monkeypatch):
+    rng = np.random.default_rng(1)
+    variables = {"a": rng.normal(0, 1, (50, len(X))), "b": rng.normal(0, 1, (30, len(X)))}
+    expected = compute_trends(variables, YEARS)
+    monkeypatch.setattr(tract_trends, "CHUNK_TRACTS", 7)
+    chunked = compute_trends(variables, YEARS, workers=2)
+    for name in variables:
+        for key in expected[name]:
+            np.testing.assert_array_equal(chunked[name][key], expected[name][key])